@@ -0,0 +1,180 @@
+import importlib.util
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from common import metrics, responses, serializer
+
+# Location shown in the weather widget when the request does not give one
+DASHBOARD_WEATHER_LOCATION = os.environ.get('DASHBOARD_WEATHER_LOCATION', 'Kathmandu')
+
+# Each dashboard section: (app directory, request function in its lambda_function.py,
+# seconds to wait for it). The GitHub section makes several paginated calls, so it gets longest.
+SECTIONS = {
+    'weather': ('WeatherApp', 'handle_request', 6),
+    'github': ('GitHubApp', 'handle_request', 12),
+    'expenses': ('ExpenseApp', 'route_request', 6),
+    'news': ('NewsApp', 'handle_request', 6),
+}
+
+# The other apps' modules, loaded on first use. One lock per app, so the
+# sections' threads load their apps in parallel on a cold start.
+_apps = {}
+_app_locks = {app_dir: threading.Lock() for app_dir, _, _ in SECTIONS.values()}
+
+def load_app(app_dir):
+    """
+    Loads <app_dir>/lambda_function.py as a module. The deployment package has
+    each app's directory next to this file; in the repository they are one level up.
+    """
+    with _app_locks[app_dir]:
+        if app_dir not in _apps:
+            here = os.path.dirname(os.path.abspath(__file__))
+            path = os.path.join(here, app_dir, 'lambda_function.py')
+            if not os.path.exists(path):
+                path = os.path.join(here, '..', app_dir, 'lambda_function.py')
+            spec = importlib.util.spec_from_file_location(f"{app_dir.lower()}_lambda", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _apps[app_dir] = module
+        return _apps[app_dir]
+
+def section_event(name, query_params):
+    """
+    Builds the API Gateway GET event the section's app would receive from the browser.
+    """
+    app_dir = SECTIONS[name][0]
+    params = None
+    if name == 'weather':
+        params = {'location': query_params.get('location') or DASHBOARD_WEATHER_LOCATION}
+    return {
+        'httpMethod': 'GET',
+        'path': f"/{app_dir}",
+        'headers': {},
+        'queryStringParameters': params,
+        'multiValueQueryStringParameters': None,
+        'pathParameters': None,
+        'body': None
+    }
+
+def run_section(name, query_params, context):
+    """
+    Runs one app's request handling in-process.
+    Returns its response and how long it took in ms.
+    """
+    started = time.monotonic()
+    app_dir, function_name, _ = SECTIONS[name]
+    app = load_app(app_dir)
+    response = getattr(app, function_name)(section_event(name, query_params), context)
+    return response, round((time.monotonic() - started) * 1000)
+
+def section_error(response):
+    """
+    Returns the error message from a section's non-200 response.
+    """
+    try:
+        body = json.loads(response.get('body') or 'null')
+    except json.JSONDecodeError:
+        body = None
+    if isinstance(body, dict):
+        return body.get('error') or body.get('message') or f"HTTP {response['statusCode']}"
+    if isinstance(body, str):
+        return body
+    return f"HTTP {response['statusCode']}"
+
+def fetch_sections(names, query_params, context):
+    """
+    Runs the sections concurrently, each with its own deadline.
+
+    Returns (bodies, errors, timings): the JSON body of each section that
+    answered with a 200, an error message for each one that failed or did not
+    finish in time, and the milliseconds each section took (or was waited for
+    before it timed out).
+    """
+    bodies = {}
+    errors = {}
+    timings = {}
+
+    # Not used as a context manager: exiting the "with" block would wait for
+    # sections that already timed out.
+    executor = ThreadPoolExecutor(max_workers=len(names))
+    try:
+        started = time.monotonic()
+        futures = {name: executor.submit(metrics.bind(run_section), name, query_params, context) for name in names}
+
+        # Wait for the sections with the earliest deadlines first
+        for name in sorted(names, key=lambda name: SECTIONS[name][2]):
+            timeout = SECTIONS[name][2]
+            try:
+                response, timings[name] = futures[name].result(timeout=max(0, started + timeout - time.monotonic()))
+                if response.get('statusCode') == 200:
+                    bodies[name] = response['body']
+                else:
+                    errors[name] = section_error(response)
+            except FutureTimeoutError:
+                errors[name] = f"Timed out after {timeout}s"
+                timings[name] = timeout * 1000
+            except Exception as e:
+                errors[name] = str(e)
+
+            if name in errors:
+                print(f"Dashboard section {name} failed: {errors[name]}")
+    finally:
+        executor.shutdown(wait=False)
+
+    return bodies, errors, timings
+
+def handle_request(event, context):
+    """
+    Returns all dashboard widgets in one response:
+    {"weather": ..., "github": ..., "expenses": ..., "news": ..., "errors": {...}}.
+
+    Each section holds exactly what its own endpoint would return, or null if it
+    failed, in which case "errors" has its message. ?sections=weather,news
+    limits the response to some sections and ?location= sets the weather location.
+    """
+    query_params = event.get('queryStringParameters') or {}
+    names = [name.strip() for name in query_params.get('sections', ','.join(SECTIONS)).split(',') if name.strip()]
+    unknown = [name for name in names if name not in SECTIONS]
+    if not names or unknown:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET',
+                'Access-Control-Allow-Headers': 'Content-Type'
+            },
+            'body': serializer.dumps({'error': f'"sections" must be a comma-separated list of: {", ".join(SECTIONS)}.'})
+        }
+
+    bodies, errors, timings = fetch_sections(names, query_params, context)
+
+    # The section bodies are already JSON, so they are spliced in as they are
+    # instead of being parsed and serialized a second time
+    parts = [f"{serializer.dumps(name)}:{bodies.get(name, 'null')}" for name in names]
+    parts.append(f'"errors":{serializer.dumps(errors)}')
+
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'GET',
+            'Access-Control-Allow-Headers': 'Content-Type',
+            # Timings go in a header so the body, and its ETag, only change with the data
+            'Server-Timing': ', '.join(f"{name};dur={timings[name]}" for name in names if name in timings)
+        },
+        'body': '{' + ','.join(parts) + '}'
+    }
+
+@metrics.instrumented('DashboardApp')
+def handler(event, context):
+    """
+    Lambda entry point: decodes the request, handles it and applies the shared
+    response processing (ETag/304, compression) from common/responses.py.
+    """
+    event = responses.decode_request(event)
+    return responses.finalize(event, handle_request(event, context))
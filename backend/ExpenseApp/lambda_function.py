@@ -1,19 +1,154 @@
+import base64
+import csv
+import io
 import json
-import boto3
-from datetime import datetime
-from decimal import Decimal
+import os
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
 
-# Initialize DynamoDB resource
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('expenses-table')
+from common import metrics, responses, serializer, text_index
+from common.cache import TTLCache
+from common.dynamodb_export import export_to_destination
+from common.http_client import aws_config, backoff_delay
+from common.ids import MAX_WORKERS, SnowflakeGenerator, id_floor
 
+EXPENSES_TABLE = 'expenses-table'
+
+# Pre-aggregated totals, kept in step with the expenses table inside the same transactions.
+# Partition key 'summaryType' ('month', 'category' or 'month-category'), sort key 'bucket'
+# ('2024-03', 'food' or '2024-03#food'). Each item holds a 'total' and a 'count'.
+EXPENSE_SUMMARY_TABLE = os.environ.get('EXPENSE_SUMMARY_TABLE', 'expense-summary-table')
+
+# Inverted index of expense descriptions, kept in step with the expenses table.
+# Partition key 'bucket' (the first characters of a word), sort key 'entry'
+# ('<word>#<date>#<zero-padded expenseId>', see common/text_index.py), so the
+# expenses with a word, or a word prefix, in a date range are one Query.
+EXPENSE_SEARCH_TABLE = os.environ.get('EXPENSE_SEARCH_TABLE', 'expense-search-index')
+
+# DynamoDB resource and tables, created by get_dynamodb() and get_table() on first
+# use. boto3 takes a few hundred ms to import and set up, which would otherwise be
+# paid on every cold start, including for preflights and rejected requests.
+_dynamodb = None
+_dynamodb_lock = threading.Lock()
+_tables = {}
+
+# Global secondary indexes used by get_expenses:
+#   category-date-index: partition key 'category', sort key 'date' (a YYYY-MM-DD string)
+#   type-date-index:     partition key 'recordType', which is 'expense' on every expense item, sort key 'date'
+#   type-id-index:       partition key 'recordType', sort key 'expenseId', i.e. creation time
+CATEGORY_INDEX = 'category-date-index'
+DATE_INDEX = 'type-date-index'
+ID_INDEX = 'type-id-index'
+RECORD_TYPE = 'expense'
+
+# Attributes of a 'next' token from each index: its keys plus the table's key
+CURSOR_KEYS = {
+    CATEGORY_INDEX: {'category', 'date', 'expenseId'},
+    DATE_INDEX: {'recordType', 'date', 'expenseId'},
+    ID_INDEX: {'recordType', 'expenseId'}
+}
+
+# Page size for GET when no 'limit' is given, and the largest one allowed
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Items per BatchWriteItem call (the DynamoDB maximum) and keys per BatchGetItem call
+BATCH_WRITE_SIZE = 25
+BATCH_GET_SIZE = 100
+# Attempts for items DynamoDB returns as unprocessed before they are reported as failed
+BATCH_MAX_ATTEMPTS = 5
+# Columns a CSV batch body must name in its header line
+CSV_COLUMNS = {'description', 'amount', 'category', 'date'}
+
+# Expense lists and summaries per query, kept for the life of a warm container.
+# Keys include the data version below, so a change made through any container
+# is seen on the next request. The short TTL covers changes made outside the
+# API, such as the scripts in backend/scripts. Stale entries are never served.
+expense_cache = TTLCache(ttl=int(os.environ.get('EXPENSE_CACHE_TTL', '10')))
+
+# Meta item in the summary table counting changes to the expenses. Every add and
+# delete increments it, inside the same transaction where there is one.
+DATA_VERSION_KEY = {'summaryType': 'meta', 'bucket': 'data-version'}
+
+# ID generator for this container, created on first use by new_expense_id()
+_id_generator = None
+_id_generator_lock = threading.Lock()
+
+# Worker numbers for ID generation are leased per container, as items
+# 'id-worker#<n>' in the summary table, for WORKER_LEASE_SECONDS. A lease is
+# renewed once less than half of it is left, and checked before every ID, so
+# a container that was frozen past its lease takes a free number first.
+# Leases are short so numbers of containers that have gone away are soon free.
+WORKER_LEASE_SECONDS = 120
+# Numbers tried, after the current one, before falling back to an unleased one
+WORKER_LEASE_ATTEMPTS = 8
+# How long to use an unleased number before trying to lease one again
+UNLEASED_WORKER_SECONDS = 10
+# This container, as the owner of its lease, and the lease: (worker_id, lease_until)
+_container_id = uuid.uuid4().hex
+_worker_lease = None
+
+# Columns written by CSV exports
+EXPORT_FIELDS = ['expenseId', 'date', 'category', 'description', 'amount', 'timestamp']
+
+def get_dynamodb():
+    """
+    Returns the DynamoDB resource, with the shared timeouts, keep-alive and
+    retry settings, creating it on first use.
+    """
+    global _dynamodb
+    if _dynamodb is None:
+        with _dynamodb_lock:
+            if _dynamodb is None:
+                import boto3
+                dynamodb = boto3.resource('dynamodb', config=aws_config())
+                metrics.instrument_dynamodb(dynamodb.meta.client)
+                _dynamodb = dynamodb
+    return _dynamodb
+
+def get_table(name=EXPENSES_TABLE):
+    """
+    Returns the Table resource for one of the expense tables, creating it on first use.
+    """
+    table = _tables.get(name)
+    if table is None:
+        table = _tables.setdefault(name, get_dynamodb().Table(name))
+    return table
+
+@metrics.instrumented('ExpenseApp')
 def handler(event, context):
+    # Direct invocations (not through API Gateway), e.g. {"action": "export", ...}
+    if 'httpMethod' not in event and event.get('action') == 'export':
+        return export_expenses(event)
+
+    # API Gateway requests: decode the request and apply the shared response
+    # processing (compression) from common/responses.py
+    event = responses.decode_request(event)
+    return responses.finalize(event, route_request(event, context))
+
+def route_request(event, context):
     http_method = event['httpMethod']
 
-    if http_method == 'POST':
+    path = event.get('path', '').rstrip('/')
+
+    if http_method == 'POST' and path.endswith('/batch'):
+        return add_expenses_batch(event)
+    elif http_method == 'POST':
         return add_expense(event)
+    elif http_method == 'GET' and path.endswith('/summary'):
+        return get_summary(event)
+    elif http_method == 'GET' and path.endswith('/search'):
+        return search_expenses(event)
     elif http_method == 'GET':
         return get_expenses(event)
+    elif http_method == 'DELETE' and path.endswith('/batch'):
+        return delete_expenses_batch(event)
     elif http_method == 'DELETE':
         return delete_expense(event, context)
     else:
@@ -24,9 +159,131 @@ def handler(event, context):
                 'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                 'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,DELETE,PATCH'
             },
-            'body': json.dumps({'message': 'Method Not Allowed'})
+            'body': serializer.dumps({'message': 'Method Not Allowed'})
         }
 
+def validate_expense(body):
+    """
+    Checks one expense from a request body or a batch row (JSON or CSV).
+    Returns an error message, or None if it is valid.
+    """
+    required_fields = ['description', 'amount', 'category', 'date']
+    for field in required_fields:
+        if field not in body:
+            return f'Missing field "{field}".'
+
+    # Validate data types
+    if not isinstance(body['description'], str) or not body['description']:
+        return '"description" must be a non-empty string.'
+
+    # This is the key check: ensure 'amount' is a number
+    if not isinstance(body['amount'], (int, float, Decimal)) or isinstance(body['amount'], bool):
+        return '"amount" must be a number.'
+
+    # category and date are index keys and make up the summary buckets,
+    # so they must be usable as such
+    if not isinstance(body['category'], str) or not body['category'].strip():
+        return '"category" must be a non-empty string.'
+
+    if not is_valid_date(body['date']):
+        return '"date" must be a date in YYYY-MM-DD format.'
+
+    return None
+
+def is_valid_date(value):
+    """
+    Returns True if value is a real date written as YYYY-MM-DD.
+    """
+    if not isinstance(value, str) or len(value) != 10:
+        return False
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d') == value
+    except ValueError:
+        return False
+
+def build_expense(body):
+    """
+    Turns a validated request body into the DynamoDB item, converting amount to Decimal.
+    """
+    timestamp = int(datetime.utcnow().timestamp() * 1000)
+    return {
+        'expenseId': new_expense_id(),
+        'description': body['description'],
+        'timestamp': timestamp,
+        'amount': Decimal(str(body['amount'])),
+        'category': body['category'],
+        'date': body['date'],
+        'recordType': RECORD_TYPE
+    }
+
+def claim_worker_id(worker_id, lease_until, now):
+    """
+    Takes or renews the lease on one worker number until lease_until (Unix time).
+    Returns False if another container holds an unexpired lease on it.
+    """
+    try:
+        get_table(EXPENSE_SUMMARY_TABLE).update_item(
+            Key={'summaryType': 'meta', 'bucket': f'id-worker#{worker_id}'},
+            UpdateExpression='SET #owner = :owner, #until = :until',
+            ConditionExpression='attribute_not_exists(#until) OR #until < :now OR #owner = :owner',
+            ExpressionAttributeNames={'#owner': 'owner', '#until': 'leaseUntil'},
+            ExpressionAttributeValues={':owner': _container_id, ':until': lease_until, ':now': int(now)}
+        )
+        return True
+    except get_dynamodb().meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+def lease_worker_id():
+    """
+    Returns this container's worker number for ID generation, leasing one on
+    first use and renewing it once less than half of the lease is left.
+
+    A number is only leased while no other container holds it, so no two
+    containers generate IDs with the same number at the same time. IDs from a
+    number's earlier holder carry earlier timestamps, so they differ too. If
+    the lease was lost (e.g. the container was frozen past it and another one
+    took the number), another free number is leased.
+
+    If the numbers tried are all held (e.g. after a burst of cold starts), a
+    random number is used without a lease for UNLEASED_WORKER_SECONDS rather
+    than failing the write. Its IDs can then only collide with those of a
+    container using the same number in the same millisecond.
+    """
+    global _worker_lease
+    now = time.time()
+    if _worker_lease and now < _worker_lease[1] - WORKER_LEASE_SECONDS / 2:
+        return _worker_lease[0]
+
+    lease_until = int(now) + WORKER_LEASE_SECONDS
+    # Keep the current number if it can be renewed, else try others in random order
+    candidates = random.sample(range(MAX_WORKERS), WORKER_LEASE_ATTEMPTS)
+    if _worker_lease:
+        candidates.insert(0, _worker_lease[0])
+    for worker_id in candidates:
+        if claim_worker_id(worker_id, lease_until, now):
+            _worker_lease = (worker_id, lease_until)
+            return worker_id
+
+    worker_id = random.randrange(MAX_WORKERS)
+    print(f"No free ID worker number after {len(candidates)} attempts, using {worker_id} without a lease")
+    # Expires for lease_worker_id's check after UNLEASED_WORKER_SECONDS
+    _worker_lease = (worker_id, now + WORKER_LEASE_SECONDS / 2 + UNLEASED_WORKER_SECONDS)
+    return worker_id
+
+def new_expense_id():
+    """
+    Returns a new time-ordered expense ID (see common/ids.py). IDs sort by creation
+    time and, as long as this container holds its worker number's lease (checked
+    here), do not collide, even for a batch written within one millisecond.
+    """
+    global _id_generator
+    with _id_generator_lock:
+        worker_id = lease_worker_id()
+        if _id_generator is None or _id_generator.worker_id != worker_id:
+            _id_generator = SnowflakeGenerator(worker_id)
+        generator = _id_generator
+    return generator.next_id()
+
 def add_expense(event):
     try:
         # Check if 'body' exists and is not None
@@ -38,62 +295,15 @@ def add_expense(event):
                     'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                     'Access-Control-Allow-Methods': 'GET, POST, DELETE'
                 },
-                'body': json.dumps({'message': 'Invalid request: Body is missing.'})
+                'body': serializer.dumps({'message': 'Invalid request: Body is missing.'})
             }
 
         # Parse the body of the incoming request
         body = json.loads(event['body'])
 
         # --- Validation Check ---
-        required_fields = ['description', 'amount', 'category', 'date']
-        for field in required_fields:
-            if field not in body:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-                        'Access-Control-Allow-Methods': 'GET, POST, DELETE'
-                    },
-                    'body': json.dumps({'message': f'Validation Error: Missing field "{field}".'})
-                }
-
-        # Validate data types
-        if not isinstance(body['description'], str) or not body['description']:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-                    'Access-Control-Allow-Methods': 'GET, POST, DELETE'
-                },
-                'body': json.dumps({'message': 'Validation Error: "description" must be a non-empty string.'})
-            }
-        
-        # This is the key check: ensure 'amount' is a number
-        if not isinstance(body['amount'], (int, float, Decimal)):
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-                    'Access-Control-Allow-Methods': 'GET, POST, DELETE'
-                },
-                'body': json.dumps({'message': 'Validation Error: "amount" must be a number.'})
-            }
-
-        if not isinstance(body['category'], str):
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-                    'Access-Control-Allow-Methods': 'GET, POST, DELETE'
-                },
-                'body': json.dumps({'message': 'Validation Error: "category" must be a string.'})
-            }
-        
-        if not isinstance(body['date'], str):
+        error = validate_expense(body)
+        if error:
             return {
                 'statusCode': 400,
                 'headers': {
@@ -101,26 +311,13 @@ def add_expense(event):
                     'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                     'Access-Control-Allow-Methods': 'GET, POST, DELETE'
                 },
-                'body': json.dumps({'message': 'Validation Error: "date" must be a string.'})
+                'body': serializer.dumps({'message': f'Validation Error: {error}'})
             }
-
         # --- End of Validation Check ---
 
-        # Generate a Unix timestamp
-        timestamp = int(datetime.utcnow().timestamp() * 1000)
-
-        # Prepare the expense item for DynamoDB, converting amount to Decimal
-        expense = {
-            'expenseId': int(timestamp), # Using timestamp as a unique ID
-            'description': body['description'],
-            'timestamp': timestamp,
-            'amount': Decimal(str(body['amount'])),
-            'category': body['category'],
-            'date': body['date']
-        }
-        
-        # In a real-world scenario, you should get the table object from an external source or a global scope.
-        table.put_item(Item=expense)
+        expense = build_expense(body)
+        put_expense(expense)
+        expense_cache.clear()
 
         return {
             'statusCode': 201,
@@ -129,7 +326,7 @@ def add_expense(event):
                 'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                 'Access-Control-Allow-Methods': 'GET, POST, DELETE'
             },
-            'body': json.dumps({'message': 'Expense added successfully!'})
+            'body': serializer.dumps({'message': 'Expense added successfully!'})
         }
 
     except json.JSONDecodeError:
@@ -140,7 +337,7 @@ def add_expense(event):
                 'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                 'Access-Control-Allow-Methods': 'GET, POST, DELETE'
             },
-            'body': json.dumps({'message': 'Invalid JSON format.'})
+            'body': serializer.dumps({'message': 'Invalid JSON format.'})
         }
     except Exception as e:
         # Catch any other unexpected errors
@@ -151,35 +348,532 @@ def add_expense(event):
                 'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                 'Access-Control-Allow-Methods': 'GET, POST, DELETE'
             },
-            'body': json.dumps({'message': 'Internal Server Error', 'error': str(e)})
+            'body': serializer.dumps({'message': 'Internal Server Error', 'error': str(e)})
         }
 
-def get_expenses(event):
+def encode_cursor(last_evaluated_key):
+    """
+    Turns a DynamoDB LastEvaluatedKey into an opaque, URL-safe 'next' token.
+    """
+    if not last_evaluated_key:
+        return None
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+    key = {name: serializer.serialize(value) for name, value in last_evaluated_key.items()}
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """
+    Turns a 'next' token back into an ExclusiveStartKey. Raises ValueError if the token is invalid.
+    """
+    from boto3.dynamodb.types import TypeDeserializer
     try:
-        # Check for query parameters and specifically the 'category' parameter
-        query_params = event.get('queryStringParameters')
-        
-        if query_params and 'category' in query_params:
-            category = query_params['category']
-            # Use a Scan with a FilterExpression to filter by category
-            response = table.scan(
-                FilterExpression=boto3.dynamodb.conditions.Attr('category').eq(category)
-            )
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        deserializer = TypeDeserializer()
+        return {name: deserializer.deserialize(value) for name, value in key.items()}
+    except Exception:
+        raise ValueError('Invalid "next" token.')
+
+def check_cursor_key(key, names):
+    """
+    Raises ValueError unless a decoded 'next' token has exactly the given attributes,
+    with a numeric expenseId and string dates and partition keys. A token from
+    another kind of query is then a validation error instead of a DynamoDB one.
+    """
+    if set(key) != names or not isinstance(key['expenseId'], Decimal) \
+            or not all(isinstance(key[name], str) for name in names - {'expenseId'}):
+        raise ValueError('Invalid "next" token.')
+
+def expense_index(order, category):
+    """
+    Returns the index query_expenses reads for this order and category.
+    """
+    if order == 'created':
+        return ID_INDEX
+    return CATEGORY_INDEX if category else DATE_INDEX
+
+def check_expenses_cursor(cursor, order, category, date_from, date_to, since_ms):
+    """
+    Raises ValueError unless a 'next' token can continue this get_expenses query:
+    it must come from the same index and partition and lie within the date or
+    creation range, or DynamoDB rejects it.
+    """
+    key = decode_cursor(cursor)
+    check_cursor_key(key, CURSOR_KEYS[expense_index(order, category)])
+    if key.get('recordType', RECORD_TYPE) != RECORD_TYPE or key.get('category', category) != category \
+            or (date_from and key.get('date', date_from) < date_from) \
+            or (date_to and key.get('date', date_to) > date_to) \
+            or (since_ms is not None and key['expenseId'] < id_floor(since_ms)):
+        raise ValueError('Invalid "next" token.')
+
+def parse_since(value):
+    """
+    Parses the 'since' query parameter (Unix time in ms, or an ISO 8601 date/time) into Unix ms.
+    Raises ValueError if it is neither.
+    """
+    if value.isdigit():
+        return int(value)
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError('"since" must be a Unix time in ms or an ISO 8601 date/time.')
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+def query_expenses(category=None, date_from=None, date_to=None, limit=DEFAULT_PAGE_SIZE, cursor=None,
+                   order='date', since_ms=None):
+    """
+    Reads one page of expenses through a Query on one of the sorted indexes.
+
+    With order='date' expenses come newest date first. With order='created' they
+    come newest first by creation time (expenseId), optionally only those created
+    since since_ms; "latest N" and "since X" are then a single range read.
+
+    Returns (expenses, next_cursor). next_cursor is None on the last page.
+    """
+    from boto3.dynamodb.conditions import Key
+
+    index_name = expense_index(order, category)
+    if order == 'created':
+        key_condition = Key('recordType').eq(RECORD_TYPE)
+        if since_ms is not None:
+            key_condition = key_condition & Key('expenseId').gte(id_floor(since_ms))
+    else:
+        if category:
+            key_condition = Key('category').eq(category)
         else:
-            # If no category parameter is provided, perform a simple full scan
-            response = table.scan()
+            key_condition = Key('recordType').eq(RECORD_TYPE)
+
+        if date_from and date_to:
+            key_condition = key_condition & Key('date').between(date_from, date_to)
+        elif date_from:
+            key_condition = key_condition & Key('date').gte(date_from)
+        elif date_to:
+            key_condition = key_condition & Key('date').lte(date_to)
+
+    query_args = {
+        'IndexName': index_name,
+        'KeyConditionExpression': key_condition,
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    if cursor:
+        query_args['ExclusiveStartKey'] = decode_cursor(cursor)
+
+    response = get_table().query(**query_args)
+
+    # Decimals are left as they are; serializer.dumps converts them while writing the body
+    return response['Items'], encode_cursor(response.get('LastEvaluatedKey'))
+
+def get_expenses(event):
+    try:
+        # Supported query parameters: category, from, to (YYYY-MM-DD), order (date or created),
+        # since (only with creation order), limit and next
+        query_params = event.get('queryStringParameters') or {}
+        category = query_params.get('category')
+        date_from = query_params.get('from')
+        date_to = query_params.get('to')
+        cursor = query_params.get('next')
+        since = query_params.get('since')
+        order = query_params.get('order', 'created' if since else 'date')
+
+        try:
+            if order not in ('date', 'created'):
+                raise ValueError('"order" must be "date" or "created".')
+            if order == 'created' and (category or date_from or date_to):
+                raise ValueError('"category", "from" and "to" cannot be used with creation order.')
+            since_ms = parse_since(since) if since else None
+            limit = query_params.get('limit', str(DEFAULT_PAGE_SIZE))
+            if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+                raise ValueError(f'"limit" must be a number between 1 and {MAX_PAGE_SIZE}.')
+            limit = int(limit)
+            if cursor:
+                check_expenses_cursor(cursor, order, category, date_from, date_to, since_ms)
+        except ValueError as e:
+            message = str(e)
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                    'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,DELETE,PATCH'
+                },
+                'body': serializer.dumps({'message': f'Validation Error: {message}'})
+            }
+
+        (expenses, next_cursor), cache_status = expense_cache.get_or_load(
+            (current_data_version(), category, date_from, date_to, limit, cursor, order, since_ms),
+            lambda: query_expenses(category, date_from, date_to, limit, cursor, order, since_ms)
+        )
+        print(f"Expense cache {cache_status}: {expense_cache.stats()}")
 
-        # Convert Decimal to float or int for JSON serialization
-        expenses = convert_decimal_to_float(response['Items'])
-        
         return {
             'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,DELETE,PATCH',
+                'X-Cache': cache_status
+            },
+            'body': serializer.dumps({'expenses': expenses, 'next': next_cursor})
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                 'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,DELETE,PATCH'
             },
-            'body': json.dumps({'expenses': expenses})
+            'body': serializer.dumps({'message': 'Error fetching expenses', 'error': str(e)})
+        }
+
+def summary_buckets(expense):
+    """
+    Returns the (summaryType, bucket) keys an expense is counted in.
+    """
+    month = expense['date'][:7]
+    return [
+        ('month', month),
+        ('category', expense['category']),
+        ('month-category', f"{month}#{expense['category']}")
+    ]
+
+def summary_update(summary_type, bucket, amount, count):
+    return {
+        'TableName': EXPENSE_SUMMARY_TABLE,
+        'Key': {'summaryType': summary_type, 'bucket': bucket},
+        'UpdateExpression': 'ADD #total :amount, #count :count',
+        'ExpressionAttributeNames': {'#total': 'total', '#count': 'count'},
+        'ExpressionAttributeValues': {':amount': amount, ':count': count}
+    }
+
+def summary_updates(expense, sign):
+    """
+    Builds the transaction items that add (sign=1) or remove (sign=-1) an expense
+    from its month, category and month x category totals.
+    """
+    return [
+        {'Update': summary_update(summary_type, bucket, expense['amount'] * sign, sign)}
+        for summary_type, bucket in summary_buckets(expense)
+    ]
+
+def data_version_update():
+    return {
+        'TableName': EXPENSE_SUMMARY_TABLE,
+        'Key': DATA_VERSION_KEY,
+        'UpdateExpression': 'ADD #version :one',
+        'ExpressionAttributeNames': {'#version': 'version'},
+        'ExpressionAttributeValues': {':one': 1}
+    }
+
+def bump_data_version():
+    """
+    Marks the expenses as changed after writes made outside a transaction
+    (the batch endpoints), and clears this container's cache.
+    """
+    update = data_version_update()
+    del update['TableName']
+    get_table(EXPENSE_SUMMARY_TABLE).update_item(**update)
+    expense_cache.clear()
+
+def current_data_version():
+    """
+    Returns the data version, read consistently so a change is seen right away.
+    Cached lists and summaries are keyed by it, so their bodies and ETags change
+    as soon as the expenses do.
+    """
+    item = get_table(EXPENSE_SUMMARY_TABLE).get_item(Key=DATA_VERSION_KEY, ConsistentRead=True).get('Item')
+    return int(item['version']) if item else 0
+
+def search_index_keys(expense):
+    """
+    Returns the keys of an expense's entries in the search index, one per word of its description.
+    """
+    return [
+        {'bucket': bucket, 'entry': entry}
+        for bucket, entry in text_index.index_keys(expense['description'], expense['date'], expense['expenseId'])
+    ]
+
+def search_index_items(expense):
+    return [dict(key, expenseId=expense['expenseId'], date=expense['date']) for key in search_index_keys(expense)]
+
+def update_search_index(added=(), removed=()):
+    """
+    Adds the search index entries of the added expenses and deletes those of the
+    removed ones, 25 per BatchWriteItem call. Used by the batch endpoints instead
+    of a transaction per expense. Unprocessed entries are retried with backoff.
+    """
+    requests = [{'PutRequest': {'Item': item}} for expense in added for item in search_index_items(expense)]
+    requests += [{'DeleteRequest': {'Key': key}} for expense in removed for key in search_index_keys(expense)]
+
+    for start in range(0, len(requests), BATCH_WRITE_SIZE):
+        pending = requests[start:start + BATCH_WRITE_SIZE]
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            response = get_dynamodb().batch_write_item(RequestItems={EXPENSE_SEARCH_TABLE: pending})
+            pending = response.get('UnprocessedItems', {}).get(EXPENSE_SEARCH_TABLE, [])
+            if not pending:
+                break
+            time.sleep(backoff_delay(attempt))
+        if pending:
+            print(f"{len(pending)} search index entries not written after retries")
+
+def put_expense(expense):
+    """
+    Writes a new expense and updates its summary totals, search index entries
+    and the data version in one transaction.
+    """
+    get_dynamodb().meta.client.transact_write_items(TransactItems=[
+        {
+            'Put': {
+                'TableName': EXPENSES_TABLE,
+                'Item': expense,
+                'ConditionExpression': 'attribute_not_exists(expenseId)'
+            }
+        }
+    ] + summary_updates(expense, 1) + [{'Update': data_version_update()}] + [
+        {'Put': {'TableName': EXPENSE_SEARCH_TABLE, 'Item': item}} for item in search_index_items(expense)
+    ])
+
+def remove_expense(expense_id):
+    """
+    Deletes an expense and takes it out of its summary totals and the search index
+    in one transaction, which also increments the data version. Returns False if
+    the expense does not exist.
+    """
+    expense = get_table().get_item(Key={'expenseId': expense_id}, ConsistentRead=True).get('Item')
+    if not expense:
+        return False
+
+    try:
+        get_dynamodb().meta.client.transact_write_items(TransactItems=[
+            {
+                'Delete': {
+                    'TableName': EXPENSES_TABLE,
+                    'Key': {'expenseId': expense_id},
+                    # Fails the whole transaction if another request deleted it first
+                    'ConditionExpression': 'attribute_exists(expenseId)'
+                }
+            }
+        ] + summary_updates(expense, -1) + [{'Update': data_version_update()}] + [
+            {'Delete': {'TableName': EXPENSE_SEARCH_TABLE, 'Key': key}} for key in search_index_keys(expense)
+        ])
+    except get_dynamodb().meta.client.exceptions.TransactionCanceledException as e:
+        reasons = e.response.get('CancellationReasons', [])
+        if reasons and reasons[0].get('Code') == 'ConditionalCheckFailed':
+            return False
+        raise
+
+    return True
+
+def query_summary(summary_type, start=None, end=None):
+    """
+    Reads every bucket of one summary type, optionally limited to a bucket range.
+    Costs one read per bucket, however many expenses there are.
+    """
+    from boto3.dynamodb.conditions import Key
+
+    key_condition = Key('summaryType').eq(summary_type)
+    if start and end:
+        key_condition = key_condition & Key('bucket').between(start, end)
+    elif start:
+        key_condition = key_condition & Key('bucket').gte(start)
+    elif end:
+        key_condition = key_condition & Key('bucket').lte(end)
+
+    query_args = {'KeyConditionExpression': key_condition}
+    buckets = []
+    while True:
+        response = get_table(EXPENSE_SUMMARY_TABLE).query(**query_args)
+        # Buckets whose expenses were all deleted stay behind with a count of 0
+        buckets.extend(item for item in response['Items'] if item.get('count', 0) > 0)
+        if 'LastEvaluatedKey' not in response:
+            return buckets
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def build_summary(month_from=None, month_to=None):
+    """
+    Returns totals and counts per month, per category and per month x category.
+    The month range (YYYY-MM) applies to the month and month x category views.
+    """
+    months = query_summary('month', month_from, month_to)
+    categories = query_summary('category')
+    # '~' sorts after '#' and every category name, so the range covers all categories of month_to
+    month_categories = query_summary(
+        'month-category',
+        month_from,
+        f"{month_to}#~" if month_to else None
+    )
+
+    summary = {
+        'months': [
+            {'month': item['bucket'], 'total': item['total'], 'count': item['count']}
+            for item in months
+        ],
+        'categories': [
+            {'category': item['bucket'], 'total': item['total'], 'count': item['count']}
+            for item in categories
+        ],
+        'monthCategories': [
+            {
+                'month': item['bucket'].split('#', 1)[0],
+                'category': item['bucket'].split('#', 1)[1],
+                'total': item['total'],
+                'count': item['count']
+            }
+            for item in month_categories
+        ]
+    }
+    return summary
+
+def get_summary(event):
+    try:
+        # Supported query parameters: from, to (YYYY-MM)
+        query_params = event.get('queryStringParameters') or {}
+        month_from = query_params.get('from')
+        month_to = query_params.get('to')
+
+        summary, cache_status = expense_cache.get_or_load(
+            ('summary', current_data_version(), month_from, month_to),
+            lambda: build_summary(month_from, month_to)
+        )
+        print(f"Expense cache {cache_status}: {expense_cache.stats()}")
+
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,DELETE,PATCH',
+                'X-Cache': cache_status
+            },
+            'body': serializer.dumps(summary)
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,DELETE,PATCH'
+            },
+            'body': serializer.dumps({'message': 'Error fetching expense summary', 'error': str(e)})
+        }
+
+def query_search_term(term, is_prefix, date_from=None, date_to=None):
+    """
+    Reads every search index entry of one term dated from date_from to date_to
+    (YYYY-MM-DD, inclusive, optional). A whole word is one key range; a prefix
+    reads all words starting with it and drops other dates here.
+    Returns a dict of expenseId -> date.
+    """
+    from boto3.dynamodb.conditions import Key
+
+    key_condition = Key('bucket').eq(text_index.bucket(term))
+    if is_prefix:
+        key_condition = key_condition & Key('entry').begins_with(term)
+    else:
+        key_condition = key_condition & Key('entry').between(*text_index.entry_range(term, date_from, date_to))
+
+    query_args = {
+        'KeyConditionExpression': key_condition,
+        'ProjectionExpression': 'expenseId, #date',
+        'ExpressionAttributeNames': {'#date': 'date'}
+    }
+    found = {}
+    while True:
+        response = get_table(EXPENSE_SEARCH_TABLE).query(**query_args)
+        for item in response['Items']:
+            if (date_from and item['date'] < date_from) or (date_to and item['date'] > date_to):
+                continue
+            found[item['expenseId']] = item['date']
+        if 'LastEvaluatedKey' not in response:
+            return found
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def find_expenses(terms, date_from=None, date_to=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    Reads one page of the expenses whose description has every term, newest date first.
+
+    Each term's index entries are read concurrently and the sets of expense IDs
+    intersected, so the cost grows with the number of expenses matching each
+    term, not with the size of the table. Only the expenses on the page are
+    then read, and checked against the terms in case the index is behind.
+
+    Returns (expenses, next_cursor, matches), where matches counts all pages.
+    """
+    with ThreadPoolExecutor(max_workers=len(terms)) as executor:
+        futures = [
+            executor.submit(metrics.bind(query_search_term), term, is_prefix, date_from, date_to)
+            for term, is_prefix in terms
+        ]
+        results = [future.result() for future in futures]
+
+    results.sort(key=len)
+    dates = results[0]
+    expense_ids = set(dates).intersection(*results[1:])
+    ordered = sorted(expense_ids, key=lambda expense_id: (dates[expense_id], expense_id), reverse=True)
+
+    if cursor:
+        last = decode_cursor(cursor)
+        ordered = [expense_id for expense_id in ordered
+                   if (dates[expense_id], expense_id) < (last['date'], last['expenseId'])]
+
+    page = ordered[:limit]
+    next_cursor = None
+    if len(ordered) > limit:
+        next_cursor = encode_cursor({'date': dates[page[-1]], 'expenseId': page[-1]})
+
+    found = batch_get_expenses(page)
+    expenses = [found[expense_id] for expense_id in page
+                if expense_id in found and text_index.matches(found[expense_id]['description'], terms)]
+    return expenses, next_cursor, len(expense_ids)
+
+def search_expenses(event):
+    try:
+        # Supported query parameters: q (words, "coff*" for a prefix, all must match),
+        # from, to (YYYY-MM-DD), limit and next
+        query_params = event.get('queryStringParameters') or {}
+        date_from = query_params.get('from')
+        date_to = query_params.get('to')
+        cursor = query_params.get('next')
+
+        try:
+            terms = text_index.parse_query(query_params.get('q'))
+            limit = query_params.get('limit', str(DEFAULT_PAGE_SIZE))
+            if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+                raise ValueError(f'"limit" must be a number between 1 and {MAX_PAGE_SIZE}.')
+            limit = int(limit)
+            if cursor:
+                check_cursor_key(decode_cursor(cursor), {'date', 'expenseId'})
+        except ValueError as e:
+            message = str(e)
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                    'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,DELETE,PATCH'
+                },
+                'body': serializer.dumps({'message': f'Validation Error: {message}'})
+            }
+
+        (expenses, next_cursor, match_count), cache_status = expense_cache.get_or_load(
+            ('search', current_data_version(), tuple(terms), date_from, date_to, limit, cursor),
+            lambda: find_expenses(terms, date_from, date_to, limit, cursor)
+        )
+        print(f"Expense cache {cache_status}: {expense_cache.stats()}")
+
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,DELETE,PATCH',
+                'X-Cache': cache_status
+            },
+            'body': serializer.dumps({'expenses': expenses, 'next': next_cursor, 'matches': match_count})
         }
     except Exception as e:
         return {
@@ -189,7 +883,7 @@ def get_expenses(event):
                 'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                 'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,DELETE,PATCH'
             },
-            'body': json.dumps({'message': 'Error fetching expenses', 'error': str(e)})
+            'body': serializer.dumps({'message': 'Error searching expenses', 'error': str(e)})
         }
 
 def delete_expense(event, context):
@@ -207,15 +901,21 @@ def delete_expense(event, context):
                     'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                     'Access-Control-Allow-Methods': 'GET, POST, DELETE'
                 },
-                'body': json.dumps({'message': 'Invalid expenseId. It must be a number.'})
+                'body': serializer.dumps({'message': 'Invalid expenseId. It must be a number.'})
             }
 
-        delete_response = table.delete_item(
-            Key={
-                'expenseId': expense_id
+        if not remove_expense(expense_id):
+            return {
+                'statusCode': 404,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                    'Access-Control-Allow-Methods': 'GET, POST, DELETE'
+                },
+                'body': serializer.dumps({'message': f'Expense with ID {expense_id} not found.'})
             }
-        )
-        
+        expense_cache.clear()
+
         return {
             'statusCode': 200,
             'headers': {
@@ -223,7 +923,7 @@ def delete_expense(event, context):
                 'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                 'Access-Control-Allow-Methods': 'GET, POST, DELETE'
             },
-            'body': json.dumps({'message': f'Expense with ID {expense_id} deleted successfully!'})
+            'body': serializer.dumps({'message': f'Expense with ID {expense_id} deleted successfully!'})
         }
 
     except Exception as e:
@@ -234,9 +934,351 @@ def delete_expense(event, context):
                 'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                 'Access-Control-Allow-Methods': 'GET, POST, DELETE'
             },
-            'body': json.dumps({'message': 'Error deleting expense', 'error': str(e)})
+            'body': serializer.dumps({'message': 'Error deleting expense', 'error': str(e)})
         }
 
+def apply_summary_deltas(deltas):
+    """
+    Adds the (total, count) change of each summary bucket, with one update per bucket.
+    Used by the batch endpoints instead of a transaction per expense.
+    """
+    for (summary_type, bucket), (amount, count) in deltas.items():
+        update = summary_update(summary_type, bucket, amount, count)
+        del update['TableName']
+        get_table(EXPENSE_SUMMARY_TABLE).update_item(**update)
+
+def apply_batch_changes(added=(), removed=()):
+    """
+    Updates the summary totals, search index and data version for the expenses a
+    batch endpoint added or removed. Every step is tried even if an earlier one
+    fails, so written rows are not left out of the totals, the index or the
+    cache invalidation; the first error is raised afterwards.
+    """
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for expense in added:
+        for bucket in summary_buckets(expense):
+            deltas[bucket][0] += expense['amount']
+            deltas[bucket][1] += 1
+    for expense in removed:
+        for bucket in summary_buckets(expense):
+            deltas[bucket][0] -= expense['amount']
+            deltas[bucket][1] -= 1
+
+    steps = [lambda: apply_summary_deltas(deltas), lambda: update_search_index(added=added, removed=removed)]
+    if added or removed:
+        steps.append(bump_data_version)
+
+    first_error = None
+    for step in steps:
+        try:
+            step()
+        except Exception as e:
+            print(f"Failed to apply batch changes: {e}")
+            first_error = first_error or e
+    if first_error:
+        raise first_error
+
+def read_batch_rows(event):
+    """
+    Yields (row_number, row) for each expense in a batch body, numbered from 1.
+
+    The body is either a JSON array of expenses or CSV with a header line
+    (description,amount,category,date). It is read as CSV if its first line is
+    such a header; a CSV Content-Type requires one. CSV is read one line at a time,
+    and its amounts are converted to numbers so the rows validate like JSON ones.
+    Raises ValueError for any other body.
+    """
+    body = event['body']
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+
+    headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+    # Parsed like csv.DictReader parses it, so the check matches the row keys
+    header = next(csv.reader(io.StringIO(body.lstrip())), [])
+    has_header = CSV_COLUMNS <= {column.strip() for column in header}
+
+    if 'csv' in headers.get('content-type', '') and not has_header:
+        raise ValueError('CSV must start with a header line: description,amount,category,date.')
+    if not has_header:
+        rows = json.loads(body)
+        if not isinstance(rows, list):
+            raise ValueError('Body must be a JSON array of expenses or CSV with a header line.')
+        for row_number, row in enumerate(rows, start=1):
+            yield row_number, row
+        return
+
+    for row_number, row in enumerate(csv.DictReader(io.StringIO(body)), start=1):
+        row = {key.strip(): value for key, value in row.items() if key and value is not None}
+        if 'amount' in row:
+            try:
+                amount = Decimal(row['amount'].strip())
+                if amount.is_finite():
+                    row['amount'] = amount
+            except InvalidOperation:
+                pass
+        yield row_number, row
+
+def expense_key(write_request):
+    if 'PutRequest' in write_request:
+        return write_request['PutRequest']['Item']['expenseId']
+    return write_request['DeleteRequest']['Key']['expenseId']
+
+def batch_write(chunk):
+    """
+    Sends up to 25 (row_number, write_request) pairs in one BatchWriteItem call.
+
+    Unprocessed items are retried with jittered backoff. Returns a dict of
+    row_number -> error for the rows that were not written.
+    """
+    pending = chunk
+    for attempt in range(BATCH_MAX_ATTEMPTS):
+        try:
+            response = get_dynamodb().batch_write_item(
+                RequestItems={EXPENSES_TABLE: [write_request for _, write_request in pending]}
+            )
+        except Exception as e:
+            return {row_number: str(e) for row_number, _ in pending}
+
+        unprocessed = response.get('UnprocessedItems', {}).get(EXPENSES_TABLE, [])
+        if not unprocessed:
+            return {}
+
+        unprocessed_keys = {expense_key(write_request) for write_request in unprocessed}
+        pending = [(row_number, write_request) for row_number, write_request in pending
+                   if expense_key(write_request) in unprocessed_keys]
+        time.sleep(backoff_delay(attempt))
+
+    return {row_number: 'Not processed by DynamoDB after retries.' for row_number, _ in pending}
+
+def batch_get_expenses(expense_ids):
+    """
+    Reads the given expenses, 100 keys per BatchGetItem call. Returns a dict of expenseId -> item.
+    """
+    found = {}
+    for start in range(0, len(expense_ids), BATCH_GET_SIZE):
+        request_items = {EXPENSES_TABLE: {'Keys': [{'expenseId': expense_id} for expense_id in expense_ids[start:start + BATCH_GET_SIZE]]}}
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            response = get_dynamodb().batch_get_item(RequestItems=request_items)
+            for item in response['Responses'].get(EXPENSES_TABLE, []):
+                found[item['expenseId']] = item
+            request_items = response.get('UnprocessedKeys')
+            if not request_items:
+                break
+            time.sleep(backoff_delay(attempt))
+    return found
+
+def batch_response(status_code, processed, errors, action):
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+            'Access-Control-Allow-Methods': 'GET, POST, DELETE'
+        },
+        'body': serializer.dumps({
+            action: processed,
+            'failed': len(errors),
+            'errors': [{'row': row_number, 'error': error} for row_number, error in sorted(errors.items())]
+        })
+    }
+
+def add_expenses_batch(event):
+    """
+    Adds many expenses from a JSON array or CSV body, 25 per BatchWriteItem call.
+    Each row is validated on its own; invalid or unwritten rows are reported by row number.
+    The whole body is parsed before the first write, so a malformed one adds nothing.
+    """
+    try:
+        if not event.get('body'):
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                    'Access-Control-Allow-Methods': 'GET, POST, DELETE'
+                },
+                'body': serializer.dumps({'message': 'Invalid request: Body is missing.'})
+            }
+
+        rows = list(read_batch_rows(event))
+        errors = {}
+        added = []
+        chunk = []
+        expenses_by_row = {}
+
+        def flush():
+            failed = batch_write(chunk)
+            errors.update(failed)
+            added.extend(expense for row_number, expense in expenses_by_row.items() if row_number not in failed)
+            chunk.clear()
+            expenses_by_row.clear()
+
+        try:
+            for row_number, row in rows:
+                error = validate_expense(row) if isinstance(row, dict) else 'Row must be an object.'
+                if error:
+                    errors[row_number] = f'Validation Error: {error}'
+                    continue
+
+                expense = build_expense(row)
+                expenses_by_row[row_number] = expense
+                chunk.append((row_number, {'PutRequest': {'Item': expense}}))
+                if len(chunk) == BATCH_WRITE_SIZE:
+                    flush()
+            if chunk:
+                flush()
+        finally:
+            # Also when a later chunk fails, for the rows that were written
+            apply_batch_changes(added=added)
+
+        status_code = 201 if not errors else (207 if added else 400)
+        return batch_response(status_code, len(added), errors, 'added')
+
+    except (json.JSONDecodeError, csv.Error, UnicodeDecodeError):
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                'Access-Control-Allow-Methods': 'GET, POST, DELETE'
+            },
+            'body': serializer.dumps({'message': 'Invalid JSON or CSV format.'})
+        }
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                'Access-Control-Allow-Methods': 'GET, POST, DELETE'
+            },
+            'body': serializer.dumps({'message': f'Invalid request: {e}'})
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                'Access-Control-Allow-Methods': 'GET, POST, DELETE'
+            },
+            'body': serializer.dumps({'message': 'Internal Server Error', 'error': str(e)})
+        }
+
+def delete_expenses_batch(event):
+    """
+    Deletes many expenses given as {"expenseIds": [...]} (or a bare JSON array), 25 per BatchWriteItem call.
+    Invalid, unknown or undeleted IDs are reported by their position in the list, numbered from 1.
+    """
+    try:
+        body = json.loads(event.get('body') or 'null')
+        expense_ids = body.get('expenseIds') if isinstance(body, dict) else body
+        if not isinstance(expense_ids, list):
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                    'Access-Control-Allow-Methods': 'GET, POST, DELETE'
+                },
+                'body': serializer.dumps({'message': 'Invalid request: Body must contain an "expenseIds" list.'})
+            }
+
+        errors = {}
+        rows_by_id = {}
+        for row_number, expense_id in enumerate(expense_ids, start=1):
+            try:
+                expense_id = Decimal(str(expense_id))
+            except InvalidOperation:
+                errors[row_number] = 'Invalid expenseId. It must be a number.'
+                continue
+            if expense_id in rows_by_id:
+                errors[row_number] = 'Duplicate expenseId.'
+                continue
+            rows_by_id[expense_id] = row_number
+
+        # The items are needed to take them out of the summary totals
+        existing = batch_get_expenses(list(rows_by_id))
+        for expense_id, row_number in rows_by_id.items():
+            if expense_id not in existing:
+                errors[row_number] = f'Expense with ID {expense_id} not found.'
+
+        deleted = []
+        requests = [(rows_by_id[expense_id], {'DeleteRequest': {'Key': {'expenseId': expense_id}}})
+                    for expense_id in existing]
+        try:
+            for start in range(0, len(requests), BATCH_WRITE_SIZE):
+                chunk = requests[start:start + BATCH_WRITE_SIZE]
+                failed = batch_write(chunk)
+                errors.update(failed)
+                deleted.extend(existing[expense_key(write_request)] for row_number, write_request in chunk
+                               if row_number not in failed)
+        finally:
+            # Also when a later chunk fails, for the rows that were deleted
+            apply_batch_changes(removed=deleted)
+
+        status_code = 200 if not errors else (207 if deleted else 400)
+        return batch_response(status_code, len(deleted), errors, 'deleted')
+
+    except json.JSONDecodeError:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                'Access-Control-Allow-Methods': 'GET, POST, DELETE'
+            },
+            'body': serializer.dumps({'message': 'Invalid JSON format.'})
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+                'Access-Control-Allow-Methods': 'GET, POST, DELETE'
+            },
+            'body': serializer.dumps({'message': 'Error deleting expenses', 'error': str(e)})
+        }
+
+def export_expenses(event):
+    """
+    Exports the whole expense table with a parallel scan. Invoked directly, e.g.:
+
+        {"action": "export", "destination": "s3://my-bucket/expenses.ndjson.gz",
+         "format": "ndjson", "segments": 8, "gzip": true}
+
+    'format' is 'ndjson' (default) or 'csv'. 'destination' is an s3:// URL or a path
+    under /tmp. Returns the number of rows written and how long the export took.
+    """
+    destination = event.get('destination')
+    if not destination:
+        return {'error': 'Missing "destination".'}
+
+    fmt = event.get('format', 'ndjson')
+    segments = event.get('segments', 4)
+    if not str(segments).isdigit() or int(segments) < 1:
+        return {'error': '"segments" must be a whole number of at least 1.'}
+    segments = int(segments)
+    start = time.monotonic()
+
+    try:
+        rows = export_to_destination(
+            get_table(),
+            destination,
+            fmt=fmt,
+            total_segments=segments,
+            fields=EXPORT_FIELDS,
+            compress=bool(event.get('gzip'))
+        )
+    except Exception as e:
+        print(f"Export failed: {e}")
+        return {'error': str(e)}
+
+    seconds = round(time.monotonic() - start, 3)
+    print(f"Exported {rows} expenses to {destination} in {seconds}s using {segments} segments")
+    return {'rows': rows, 'destination': destination, 'format': fmt, 'segments': segments, 'seconds': seconds}
+
 def update_expense(event):
     try:
         # Extract expenseId from the path parameter
@@ -270,7 +1312,7 @@ def update_expense(event):
         update_expression = update_expression.rstrip(',')
 
         # Perform the update in DynamoDB
-        response = table.update_item(
+        response = get_table().update_item(
             Key={
                 'expenseId': expense_id,
                 'timestamp': 0  # Adjust if necessary
@@ -287,7 +1329,7 @@ def update_expense(event):
                 'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                 'Access-Control-Allow-Methods': 'GET, POST, DELETE'
             },
-            'body': json.dumps({'message': f'Expense with ID {expense_id} updated successfully!'})
+            'body': serializer.dumps({'message': f'Expense with ID {expense_id} updated successfully!'})
         }
 
     except Exception as e:
@@ -298,61 +1340,5 @@ def update_expense(event):
                 'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
                 'Access-Control-Allow-Methods': 'GET, POST, DELETE'
             },
-            'body': json.dumps({'message': 'Error updating expense', 'error': str(e)})
+            'body': serializer.dumps({'message': 'Error updating expense', 'error': str(e)})
         }
-
-
-def get_expenses_by_category(event, context):
-    try:
-        # Extract the category from the path parameters
-        if 'pathParameters' not in event or 'category' not in event['pathParameters']:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                },
-                'body': json.dumps({'message': 'Category path parameter is missing.'})
-            }
-            
-        category_name = event['pathParameters']['category']
-
-        # Use the query operation which is more efficient for filtered data
-        # 'category' needs to be a partition key (or a GSI partition key) on your DynamoDB table
-        response = table.query(
-            KeyConditionExpression=Key('category').eq(category_name)
-        )
-        
-        expenses = response['Items']
-
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-                'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,DELETE,PATCH'
-            },
-            'body': json.dumps(expenses, cls=DecimalEncoder)
-        }
-    except Exception as e:
-        print(f"Error fetching expenses: {e}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-                'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,DELETE,PATCH'
-            },
-            'body': json.dumps({'message': 'Error fetching expenses', 'error': str(e)})
-        }
-
-# Helper function to convert DynamoDB Decimal objects to native Python types
-def convert_decimal_to_float(items):
-    if isinstance(items, list):
-        return [convert_decimal_to_float(item) for item in items]
-    elif isinstance(items, dict):
-        return {key: convert_decimal_to_float(value) for key, value in items.items()}
-    elif isinstance(items, Decimal):
-        # Convert Decimal to float
-        return float(items)
-    else:
-        return items
@@ -1,91 +1,555 @@
-import json
-import requests
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from datetime import datetime, timezone
 
-def get_github_activity(username, headers):
+from common import http_client, metrics, rate_limit, responses, serializer
+from common.cache import TTLCache
+from common.history import END_OF_PREFIX, create_history, decode_cursor
+from common.store import create_store
+
+# Base URL of the GitHub REST API
+GITHUB_API_URL = os.environ.get('GITHUB_API_URL', 'https://api.github.com')
+
+# Timeout (in seconds) for each dashboard section, including all of its pages.
+# The sections run concurrently, so this is also roughly the worst-case latency of the whole handler.
+GITHUB_SECTION_TIMEOUT = float(os.environ.get('GITHUB_SECTION_TIMEOUT', '10'))
+# Upper bound on the pages followed for one listing (100 items per page)
+GITHUB_MAX_PAGES = int(os.environ.get('GITHUB_MAX_PAGES', '10'))
+
+# Raw GitHub pages keyed by URL, with the validators needed for conditional requests.
+# The backend (memory, file or dynamodb) is picked with the STORE_BACKEND environment variable.
+response_cache = create_store('github-pages')
+
+# Formatted dashboard data per username, kept for the life of a warm container.
+# Fresh for 60s, then served stale for up to 5 minutes while it is refreshed.
+dashboard_cache = TTLCache(ttl=int(os.environ.get('GITHUB_CACHE_TTL', '60')), stale_ttl=300)
+
+# Browser/CDN caching of the dashboard. Profile and repositories change rarely,
+# so a response can be reused for 5 minutes and served stale for an hour while
+# it is revalidated. Partial responses must always be revalidated.
+GITHUB_CACHE_CONTROL = responses.cache_control(300, stale_while_revalidate=3600)
+
+# GitHub's rate limit for the token, tracked from the headers of its responses.
+# Each priority step keeps this many calls in reserve: follow-up pages stop
+# first, then the first pages of listings, and the profile only when none are left.
+GITHUB_RATE_LIMIT_RESERVE = int(os.environ.get('GITHUB_RATE_LIMIT_RESERVE', '50'))
+github_budget = rate_limit.RateLimitBudget(GITHUB_RATE_LIMIT_RESERVE)
+
+# Formatted activity per username, kept by time, and the ID of the newest event
+# added to it (the high-water mark). GitHub only lists the last 300 events, so
+# the history holds activity the events feed no longer has. Set
+# GITHUB_HISTORY_BACKEND (or STORE_BACKEND) to 'dynamodb' so it survives the container.
+GITHUB_HISTORY_BACKEND = os.environ.get('GITHUB_HISTORY_BACKEND')
+activity_history = create_history('github-activity', GITHUB_HISTORY_BACKEND)
+history_state = create_store('github-activity-state', GITHUB_HISTORY_BACKEND)
+
+# The events feed is checked for new events at most this often (in seconds) per
+# container. Checks are conditional requests, which are free when nothing changed.
+ingest_cache = TTLCache(ttl=int(os.environ.get('GITHUB_INGEST_INTERVAL', '60')))
+
+# Per-repository details that cost one call each (languages, weekly commits),
+# stored per full_name with the pushed_at they were fetched for. Only repos
+# pushed to since then are fetched again. Set GITHUB_ENRICHMENT_BACKEND (or
+# STORE_BACKEND) to 'dynamodb' so all containers share them.
+enrichment_store = create_store('github-repo-enrichment', os.environ.get('GITHUB_ENRICHMENT_BACKEND'))
+# Calls made at once while enriching, the most recently pushed repos enriched,
+# and the time (in seconds) enrichment may take before the repos left are
+# returned without details. Those are enriched on a later request.
+GITHUB_ENRICH_CONCURRENCY = int(os.environ.get('GITHUB_ENRICH_CONCURRENCY', '8'))
+GITHUB_ENRICH_MAX_REPOS = int(os.environ.get('GITHUB_ENRICH_MAX_REPOS', '50'))
+GITHUB_ENRICH_TIMEOUT = float(os.environ.get('GITHUB_ENRICH_TIMEOUT', '6'))
+# Weeks of commit counts kept per repo, newest last
+GITHUB_COMMIT_WEEKS = 12
+
+# Activity items in the dashboard's recent_activity section
+GITHUB_RECENT_ACTIVITY = int(os.environ.get('GITHUB_RECENT_ACTIVITY', '30'))
+# Page size for /activity when no 'limit' is given, and the largest one allowed
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def fetch_page(url, headers, priority):
     """
-    Fetches and formats a user's recent GitHub activity.
+    Fetches one GitHub page, with a conditional request if a copy is stored.
+
+    Each page is stored with its ETag/Last-Modified, and later calls send
+    If-None-Match/If-Modified-Since. On a 304 the stored page is reused;
+    GitHub does not count those against the rate limit.
+
+    If github_budget does not allow a call of this priority, the stored page is
+    returned without calling GitHub, or RateLimitedError is raised if there is none.
+    Returns (page, from_cache).
+    Raises http_client.RequestException if the call fails.
     """
+    cached = response_cache.get(url)
+
+    if not github_budget.acquire(priority):
+        if cached:
+            metrics.increment('GitHubBudgetFallbacks')
+            return cached, True
+        budget = github_budget.snapshot()
+        resume_at = budget["blocked_until"] or budget["reset"]
+        raise rate_limit.RateLimitedError(
+            "GitHub rate limit budget used up"
+            + (f", calls resume at {time.strftime('%H:%M:%S UTC', time.gmtime(resume_at))}" if resume_at else "")
+        )
+
+    request_headers = dict(headers)
+    if cached and cached.get("etag"):
+        request_headers["If-None-Match"] = cached["etag"]
+    elif cached and cached.get("last_modified"):
+        request_headers["If-Modified-Since"] = cached["last_modified"]
+
     try:
-        response = requests.get(f"https://api.github.com/users/{username}/events/public", headers=headers)
-        response.raise_for_status()
-        events = response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching GitHub events: {e}")
-        return []
-
-    activity_list = []
-    for event in events:
-        activity = {
-            "id": event.get("id"),
-            "type": event.get("type"),
-            "repo": event.get("repo", {}).get("name"),
-            "timestamp": event.get("created_at"),
-            "message": "No message available"
-        }
+        response = http_client.get(url, headers=request_headers)
+    except Exception:
+        github_budget.release()
+        raise
+    github_budget.update(response)
+
+    if response.status_code == 304 and cached:
+        return cached, False
+
+    response.raise_for_status()
+    page = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "next": response.links.get("next", {}).get("url"),
+        "body": response.json()
+    }
+    if page["etag"] or page["last_modified"]:
+        response_cache.put(url, page)
+    return page, False
+
+def fetch_all_pages(url, headers):
+    """
+    Fetches every page of a GitHub listing by following the Link header.
+    The first page has NORMAL priority and the rest LOW (see fetch_page).
+    Returns (items, from_cache), where from_cache is True if any page was
+    served from storage because of the rate limit budget.
+    Raises http_client.RequestException if a call fails.
+    """
+    items = []
+    page_url = f"{url}?per_page=100"
+    priority = rate_limit.NORMAL
+    from_cache = False
 
-        if event["type"] == "PushEvent":
-            activity["message"] = f"Pushed to {event['payload']['ref'].replace('refs/heads/', '')}"
-            activity["commits"] = len(event["payload"]["commits"])
-        elif event["type"] == "PullRequestEvent":
-            pr_action = event["payload"]["action"]
-            pr_title = event["payload"]["pull_request"]["title"]
-            activity["message"] = f"Pull Request {pr_action}: {pr_title}"
-        elif event["type"] == "CreateEvent":
-            activity["message"] = f"Created a new {event['payload']['ref_type']}"
-        elif event["type"] == "ForkEvent":
-            activity["message"] = f"Forked {event['repo']['name']}"
+    for _ in range(GITHUB_MAX_PAGES):
+        page, page_from_cache = fetch_page(page_url, headers, priority)
+        from_cache = from_cache or page_from_cache
+        priority = rate_limit.LOW
 
-        activity_list.append(activity)
+        items.extend(page["body"])
+        page_url = page["next"]
+        if not page_url:
+            break
 
-    return activity_list
+    return items, from_cache
+
+def format_event(event):
+    """
+    Formats one GitHub event as an activity item.
+    """
+    activity = {
+        "id": event.get("id"),
+        "type": event.get("type"),
+        "repo": event.get("repo", {}).get("name"),
+        "timestamp": event.get("created_at"),
+        "message": "No message available"
+    }
+
+    if event["type"] == "PushEvent":
+        activity["message"] = f"Pushed to {event['payload']['ref'].replace('refs/heads/', '')}"
+        activity["commits"] = len(event["payload"]["commits"])
+    elif event["type"] == "PullRequestEvent":
+        pr_action = event["payload"]["action"]
+        pr_title = event["payload"]["pull_request"]["title"]
+        activity["message"] = f"Pull Request {pr_action}: {pr_title}"
+    elif event["type"] == "CreateEvent":
+        activity["message"] = f"Created a new {event['payload']['ref_type']}"
+    elif event["type"] == "ForkEvent":
+        activity["message"] = f"Forked {event['repo']['name']}"
+
+    return activity
+
+def event_number(event):
+    """
+    Returns an event's ID as a number. GitHub event IDs grow over time.
+    """
+    try:
+        return int(event.get("id"))
+    except (TypeError, ValueError):
+        return 0
+
+def history_key(activity):
+    """
+    Sort key of an activity item in the history: its time, then its zero-padded
+    ID for events in the same second.
+    """
+    return f"{activity['timestamp']}#{int(activity['id']):020d}"
+
+def ingest_events(username, headers):
+    """
+    Adds the events newer than the high-water mark to the activity history.
+
+    The events feed lists the newest events first, so pages are read until an
+    event at or below the mark turns up, or the feed ends. Only those new events
+    are formatted and stored. The first page has NORMAL priority and the rest
+    LOW; when nothing changed the first page is a free 304.
+
+    The mark only moves once the feed was read up to it with no page served
+    from storage because of the rate limit budget, so a partial read is redone
+    next time. Stored items are keyed by event, so adding one again is harmless.
+    Returns (new_events, from_cache).
+    Raises http_client.RequestException if a call fails.
+    """
+    state = history_state.get(username) or {}
+    high_water_mark = state.get("last_event_id", 0)
+
+    new_events = []
+    page_url = f"{GITHUB_API_URL}/users/{username}/events/public?per_page=100"
+    priority = rate_limit.NORMAL
+    from_cache = False
+    reached_mark = False
+
+    for _ in range(GITHUB_MAX_PAGES):
+        page, page_from_cache = fetch_page(page_url, headers, priority)
+        from_cache = from_cache or page_from_cache
+        priority = rate_limit.LOW
+
+        for event in page["body"]:
+            if event_number(event) <= high_water_mark:
+                reached_mark = True
+                break
+            new_events.append(event)
+
+        page_url = page["next"]
+        if reached_mark or not page_url:
+            break
+
+    if new_events:
+        activity_history.append(username, [
+            (history_key(activity), activity) for activity in map(format_event, new_events)
+        ])
+        metrics.increment("GitHubEventsIngested", len(new_events))
+
+    if (reached_mark or not page_url) and not from_cache and new_events:
+        if high_water_mark and not reached_mark:
+            print(f"Events feed ended before event {high_water_mark}; older events it dropped are missing from the history")
+        history_state.put(username, {"last_event_id": max(map(event_number, new_events))})
+
+    return len(new_events), from_cache
+
+def update_history(username, headers):
+    """
+    Runs ingest_events() at most once per GITHUB_INGEST_INTERVAL per username,
+    with concurrent callers sharing one run. Returns (new_events, from_cache).
+    """
+    # A run that fell back to stored pages is retried on the next request
+    result, _ = ingest_cache.get_or_load(
+        username,
+        lambda: ingest_events(username, headers),
+        should_cache=lambda result: not result[1]
+    )
+    return result
+
+def get_github_activity(username, headers):
+    """
+    Brings the activity history up to date and returns its newest items.
+    If the events feed cannot be read, the stored history is returned alone.
+    Returns (activity, from_cache).
+    Raises http_client.RequestException if the call fails and nothing is stored.
+    """
+    try:
+        _, from_cache = update_history(username, headers)
+    except Exception as e:
+        activity, _ = activity_history.query(username, limit=GITHUB_RECENT_ACTIVITY)
+        if not activity:
+            raise
+        print(f"Serving stored GitHub activity, events feed failed: {e}")
+        return activity, True
+
+    activity, _ = activity_history.query(username, limit=GITHUB_RECENT_ACTIVITY)
+    return activity, from_cache
 
 def get_profile_data(username, headers):
     """
-    Fetches and formats a user's GitHub profile data.
+    Fetches and formats a user's GitHub profile data. The profile is the
+    most important section, so it is fetched with HIGH priority.
+    Returns (profile, from_cache).
+    Raises http_client.RequestException if the call fails.
+    """
+    page, from_cache = fetch_page(f"{GITHUB_API_URL}/users/{username}", headers, rate_limit.HIGH)
+    profile = page["body"]
+    return {
+        "name": profile.get("name"),
+        "avatar_url": profile.get("avatar_url"),
+        "followers": profile.get("followers"),
+        "public_repos": profile.get("public_repos")
+    }, from_cache
+
+def fetch_repo_details(repo, headers):
+    """
+    Fetches a repo's language breakdown (bytes of code per language) and its
+    commit counts for the last GITHUB_COMMIT_WEEKS weeks. The calls have LOW
+    priority (see fetch_page). GitHub answers 202 while it computes commit
+    statistics; weekly_commits is then None and the details are not stored.
+    Returns (details, complete).
+    Raises http_client.RequestException if a call fails.
+    """
+    base_url = f"{GITHUB_API_URL}/repos/{repo['full_name']}"
+    languages, _ = fetch_page(f"{base_url}/languages", headers, rate_limit.LOW)
+    participation, _ = fetch_page(f"{base_url}/stats/participation", headers, rate_limit.LOW)
+
+    weekly = participation["body"].get("all") if isinstance(participation["body"], dict) else None
+    return {
+        "languages": languages["body"],
+        "weekly_commits": weekly[-GITHUB_COMMIT_WEEKS:] if weekly else None
+    }, weekly is not None
+
+def enrich_repos(repos, headers):
+    """
+    Adds "languages" and "weekly_commits" to the GITHUB_ENRICH_MAX_REPOS most
+    recently pushed repos, in place.
+
+    Details are stored per repo with its pushed_at (updated_at if missing) and
+    reused while it is unchanged, so only repos pushed to since the last run
+    cost calls. Those are fetched GITHUB_ENRICH_CONCURRENCY at a time, for up to
+    GITHUB_ENRICH_TIMEOUT seconds. A repo whose details could not be fetched in
+    time, or at all, gets None for both. Returns the number of such repos.
     """
+    for repo in repos:
+        repo["languages"] = None
+        repo["weekly_commits"] = None
+
+    recent = sorted(repos, key=lambda repo: repo.get("pushed_at") or repo.get("updated_at") or "", reverse=True)
+    stale = []
+    for repo in recent[:GITHUB_ENRICH_MAX_REPOS]:
+        version = repo.get("pushed_at") or repo.get("updated_at")
+        stored = enrichment_store.get(repo["full_name"])
+        if stored and stored["version"] == version:
+            repo.update(stored["details"])
+        else:
+            stale.append((repo, version))
+
+    metrics.increment("GitHubReposEnriched", len(stale))
+    if not stale:
+        return 0
+
+    # Not used as a context manager: exiting the "with" block would wait for
+    # calls that already timed out.
+    executor = ThreadPoolExecutor(max_workers=GITHUB_ENRICH_CONCURRENCY)
     try:
-        response = requests.get(f"https://api.github.com/users/{username}", headers=headers)
-        response.raise_for_status()
-        profile = response.json()
-        return {
-            "name": profile.get("name"),
-            "avatar_url": profile.get("avatar_url"),
-            "followers": profile.get("followers"),
-            "public_repos": profile.get("public_repos")
+        futures = {
+            executor.submit(metrics.bind(fetch_repo_details), repo, headers): (repo, version)
+            for repo, version in stale
         }
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching GitHub profile: {e}")
-        return None
+        done, _ = wait(futures, timeout=GITHUB_ENRICH_TIMEOUT)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    missing = 0
+    for future, (repo, version) in futures.items():
+        if future not in done:
+            missing += 1
+            continue
+        try:
+            details, complete = future.result()
+        except Exception as e:
+            print(f"Error enriching GitHub repository {repo['full_name']}: {e}")
+            missing += 1
+            continue
+        repo.update(details)
+        if complete:
+            enrichment_store.put(repo["full_name"], {"version": version, "details": details})
+
+    if missing:
+        print(f"{missing} GitHub repositories returned without details")
+    return missing
 
 def get_repos_data(username, headers):
     """
-    Fetches and formats a user's GitHub repositories.
+    Fetches and formats a user's GitHub repositories, with the details from
+    enrich_repos(). from_cache is also True if some repos lack their details.
+    Returns (repositories, from_cache).
+    Raises http_client.RequestException if the call fails.
+    """
+    repos, from_cache = fetch_all_pages(f"{GITHUB_API_URL}/users/{username}/repos", headers)
+
+    repo_list = []
+    for repo in repos:
+        repo_list.append({
+            "id": repo.get("id"),
+            "name": repo.get("name"),
+            "full_name": repo.get("full_name"),
+            "description": repo.get("description"),
+            "html_url": repo.get("html_url"),
+            "language": repo.get("language"),
+            "stargazers_count": repo.get("stargazers_count"),
+            "forks_count": repo.get("forks_count"),
+            "updated_at": repo.get("updated_at"),
+            "pushed_at": repo.get("pushed_at")
+        })
+
+    missing = enrich_repos(repo_list, headers)
+    return repo_list, from_cache or bool(missing)
+
+def repository_totals(repos):
+    """
+    Totals over all repositories: count, stars, forks, and the bytes of code
+    per language with each language's share, largest first. Languages only
+    count repos whose details are known.
+    """
+    languages = {}
+    for repo in repos:
+        for language, size in (repo.get("languages") or {}).items():
+            languages[language] = languages.get(language, 0) + size
+    total_bytes = sum(languages.values())
+
+    return {
+        "repositories": len(repos),
+        "stars": sum(repo.get("stargazers_count") or 0 for repo in repos),
+        "forks": sum(repo.get("forks_count") or 0 for repo in repos),
+        "languages": [
+            {"name": language, "bytes": size, "share": round(size / total_bytes, 4)}
+            for language, size in sorted(languages.items(), key=lambda item: item[1], reverse=True)
+        ]
+    }
+
+# Each dashboard section: (fetch function, value returned when the section fails)
+SECTIONS = {
+    "profile": (get_profile_data, None),
+    "recent_activity": (get_github_activity, []),
+    "repositories": (get_repos_data, []),
+}
+
+def fetch_dashboard_data(username, headers, timeout=GITHUB_SECTION_TIMEOUT):
+    """
+    Fetches all dashboard sections concurrently, so the total latency is set by
+    the slowest single call instead of the sum of all of them.
+
+    A section that fails or does not finish within the timeout falls back to its
+    empty value and gets an entry in the returned "errors" map; the other sections
+    are still returned. Sections served from stored pages because the rate limit
+    budget ran low, or returned with repositories missing their details, are
+    listed in "from_cache". "repository_totals" sums up the repositories and
+    "rate_limit" holds the budget as it was after the calls.
+    """
+    dashboard_data = {}
+    errors = {}
+    from_cache = []
+
+    # Not used as a context manager: exiting the "with" block would wait for
+    # calls that already timed out.
+    executor = ThreadPoolExecutor(max_workers=len(SECTIONS))
+    try:
+        futures = {
+            name: executor.submit(metrics.bind(fetch), username, headers)
+            for name, (fetch, _) in SECTIONS.items()
+        }
+        deadline = time.monotonic() + timeout
+
+        for name, future in futures.items():
+            try:
+                dashboard_data[name], section_from_cache = future.result(timeout=max(0, deadline - time.monotonic()))
+                if section_from_cache:
+                    from_cache.append(name)
+            except FutureTimeoutError:
+                print(f"Timed out fetching GitHub {name} after {timeout}s")
+                errors[name] = f"Timed out after {timeout}s"
+            except Exception as e:
+                print(f"Error fetching GitHub {name}: {e}")
+                errors[name] = str(e)
+
+            if name in errors:
+                dashboard_data[name] = SECTIONS[name][1]
+    finally:
+        executor.shutdown(wait=False)
+
+    dashboard_data["repository_totals"] = repository_totals(dashboard_data["repositories"])
+    dashboard_data["errors"] = errors
+    dashboard_data["from_cache"] = from_cache
+    dashboard_data["rate_limit"] = github_budget.snapshot()
+    return dashboard_data
+
+def parse_history_bound(value, name):
+    """
+    Parses the 'from'/'to' query parameters (a YYYY-MM-DD date or an ISO 8601
+    date/time) into the form of activity timestamps, so they compare as strings.
+    Raises ValueError if it is neither.
     """
     try:
-        response = requests.get(f"https://api.github.com/users/{username}/repos", headers=headers)
-        response.raise_for_status()
-        repos = response.json()
-        
-        repo_list = []
-        for repo in repos:
-            repo_list.append({
-                "id": repo.get("id"),
-                "name": repo.get("name"),
-                "full_name": repo.get("full_name"),
-                "description": repo.get("description"),
-                "html_url": repo.get("html_url"),
-                "language": repo.get("language"),
-                "stargazers_count": repo.get("stargazers_count"),
-                "forks_count": repo.get("forks_count"),
-                "updated_at": repo.get("updated_at")
-            })
-        return repo_list
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching GitHub repositories: {e}")
-        return []
+        if len(value) == 10:
+            return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f'"{name}" must be a YYYY-MM-DD date or an ISO 8601 date/time.')
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-def handler(event, context):
+def get_activity(event, username, headers):
+    """
+    Serves a page of the activity history, newest first, after bringing it up to date.
+
+    Supported query parameters: from and to (inclusive; a date or date/time),
+    repo (full name, e.g. "octocat/hello-world"), type (e.g. "PushEvent"), limit and next.
+    """
+    query_params = event.get("queryStringParameters") or {}
+    cursor = query_params.get("next")
+    filters = {field: query_params[param] for param, field in (("repo", "repo"), ("type", "type"))
+               if query_params.get(param)}
+
+    try:
+        start = parse_history_bound(query_params["from"], "from") if query_params.get("from") else None
+        # Every timestamp within the given date or second sorts below this
+        end = parse_history_bound(query_params["to"], "to") + END_OF_PREFIX if query_params.get("to") else None
+        limit = query_params.get("limit", str(DEFAULT_PAGE_SIZE))
+        if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+            raise ValueError(f'"limit" must be a number between 1 and {MAX_PAGE_SIZE}.')
+        limit = int(limit)
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        return {
+            "statusCode": 400,
+            "headers": {
+                "Access-Control-Allow-Origin": "http://personal-dashboard-bucket.s3-website-us-east-1.amazonaws.com",
+                "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
+                "Access-Control-Allow-Headers": "Content-Type,Authorization"
+            },
+            "body": serializer.dumps({"error": f"Validation Error: {e}"})
+        }
+
+    errors = {}
+    from_cache = False
+    try:
+        _, from_cache = update_history(username, headers)
+    except Exception as e:
+        # The stored history is still served; it is only missing the newest events
+        print(f"Error updating GitHub activity history: {e}")
+        errors["recent_activity"] = str(e)
+
+    activity, next_cursor = activity_history.query(username, start, end, filters, limit, cursor)
+
+    return {
+        "statusCode": 200,
+        "headers": {
+            "Access-Control-Allow-Origin": "http://personal-dashboard-bucket.s3-website-us-east-1.amazonaws.com",
+            "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type,Authorization",
+            # New events can arrive at any time; clients revalidate with the ETag
+            "Cache-Control": responses.NO_CACHE
+        },
+        "body": serializer.dumps({
+            "activity": activity,
+            "next": next_cursor,
+            "errors": errors,
+            "from_cache": ["recent_activity"] if from_cache else []
+        })
+    }
+
+def handle_request(event, context):
     github_pat = os.environ.get('GITHUB_PAT')
     github_username = os.environ.get('GITHUB_USERNAME')
 
@@ -109,7 +573,7 @@ def handler(event, context):
                 "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
                 "Access-Control-Allow-Headers": "Content-Type,Authorization"
             },
-            "body": json.dumps({"error": "GitHub PAT not found in environment variables."})
+            "body": serializer.dumps({"error": "GitHub PAT not found in environment variables."})
         }
 
     headers = {
@@ -117,25 +581,49 @@ def handler(event, context):
         "Accept": "application/vnd.github.v3+json"
     }
 
+    if event.get("path", "").rstrip("/").endswith("/activity"):
+        try:
+            return get_activity(event, github_username, headers)
+        except Exception as e:
+            return {
+                "statusCode": 500,
+                "headers": {
+                    "Access-Control-Allow-Origin": "http://personal-dashboard-bucket.s3-website-us-east-1.amazonaws.com",
+                    "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
+                    "Access-Control-Allow-Headers": "Content-Type,Authorization"
+                },
+                "body": serializer.dumps({"error": str(e)})
+            }
+
     try:
-        profile_data = get_profile_data(github_username, headers)
-        recent_activity = get_github_activity(github_username, headers)
-        repos_data = get_repos_data(github_username, headers)
-
-        dashboard_data = {
-            "profile": profile_data,
-            "recent_activity": recent_activity,
-            "repositories": repos_data
+        # Partial results (any section with an error, or served from the response
+        # cache because the rate limit budget ran low) are returned but not cached
+        dashboard_data, cache_status = dashboard_cache.get_or_load(
+            github_username,
+            lambda: fetch_dashboard_data(github_username, headers),
+            should_cache=lambda data: not data["errors"] and not data["from_cache"]
+        )
+        print(f"Dashboard cache {cache_status}: {dashboard_cache.stats()}")
+
+        response_headers = {
+            "Access-Control-Allow-Origin": "http://personal-dashboard-bucket.s3-website-us-east-1.amazonaws.com",
+            "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type,Authorization",
+            "X-Cache": cache_status,
+            # Partial or budget-limited data must always be revalidated
+            "Cache-Control": (responses.NO_CACHE if dashboard_data["errors"] or dashboard_data["from_cache"]
+                              else GITHUB_CACHE_CONTROL)
         }
+        # The budget as it is now; the body has it as of when the data was fetched
+        budget = github_budget.snapshot()
+        if budget["remaining"] is not None:
+            response_headers["X-RateLimit-Remaining"] = str(budget["remaining"])
+            response_headers["X-RateLimit-Reset"] = str(budget["reset"])
 
         return {
             "statusCode": 200,
-            "headers": {
-                "Access-Control-Allow-Origin": "http://personal-dashboard-bucket.s3-website-us-east-1.amazonaws.com",
-                "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
-                "Access-Control-Allow-Headers": "Content-Type,Authorization"
-            },
-            "body": json.dumps(dashboard_data, indent=2)
+            "headers": response_headers,
+            "body": serializer.dumps(dashboard_data)
         }
 
     except Exception as e:
@@ -146,5 +634,14 @@ def handler(event, context):
                 "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
                 "Access-Control-Allow-Headers": "Content-Type,Authorization"
             },
-            "body": json.dumps({"error": str(e)})
-        }
\ No newline at end of file
+            "body": serializer.dumps({"error": str(e)})
+        }
+
+@metrics.instrumented('GitHubApp')
+def handler(event, context):
+    """
+    Lambda entry point: decodes the request, handles it and applies the shared
+    response processing (ETag/304, compression) from common/responses.py.
+    """
+    event = responses.decode_request(event)
+    return responses.finalize(event, handle_request(event, context))
\ No newline at end of file
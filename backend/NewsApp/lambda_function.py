@@ -1,11 +1,204 @@
+import hashlib
+import heapq
 import os
-import json
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
-# This function is the entry point for your AWS Lambda function.
-# It fetches the latest news from the News API and formats the
+from common import http_client, metrics, responses, serializer
+from common.cache import TTLCache
+from common.store import create_store
+
+# Latest headlines snapshot, kept for the life of a warm container.
+# Reading the snapshot is cheap, so it is only kept for a minute, then served
+# stale for up to 5 more while it is re-read.
+news_cache = TTLCache(ttl=int(os.environ.get('NEWS_CACHE_TTL', '60')), stale_ttl=300)
+
+# Headline snapshots written by the scheduled invocation and read by page loads.
+# Set NEWS_SNAPSHOT_BACKEND (or STORE_BACKEND) to 'dynamodb' so all containers share them.
+snapshot_store = create_store('news-snapshots', os.environ.get('NEWS_SNAPSHOT_BACKEND'))
+# Older snapshot versions kept next to the latest one
+NEWS_SNAPSHOT_KEEP = int(os.environ.get('NEWS_SNAPSHOT_KEEP', '5'))
+LATEST_SNAPSHOT_KEY = 'latest'
+
+# Browser/CDN caching: a new snapshot is written every 15 minutes
+NEWS_CACHE_CONTROL = responses.cache_control(300, stale_while_revalidate=900)
+
+# Base URL of News API
+NEWS_API_URL = os.environ.get('NEWS_API_URL', 'https://newsapi.org/v2')
+
+# Feeds fetched at the same time
+NEWS_MAX_CONCURRENCY = int(os.environ.get('NEWS_MAX_CONCURRENCY', '5'))
+# Paging of the merged headlines (?limit=&offset=)
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def env_list(name, default):
+    return [value.strip() for value in os.environ.get(name, default).split(',') if value.strip()]
+
+def news_feeds():
+    """
+    Returns the News API requests that make up the headlines: one per country
+    and category from NEWS_COUNTRIES and NEWS_CATEGORIES, plus one per search
+    query in NEWS_QUERIES (all comma-separated).
+    """
+    feeds = [
+        {"country": country, "category": category}
+        for country in env_list("NEWS_COUNTRIES", "us")
+        for category in env_list("NEWS_CATEGORIES", "technology")
+    ]
+    feeds += [{"q": query} for query in env_list("NEWS_QUERIES", "")]
+    return feeds
+
+# Query parameters that only track where a click came from; two URLs that
+# differ only in these point to the same article
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "cmpid", "ocid"}
+
+def normalize_url(url):
+    """
+    Reduces an article URL to a canonical form: https, lowercase host without
+    "www.", sorted query without tracking parameters, no fragment and no
+    trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit(("https", host, parts.path.rstrip("/"), query, ""))
+
+def article_id(article):
+    """
+    Stable ID for an article: a hash of its normalized URL, or of its title and
+    source when it has no URL. The same article gets the same ID on every fetch.
+    """
+    url = article.get("url")
+    key = normalize_url(url) if url else f"{article.get('source')}|{article.get('title')}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+def fetch_feed(api_key, params):
+    """
+    Fetches one News API top-headlines request and formats its articles,
+    newest first.
+    Raises http_client.RequestException if the API request fails.
+    """
+    url = f"{NEWS_API_URL}/top-headlines"
+    response = http_client.get(url, params=dict(params, apiKey=api_key))
+    response.raise_for_status()  # This will raise an HTTPError for bad responses (4xx or 5xx)
+
+    articles = []
+    for article in response.json().get("articles", []):
+        # News API keeps deleted articles in results as "[Removed]" placeholders
+        if article.get("url") == "https://removed.com":
+            continue
+        formatted = {
+            "title": article.get("title"),
+            # News API uses 'description' for the summary
+            "summary": article.get("description"),
+            "source": (article.get("source") or {}).get("name"),
+            "publishedAt": article.get("publishedAt"),
+            "url": article.get("url")
+        }
+        articles.append(dict(id=article_id(formatted), **formatted))
+
+    articles.sort(key=lambda article: article["publishedAt"] or "", reverse=True)
+    return articles
+
+def fetch_headlines(api_key):
+    """
+    Fetches every configured feed concurrently and merges them into one list,
+    newest first, without duplicates.
+
+    Each feed is already sorted, so they are combined with a k-way merge on
+    publishedAt. When the same article appears in several feeds, the first
+    copy is kept. Feeds that fail are logged and left out; if all of them
+    fail, the first error is raised.
+    Raises http_client.RequestException if the API requests fail.
+    """
+    feeds = news_feeds()
+    if not feeds:
+        raise ValueError("No news feeds configured: set NEWS_CATEGORIES, NEWS_COUNTRIES or NEWS_QUERIES.")
+
+    results = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=min(len(feeds), NEWS_MAX_CONCURRENCY)) as executor:
+        futures = [executor.submit(metrics.bind(fetch_feed), api_key, params) for params in feeds]
+        for params, future in zip(feeds, futures):
+            try:
+                results.append(future.result())
+            except http_client.RequestException as e:
+                print(f"News feed {params} failed: {e}")
+                errors.append(e)
+
+    if errors and not results:
+        raise errors[0]
+
+    merged = []
+    seen = set()
+    # publishedAt is ISO 8601 in UTC, so comparing the strings orders them by time
+    for article in heapq.merge(*results, key=lambda article: article["publishedAt"] or "", reverse=True):
+        if article["id"] not in seen:
+            seen.add(article["id"])
+            merged.append(article)
+    return merged
+
+def write_snapshot(articles, previous=None):
+    """
+    Stores the articles as a new snapshot version and points 'latest' at it.
+
+    Each version is written under its own key first, then 'latest' is replaced
+    with a copy that also lists the older versions, so a page load needs a
+    single read. Versions beyond NEWS_SNAPSHOT_KEEP are deleted.
+    """
+    generated_at = time.time()
+    version = int(generated_at * 1000)
+    snapshot = {
+        "version": version,
+        "generatedAt": generated_at,
+        "articles": articles
+    }
+    snapshot_store.put(f"v{version}", snapshot)
+
+    versions = [version] + ((previous or {}).get("versions") or [])
+    for old_version in versions[NEWS_SNAPSHOT_KEEP + 1:]:
+        snapshot_store.delete(f"v{old_version}")
+    snapshot_store.put(LATEST_SNAPSHOT_KEY, dict(snapshot, versions=versions[:NEWS_SNAPSHOT_KEEP + 1]))
+    return snapshot
+
+def load_snapshot(api_key):
+    """
+    Returns the latest snapshot. Only when none exists yet are the headlines
+    fetched live, and the result is stored as the first snapshot.
+    """
+    snapshot = snapshot_store.get(LATEST_SNAPSHOT_KEY)
+    if snapshot is None:
+        print("No news snapshot found, fetching headlines live.")
+        snapshot = write_snapshot(fetch_headlines(api_key))
+    return snapshot
+
+def is_scheduled_event(event):
+    # EventBridge schedules invoke the function with a "Scheduled Event"
+    return event.get("source") == "aws.events" or event.get("detail-type") == "Scheduled Event"
+
+def refresh_snapshot(event, context):
+    """
+    Scheduled invocation: fetches the headlines and writes a new snapshot.
+    """
+    api_key = os.environ.get("NEWS_API_KEY")
+    if not api_key:
+        raise ValueError("NEWS_API_KEY environment variable is not set.")
+
+    snapshot = write_snapshot(fetch_headlines(api_key), snapshot_store.get(LATEST_SNAPSHOT_KEY))
+    news_cache.set("top-headlines", snapshot)
+    print(f"Wrote news snapshot {snapshot['version']} with {len(snapshot['articles'])} articles.")
+    return {"version": snapshot["version"], "articles": len(snapshot["articles"])}
+
+# Fetches the latest news from the News API and formats the
 # data to be consumed by your frontend application.
-def handler(event, context):
+def handle_request(event, context):
     """
     Handles the Lambda invocation to fetch and format news articles.
 
@@ -16,42 +209,37 @@ def handler(event, context):
     Returns:
         A dictionary representing the HTTP response with news articles or an error.
     """
+    query_params = event.get("queryStringParameters") or {}
+    limit = query_params.get("limit", str(DEFAULT_PAGE_SIZE))
+    offset = query_params.get("offset", "0")
+    if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE or not offset.isdigit():
+        return {
+            "statusCode": 400,
+            "headers": {
+                "Content-Type": "application/json",
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Allow-Methods": "GET",
+                "Access-Control-Allow-Headers": "Content-Type"
+            },
+            "body": serializer.dumps({
+                "error": f'"limit" must be a number between 1 and {MAX_PAGE_SIZE} and "offset" a number of 0 or more.'
+            })
+        }
+    limit = int(limit)
+    offset = int(offset)
+
     try:
         # Get the API key from environment variables for security
         api_key = os.environ.get("NEWS_API_KEY")
         if not api_key:
             raise ValueError("NEWS_API_KEY environment variable is not set.")
 
-        # Define the API endpoint and parameters.
-        # Here we are fetching top headlines for 'us' in the 'technology' category.
-        # You can customize these parameters based on your needs.
-        url = "https://newsapi.org/v2/top-headlines"
-        params = {
-            "country": "us",
-            "category": "technology",
-            "apiKey": api_key
-        }
-        
-        # Make the API request to News API
-        response = requests.get(url, params=params)
-        response.raise_for_status()  # This will raise an HTTPError for bad responses (4xx or 5xx)
-        
-        data = response.json()
-        articles = data.get("articles", [])
-        
-        # Format the articles to match the frontend's NewsArticle type
-        # We need to map fields and generate a unique ID.
-        formatted_articles = []
-        for i, article in enumerate(articles):
-            formatted_articles.append({
-                "id": i + 1,
-                "title": article.get("title"),
-                # News API uses 'description' for the summary
-                "summary": article.get("description"),
-                "source": article.get("source", {}).get("name"),
-                "publishedAt": article.get("publishedAt"),
-                "url": article.get("url")
-            })
+        snapshot, cache_status = news_cache.get_or_load(
+            "top-headlines",
+            lambda: load_snapshot(api_key)
+        )
+        snapshot_age = max(0, int(time.time() - snapshot["generatedAt"]))
+        print(f"News cache {cache_status}, snapshot {snapshot['version']} is {snapshot_age}s old: {news_cache.stats()}")
 
         # Return a successful response with the formatted data
         return {
@@ -61,10 +249,22 @@ def handler(event, context):
                 # Add CORS headers if your frontend is on a different domain
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Methods": "GET",
-                "Access-Control-Allow-Headers": "Content-Type"
+                "Access-Control-Allow-Headers": "Content-Type",
+                "X-Cache": cache_status,
+                "X-Snapshot-Age": str(snapshot_age),
+                "Cache-Control": NEWS_CACHE_CONTROL
             },
-            "body": json.dumps({
-                "articles": formatted_articles
+            "body": serializer.dumps({
+                "articles": snapshot["articles"][offset:offset + limit],
+                "total": len(snapshot["articles"]),
+                "offset": offset,
+                "limit": limit,
+                # The age is only sent in X-Snapshot-Age, so the body (and its ETag)
+                # stays the same for as long as the snapshot does
+                "snapshot": {
+                    "version": snapshot["version"],
+                    "generatedAt": snapshot["generatedAt"]
+                }
             })
         }
 
@@ -79,10 +279,10 @@ def handler(event, context):
                 "Access-Control-Allow-Methods": "GET",
                 "Access-Control-Allow-Headers": "Content-Type"
             },
-            "body": json.dumps({"error": "Configuration error: " + str(e)})
+            "body": serializer.dumps({"error": "Configuration error: " + str(e)})
         }
         
-    except requests.exceptions.RequestException as e:
+    except http_client.RequestException as e:
         # Handle cases where the API request fails (e.g., network error, bad status code)
         print(f"API request failed: {e}")
         return {
@@ -93,7 +293,7 @@ def handler(event, context):
                 "Access-Control-Allow-Methods": "GET",
                 "Access-Control-Allow-Headers": "Content-Type"
             },
-            "body": json.dumps({"error": "Failed to fetch news data from external API."})
+            "body": serializer.dumps({"error": "Failed to fetch news data from external API."})
         }
         
     except Exception as e:
@@ -107,5 +307,19 @@ def handler(event, context):
                 "Access-Control-Allow-Methods": "GET",
                 "Access-Control-Allow-Headers": "Content-Type"
             },
-            "body": json.dumps({"error": "An unexpected server error occurred."})
+            "body": serializer.dumps({"error": "An unexpected server error occurred."})
         }
+
+# This function is the entry point for your AWS Lambda function.
+@metrics.instrumented('NewsApp')
+def handler(event, context):
+    """
+    Lambda entry point. Scheduled invocations refresh the headlines snapshot;
+    API Gateway requests are decoded, handled and passed through the shared
+    response processing (ETag/304, compression) from common/responses.py.
+    """
+    if is_scheduled_event(event):
+        return refresh_snapshot(event, context)
+
+    event = responses.decode_request(event)
+    return responses.finalize(event, handle_request(event, context))
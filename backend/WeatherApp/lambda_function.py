@@ -1,84 +1,451 @@
+import calendar
 import json
+import math
 import os
-import requests
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-def handler(event, context):
+from common import http_client, metrics, responses, serializer
+from common.cache import TTLCache
+from common.timeseries import TimeSeries
+
+# Current conditions per location, kept for the life of a warm container.
+# Fresh for 5 minutes, then served stale for up to 10 more while it is refreshed.
+weather_cache = TTLCache(ttl=int(os.environ.get('WEATHER_CACHE_TTL', '300')), stale_ttl=600)
+
+# Coordinates are rounded to this many decimal places (2 is about 1 km), so
+# nearby lookups share a cache entry
+COORDINATE_PRECISION = int(os.environ.get('WEATHER_COORDINATE_PRECISION', '2'))
+_COORDINATES = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+
+WEATHER_API_URL = os.environ.get('WEATHER_API_URL', 'http://api.weatherapi.com/v1')
+
+# Batch requests ({"locations": [...]}): at most this many locations, fetched this
+# many at a time. A location that takes longer than WEATHER_LOCATION_TIMEOUT
+# seconds once started is reported as an error, and the whole batch gives up
+# after WEATHER_BATCH_TIMEOUT seconds.
+WEATHER_MAX_LOCATIONS = int(os.environ.get('WEATHER_MAX_LOCATIONS', '25'))
+WEATHER_MAX_CONCURRENCY = int(os.environ.get('WEATHER_MAX_CONCURRENCY', '5'))
+WEATHER_LOCATION_TIMEOUT = float(os.environ.get('WEATHER_LOCATION_TIMEOUT', '5'))
+WEATHER_BATCH_TIMEOUT = float(os.environ.get('WEATHER_BATCH_TIMEOUT', '20'))
+
+# Forecast and history requests ({"mode": "forecast" | "history", ...}).
+# Past days do not change, so history is cached longer than current conditions.
+WEATHER_HISTORY_CACHE_TTL = int(os.environ.get('WEATHER_HISTORY_CACHE_TTL', '3600'))
+MAX_FORECAST_DAYS = 14
+MAX_HISTORY_DAYS = 30
+# Browser/CDN caching for GET requests. Current conditions change every few
+# minutes; past days never change.
+CURRENT_CACHE_CONTROL = responses.cache_control(120, stale_while_revalidate=300)
+FORECAST_CACHE_CONTROL = responses.cache_control(900, stale_while_revalidate=1800)
+HISTORY_CACHE_CONTROL = responses.cache_control(3600, stale_while_revalidate=86400)
+# Hourly fields kept from the upstream response; "condition" is the numeric condition code
+SERIES_FIELDS = ['temp_c', 'precip_mm', 'wind_kph', 'humidity', 'chance_of_rain', 'condition']
+# Resolution -> (bucket size in seconds, aggregations for TimeSeries.resample, or None to keep hourly data)
+RESOLUTIONS = {
+    'hourly': (3600, None),
+    '3h': (3 * 3600, {
+        'temp_c': ['mean'], 'precip_mm': ['sum'], 'wind_kph': ['max'],
+        'humidity': ['mean'], 'chance_of_rain': ['max'], 'condition': ['mode'],
+    }),
+    '6h': (6 * 3600, {
+        'temp_c': ['mean'], 'precip_mm': ['sum'], 'wind_kph': ['max'],
+        'humidity': ['mean'], 'chance_of_rain': ['max'], 'condition': ['mode'],
+    }),
+    'daily': (24 * 3600, {
+        'temp_c': ['min', 'max'], 'precip_mm': ['sum'], 'wind_kph': ['max'],
+        'humidity': ['mean'], 'chance_of_rain': ['max'], 'condition': ['mode'],
+    }),
+}
+
+def normalize_location(location):
     """
-    Lambda function to call the weatherapi.com API.
+    Returns the location in a canonical form, used both as the cache key and
+    as the upstream query, so that "  New   York" and "new york", or
+    "40.7128,-74.0060" and "40.713, -74.006", end up as the same lookup.
     """
-    
-    # It's best practice to get the API key from environment variables
-    api_key = os.environ.get('WEATHER_API_KEY')
-    if not api_key:
+    match = _COORDINATES.match(location)
+    if match:
+        # Adding 0.0 turns -0.0 into 0.0
+        lat, lon = (round(float(value), COORDINATE_PRECISION) + 0.0 for value in match.groups())
+        return f"{lat:.{COORDINATE_PRECISION}f},{lon:.{COORDINATE_PRECISION}f}"
+    return ' '.join(location.split()).lower()
+
+def get_current_weather(location, api_key):
+    """
+    Calls weatherapi.com and returns the fields the dashboard shows.
+    Raises http_client.RequestException, json.JSONDecodeError or KeyError on failure.
+    """
+    url = f"{WEATHER_API_URL}/current.json?key={api_key}&q={location}"
+
+    response = http_client.get(url)
+    response.raise_for_status()  # This will raise an HTTPError for bad responses (4xx or 5xx)
+    weather_data = response.json()
+
+    return {
+        'location': weather_data['location']['name'],
+        'country': weather_data['location']['country'],
+        'temperature_c': weather_data['current']['temp_c'],
+        'condition': weather_data['current']['condition']['text']
+    }
+
+def get_weather_series(location, api_key, mode, days=None, date=None, end_date=None):
+    """
+    Calls the weatherapi.com forecast or history endpoint and returns the hourly
+    data as a columnar TimeSeries, with the location details and a map of the
+    condition codes used to their text.
+    Raises http_client.RequestException, json.JSONDecodeError or KeyError on failure.
+    """
+    if mode == 'forecast':
+        url = f"{WEATHER_API_URL}/forecast.json?key={api_key}&q={location}&days={days}&aqi=no&alerts=no"
+    else:
+        url = f"{WEATHER_API_URL}/history.json?key={api_key}&q={location}&dt={date}&end_dt={end_date}"
+
+    response = http_client.get(url)
+    response.raise_for_status()
+    weather_data = response.json()
+
+    series = TimeSeries(SERIES_FIELDS)
+    conditions = {}
+    for day in weather_data['forecast']['forecastday']:
+        for hour in day['hour']:
+            code = hour['condition']['code']
+            conditions[code] = hour['condition']['text']
+            values = {field: hour.get(field) for field in SERIES_FIELDS}
+            values['condition'] = code
+            # Buckets follow the location's local time, so "daily" means local days
+            local_time = calendar.timegm(time.strptime(hour['time'], '%Y-%m-%d %H:%M'))
+            series.append(hour['time_epoch'], values, local_time)
+
+    return {
+        'location': weather_data['location']['name'],
+        'country': weather_data['location']['country'],
+        'tz': weather_data['location'].get('tz_id'),
+        'conditions': conditions,
+        'series': series,
+        # Rendered resolutions, filled in by handle_series()
+        'views': {}
+    }
+
+def parse_series_request(body_data):
+    """
+    Validates a forecast/history request body.
+    Returns (options, None) with the arguments for get_weather_series(), or (None, error message).
+    """
+    mode = body_data.get('mode')
+    resolution = body_data.get('resolution', 'hourly')
+    if resolution not in RESOLUTIONS:
+        return None, f'"resolution" must be one of: {", ".join(RESOLUTIONS)}.'
+
+    if mode == 'forecast':
+        days = body_data.get('days', 3)
+        if not isinstance(days, int) or isinstance(days, bool) or not 1 <= days <= MAX_FORECAST_DAYS:
+            return None, f'"days" must be a whole number from 1 to {MAX_FORECAST_DAYS}.'
+        return {'mode': mode, 'days': days}, None
+
+    if mode == 'history':
+        try:
+            date = datetime.strptime(body_data.get('date') or '', '%Y-%m-%d').date()
+            end_date = datetime.strptime(body_data.get('end_date') or str(date), '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return None, '"date" and "end_date" must be dates in YYYY-MM-DD format.'
+        if not date <= end_date < date + timedelta(days=MAX_HISTORY_DAYS):
+            return None, f'"end_date" must be on or after "date" and at most {MAX_HISTORY_DAYS} days later.'
+        return {'mode': mode, 'date': str(date), 'end_date': str(end_date)}, None
+
+    return None, '"mode" must be "forecast" or "history".'
+
+def handle_series(body_data, location, api_key):
+    """
+    Returns hourly forecast or history data as parallel arrays, optionally
+    downsampled to 3-hourly, 6-hourly or daily values.
+    """
+    options, error = parse_series_request(body_data)
+    if error:
+        return {
+            'statusCode': 400,
+            'headers': {
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+            },
+            'body': serializer.dumps(error)
+        }
+
+    location = normalize_location(location)
+    resolution = body_data.get('resolution', 'hourly')
+    # The hourly series is cached, and resampled for each request
+    if options['mode'] == 'forecast':
+        key = f"forecast:{location}:{options['days']}"
+    else:
+        key = f"history:{location}:{options['date']}:{options['end_date']}"
+    try:
+        data, cache_status = weather_cache.get_or_load(
+            key,
+            lambda: get_weather_series(location, api_key, **options),
+            ttl=WEATHER_HISTORY_CACHE_TTL if options['mode'] == 'history' else None
+        )
+        print(f"Weather cache {cache_status} for '{key}': {weather_cache.stats()}")
+    except (http_client.RequestException, json.JSONDecodeError, KeyError) as e:
+        print(f"Error fetching weather {options['mode']} for '{location}': {e}")
         return {
             'statusCode': 500,
             'headers': {
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
             },
-            'body': json.dumps('WEATHERAPI_API_KEY not found in environment variables.')
+            'body': serializer.dumps(describe_error(e))
+        }
+
+    # Each resolution is built once per cache entry and reused while the entry lives
+    view = data['views'].get(resolution)
+    if view is None:
+        bucket_seconds, aggregations = RESOLUTIONS[resolution]
+        series = data['series'] if aggregations is None else data['series'].resample(bucket_seconds, aggregations)
+        used_codes = {int(code) for code in series.columns['condition'] if not math.isnan(code)}
+        view = data['views'][resolution] = {
+            'conditions': {code: text for code, text in data['conditions'].items() if code in used_codes},
+            'series': series.to_dict()
         }
 
-    body = event.get('body')
+    # History that includes today can still change
+    if options['mode'] == 'history' and options['end_date'] < str(datetime.now(timezone.utc).date()):
+        cache_control = HISTORY_CACHE_CONTROL
+    else:
+        cache_control = FORECAST_CACHE_CONTROL
 
-    if not body:
+    return {
+        'statusCode': 200,
+        'headers': {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+            "X-Cache": cache_status,
+            "Cache-Control": cache_control
+        },
+        'body': serializer.dumps({
+            'location': data['location'],
+            'country': data['country'],
+            'tz': data['tz'],
+            'mode': options['mode'],
+            'resolution': resolution,
+            'conditions': view['conditions'],
+            'series': view['series']
+        })
+    }
+
+def describe_error(e):
+    """
+    Returns the message sent to the client for an error from get_current_weather().
+    """
+    if isinstance(e, http_client.RequestException):
+        return f"Error retrieving weather data: {e}"
+    if isinstance(e, json.JSONDecodeError):
+        return "Error parsing API response."
+    if isinstance(e, KeyError):
+        return "Unexpected data format from API."
+    return f"Error retrieving weather data: {e}"
+
+def get_cached_weather(location, api_key):
+    """
+    Returns (weather, cache status) for a normalized location.
+    """
+    return weather_cache.get_or_load(location, lambda: get_current_weather(location, api_key))
+
+def fetch_weather_batch(locations, api_key, max_concurrency=WEATHER_MAX_CONCURRENCY,
+                        location_timeout=WEATHER_LOCATION_TIMEOUT, batch_timeout=WEATHER_BATCH_TIMEOUT):
+    """
+    Fetches several locations concurrently, at most max_concurrency at a time.
+
+    Returns one result per requested location, in the order given: either
+    {"query", "location", "weather"} or {"query", "location", "error"}, and the
+    cache status of each location that succeeded. Cache statuses are kept out
+    of the results so the response body, and its ETag, only change with the data.
+    Locations that normalize to the same key are fetched once.
+    """
+    keys = [normalize_location(location) for location in locations]
+    unique_keys = list(dict.fromkeys(keys))
+    started = {}
+
+    def fetch(key):
+        started[key] = time.monotonic()
+        return get_cached_weather(key, api_key)
+
+    outcomes = {}
+    cache_statuses = {}
+    # Not used as a context manager: exiting the "with" block would wait for
+    # calls that already timed out.
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(unique_keys))))
+    try:
+        pending = {executor.submit(metrics.bind(fetch), key): key for key in unique_keys}
+        batch_deadline = time.monotonic() + batch_timeout
+
+        while pending:
+            now = time.monotonic()
+            # A location times out location_timeout seconds after its fetch started
+            for future, key in list(pending.items()):
+                if key in started and now - started[key] >= location_timeout:
+                    outcomes[key] = {'error': f"Timed out after {location_timeout}s"}
+                    del pending[future]
+            if now >= batch_deadline:
+                for future, key in pending.items():
+                    future.cancel()
+                    outcomes[key] = {'error': f"Timed out after {batch_timeout}s waiting for the batch"}
+                break
+            if not pending:
+                break
+
+            next_check = min(
+                [started[key] + location_timeout for key in pending.values() if key in started]
+                + [batch_deadline]
+            )
+            # Wake up at least every 50 ms so newly started locations get their own deadline
+            done, _ = wait(pending, timeout=min(max(0, next_check - now), 0.05), return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                try:
+                    weather, cache_statuses[key] = future.result()
+                    outcomes[key] = {'weather': weather}
+                except Exception as e:
+                    print(f"Error fetching weather for '{key}': {e}")
+                    outcomes[key] = {'error': describe_error(e)}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    print(f"Weather batch of {len(locations)} locations ({len(unique_keys)} unique): {weather_cache.stats()}")
+    results = [
+        dict({'query': location, 'location': key}, **outcomes[key])
+        for location, key in zip(locations, keys)
+    ]
+    return results, cache_statuses
+
+def handle_batch(locations, api_key):
+    if (not locations or len(locations) > WEATHER_MAX_LOCATIONS
+            or not all(isinstance(location, str) and location.strip() for location in locations)):
         return {
             'statusCode': 400,
             'headers': {
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
             },
-            'body': json.dumps('Missing request body.')
+            'body': serializer.dumps(
+                f'"locations" must be a list of 1 to {WEATHER_MAX_LOCATIONS} non-empty strings.'
+            )
         }
 
-    try:
-        # The body is a string, so you must parse it into a dictionary
-        body_data = json.loads(body)
-        location = body_data.get('location')
-    except json.JSONDecodeError:
+    results, cache_statuses = fetch_weather_batch(locations, api_key)
+    return {
+        'statusCode': 200,
+        'headers': {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+            # One status per unique location, e.g. "HIT,MISS"
+            "X-Cache": ','.join(cache_statuses.values()),
+            "Cache-Control": CURRENT_CACHE_CONTROL
+        },
+        'body': serializer.dumps({'results': results})
+    }
+
+def query_request(event):
+    """
+    Builds the request from GET query parameters instead of a JSON body, so
+    browsers and CDNs can cache the responses. For example
+    ?location=London&mode=forecast&days=7&resolution=daily, or
+    ?locations=London&locations=Paris for several locations.
+    """
+    params = dict(event.get('queryStringParameters') or {})
+    locations = (event.get('multiValueQueryStringParameters') or {}).get('locations')
+    if locations:
+        params['locations'] = locations
+    if params.get('days', '').isdigit():
+        params['days'] = int(params['days'])
+    return params
+
+def handle_request(event, context):
+    """
+    Lambda function to call the weatherapi.com API.
+    Takes a JSON body on POST, or query parameters on GET (see query_request).
+    """
+    
+    # It's best practice to get the API key from environment variables
+    api_key = os.environ.get('WEATHER_API_KEY')
+    if not api_key:
         return {
-            'statusCode': 400,
+            'statusCode': 500,
             'headers': {
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
             },
-            'body': json.dumps('Invalid JSON in the request body.')
+            'body': serializer.dumps('WEATHERAPI_API_KEY not found in environment variables.')
         }
-        
-    if not location:
+
+    if event.get('httpMethod') == 'GET':
+        body_data = query_request(event)
+    else:
+        body = event.get('body')
+
+        if not body:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    "Access-Control-Allow-Origin": "*",
+                    "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+                },
+                'body': serializer.dumps('Missing request body.')
+            }
+
+        try:
+            # The body is a string, so you must parse it into a dictionary
+            body_data = json.loads(body)
+        except json.JSONDecodeError:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    "Access-Control-Allow-Origin": "*",
+                    "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+                },
+                'body': serializer.dumps('Invalid JSON in the request body.')
+            }
+
+    location = body_data.get('location')
+    locations = body_data.get('locations')
+
+    # Several locations, as {"locations": [...]} or {"location": [...]}
+    if isinstance(location, list):
+        locations = location
+    if locations is not None:
+        return handle_batch(locations if isinstance(locations, list) else None, api_key)
+
+    if not isinstance(location, str) or not location.strip():
         return {
             'statusCode': 400,
             'headers': {
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
             },
-            'body': json.dumps('Missing "location" key in the JSON body.')
+            'body': serializer.dumps('Missing "location" key in the JSON body.')
         }
 
-    # Construct the API URL
-    url = f"http://api.weatherapi.com/v1/current.json?key={api_key}&q={location}"
+    if body_data.get('mode') is not None:
+        return handle_series(body_data, location, api_key)
 
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # This will raise an HTTPError for bad responses (4xx or 5xx)
-        weather_data = response.json()
-        
-        # Extract and return relevant information
+        location = normalize_location(location)
+        weather, cache_status = get_cached_weather(location, api_key)
+        print(f"Weather cache {cache_status} for '{location}': {weather_cache.stats()}")
+
         return {
             'statusCode': 200,
             'headers': {
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+                "X-Cache": cache_status,
+                "Cache-Control": CURRENT_CACHE_CONTROL
             },
-            'body': json.dumps({
-                'location': weather_data['location']['name'],
-                'country': weather_data['location']['country'],
-                'temperature_c': weather_data['current']['temp_c'],
-                'condition': weather_data['current']['condition']['text']
-            })
+            'body': serializer.dumps(weather)
         }
     
-    except requests.exceptions.RequestException as e:
+    except http_client.RequestException as e:
         print(f"Error calling WeatherAPI: {e}")
         return {
             'statusCode': 500,
@@ -86,7 +453,7 @@ def handler(event, context):
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
             },
-            'body': json.dumps(f"Error retrieving weather data: {e}")
+            'body': serializer.dumps(f"Error retrieving weather data: {e}")
         }
     
     except json.JSONDecodeError:
@@ -97,7 +464,7 @@ def handler(event, context):
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
             },
-            'body': json.dumps("Error parsing API response.")
+            'body': serializer.dumps("Error parsing API response.")
         }
     
     except KeyError:
@@ -108,5 +475,14 @@ def handler(event, context):
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
             },
-            'body': json.dumps("Unexpected data format from API.")
+            'body': serializer.dumps("Unexpected data format from API.")
         }
+
+@metrics.instrumented('WeatherApp')
+def handler(event, context):
+    """
+    Lambda entry point: decodes the request, handles it and applies the shared
+    response processing (ETag/304, compression) from common/responses.py.
+    """
+    event = responses.decode_request(event)
+    return responses.finalize(event, handle_request(event, context))
@@ -0,0 +1,92 @@
+"""
+Size and latency tradeoff of response compression (common/responses.py).
+
+For JSON payloads of increasing size, reports the compressed size and the
+time to compress and base64-encode each body. It then estimates the total
+time to deliver the body over a slow mobile link and a fast link, and
+compares it with the uncompressed body.
+
+Usage:
+    python backend/benchmarks/bench_compression.py [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common import responses, serializer
+
+PAYLOAD_SIZES = [512, 1024, 4 * 1024, 32 * 1024, 256 * 1024, 1024 * 1024]
+# Link speeds in bytes per second
+LINKS = {'3g (1.6 Mbit/s)': 1.6e6 / 8, 'wifi (50 Mbit/s)': 50e6 / 8}
+
+
+def make_body(size):
+    # GitHub repository entries, repeated until the body reaches the wanted size
+    repos = []
+    body = serializer.dumps({'repositories': repos})
+    i = 0
+    while len(body) < size:
+        repos.append({
+            'id': 100000 + i,
+            'name': f"project-{i}",
+            'full_name': f"someone/project-{i}",
+            'description': f"A small project number {i} for the personal dashboard",
+            'html_url': f"https://github.com/someone/project-{i}",
+            'language': ['Python', 'TypeScript', 'Go', None][i % 4],
+            'stargazers_count': i * 3 % 97,
+            'forks_count': i % 13,
+            'updated_at': f"2024-0{i % 9 + 1}-1{i % 9}T12:00:00Z"
+        })
+        body = serializer.dumps({'repositories': repos})
+        i += 1
+    return body
+
+
+def measure(event, response, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = responses.finalize(event, response)
+        times.append(time.perf_counter() - start)
+    encoded = result['body']
+    wire_size = len(encoded) * 3 // 4 if result.get('isBase64Encoded') else len(encoded.encode('utf-8'))
+    return statistics.median(times), wire_size, result['headers'].get('Content-Encoding', 'identity')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    encodings = ['gzip'] + (['br'] if responses.brotli is not None else [])
+    if responses.brotli is None:
+        print("brotli is not installed; only gzip is measured.")
+
+    header = f"{'payload':>9} {'encoding':>8} {'wire size':>10} {'ratio':>6} {'cpu ms':>7}"
+    header += ''.join(f" {name:>18}" for name in LINKS)
+    print(header)
+
+    for size in PAYLOAD_SIZES:
+        body = make_body(size)
+        response = {'statusCode': 200, 'headers': {}, 'body': body}
+        raw_size = len(body.encode('utf-8'))
+
+        for encoding in ['identity'] + encodings:
+            event = {'headers': {'Accept-Encoding': encoding}}
+            seconds, wire_size, used = measure(event, response, args.repeat)
+            line = f"{raw_size:>9} {used:>8} {wire_size:>10} {raw_size / wire_size:>6.2f} {seconds * 1000:>7.3f}"
+            for bytes_per_second in LINKS.values():
+                total_ms = (seconds + wire_size / bytes_per_second) * 1000
+                line += f" {total_ms:>15.1f} ms"
+            print(line)
+        print()
+
+    print(f"Bodies under COMPRESSION_MIN_BYTES ({responses.COMPRESSION_MIN_BYTES}) are always sent as identity.")
+
+
+if __name__ == '__main__':
+    main()
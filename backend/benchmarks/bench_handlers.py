@@ -0,0 +1,295 @@
+"""
+Latency, throughput and memory of every handler, run offline.
+
+Starts a FakeUpstream server standing in for GitHub, weatherapi.com and News
+API, and swaps ExpenseApp's DynamoDB resource for a FakeDynamoDB (both in
+fakes.py). Each scenario then calls a handler's handler(event, context) with
+synthetic API Gateway events, from a pool of threads, at each concurrency
+level. For every level it reports:
+
+  p50 / p95 / p99 / max    latency of handler() in ms
+  req/s                    requests completed per second of wall time
+  peak KB                  peak Python memory allocated while serving the
+                           level, measured with tracemalloc in a separate,
+                           shorter pass so tracing does not skew the timings
+  upstream / dynamodb      calls the fakes received
+
+Caches are cleared before each level. Requests cycle over --keys different
+locations, so the first ones are misses and the rest mostly hits; raise
+--keys to measure the uncached path.
+
+Results are written as JSON to --output (by default a timestamped file in
+backend/benchmarks/results/). --compare prints the change from an earlier
+results file.
+
+Usage:
+    python backend/benchmarks/bench_handlers.py [--scenarios weather-current,news]
+        [--concurrency 1,8,32] [--requests 200] [--latency 50] [--items 30]
+        [--compare results/handlers-20240601-120000.json]
+"""
+import argparse
+import contextlib
+import importlib.util
+import itertools
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.join(BENCHMARKS, '..')
+sys.path.insert(0, BACKEND)
+
+import fakes
+
+RESULTS_DIR = os.path.join(BENCHMARKS, 'results')
+# Locations in each weather batch request
+BATCH_SIZE = 5
+
+
+def get_event(path, params=None, multi=None):
+    return {'httpMethod': 'GET', 'path': path, 'headers': {'Accept-Encoding': 'gzip'},
+            'queryStringParameters': params, 'multiValueQueryStringParameters': multi, 'body': None}
+
+
+def post_event(path, body):
+    return {'httpMethod': 'POST', 'path': path, 'headers': {'Content-Type': 'application/json'},
+            'queryStringParameters': None, 'body': json.dumps(body)}
+
+
+# Each scenario: (app directory, function building the i-th event from the options)
+SCENARIOS = {
+    'weather-current': ('WeatherApp', lambda i, args: get_event('/weather', {'location': f'city {i % args.keys}'})),
+    'weather-batch': ('WeatherApp', lambda i, args: post_event('/weather', {
+        'locations': [f'city {(i + j) % args.keys}' for j in range(BATCH_SIZE)]})),
+    'weather-forecast': ('WeatherApp', lambda i, args: get_event('/weather', {
+        'location': f'city {i % args.keys}', 'mode': 'forecast', 'days': '3', 'resolution': '3h'})),
+    'github': ('GitHubApp', lambda i, args: get_event('/github')),
+    'github-activity': ('GitHubApp', lambda i, args: get_event('/github/activity', {
+        'repo': f'benchmark/repo-{i % 20}', 'limit': '20'})),
+    'news': ('NewsApp', lambda i, args: get_event('/news', {'limit': '20', 'offset': str(i % 3 * 20)})),
+    'expenses-add': ('ExpenseApp', lambda i, args: post_event('/expenses', fakes.expense_body(i))),
+    'expenses-list': ('ExpenseApp', lambda i, args: get_event('/expenses', {'limit': '50'})),
+    'expenses-summary': ('ExpenseApp', lambda i, args: get_event('/expenses/summary')),
+    'expenses-search': ('ExpenseApp', lambda i, args: get_event('/expenses/search', {
+        'q': ['coffee', 'train*', 'lunch market', 'groc*'][i % 4], 'limit': '20'})),
+    'dashboard': ('DashboardApp', lambda i, args: get_event('/dashboard', {'location': f'city {i % args.keys}'})),
+}
+
+# Caches cleared before each level, per app
+CACHES = {
+    'WeatherApp': ['weather_cache'],
+    'GitHubApp': ['dashboard_cache', 'ingest_cache'],
+    'NewsApp': ['news_cache'],
+    'ExpenseApp': ['expense_cache'],
+}
+
+
+def load_apps(dynamodb):
+    """
+    Loads the handlers through DashboardApp's loader, so the dashboard scenario
+    uses the same module objects (and fakes) as the others.
+    """
+    dashboard = load_module('DashboardApp')
+    apps = {'DashboardApp': dashboard}
+    for app_dir in CACHES:
+        apps[app_dir] = dashboard.load_app(app_dir)
+    apps['ExpenseApp']._dynamodb = dynamodb
+    return apps
+
+
+def load_module(app_dir):
+    spec = importlib.util.spec_from_file_location(
+        f"{app_dir.lower()}_lambda", os.path.join(BACKEND, app_dir, 'lambda_function.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def reset_caches(apps):
+    for app_dir, names in CACHES.items():
+        for name in names:
+            getattr(apps[app_dir], name).clear()
+
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+def run_level(handler, make_event, args, concurrency, requests):
+    """
+    Sends `requests` events to the handler from `concurrency` threads.
+    Returns (sorted latencies in seconds, wall time, number of error responses).
+    """
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal errors
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            event = make_event(i, args)
+            started = time.perf_counter()
+            response = handler(event, None)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if response['statusCode'] not in (200, 201, 304):
+                    errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return sorted(latencies), time.perf_counter() - started, errors
+
+
+def run_scenario(name, apps, upstream, dynamodb, args):
+    app_dir, make_event = SCENARIOS[name]
+    handler = apps[app_dir].handler
+    levels = []
+
+    for concurrency in args.concurrency:
+        reset_caches(apps)
+        upstream.reset_counts()
+        dynamodb_calls = dynamodb.calls
+        latencies, wall, errors = run_level(handler, make_event, args, concurrency, args.requests)
+        upstream_calls = sum(upstream.calls.values())
+        dynamodb_calls = dynamodb.calls - dynamodb_calls
+
+        # Memory pass: same level, fewer requests, with allocation tracing on
+        reset_caches(apps)
+        tracemalloc.start()
+        run_level(handler, make_event, args, concurrency, min(args.requests, args.memory_requests))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        levels.append({
+            'concurrency': concurrency,
+            'requests': len(latencies),
+            'errors': errors,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'max_ms': round(latencies[-1] * 1000, 3),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+            'throughput_rps': round(len(latencies) / wall, 1),
+            'peak_alloc_kb': round(peak / 1024),
+            'upstream_calls': upstream_calls,
+            'upstream_peak_concurrency': upstream.peak,
+            'dynamodb_calls': dynamodb_calls,
+        })
+    return levels
+
+
+def setup(apps, args):
+    """
+    Puts the data the scenarios read in place: expenses in the fake tables
+    and a news snapshot, as the scheduled refresh would have written it.
+    """
+    expense = apps['ExpenseApp']
+    for i in range(args.seed_expenses):
+        expense.put_expense(expense.build_expense(fakes.expense_body(i)))
+    apps['NewsApp'].refresh_snapshot({}, None)
+
+
+def print_levels(name, levels, previous=None):
+    print(f"\n{name}")
+    print(f"  {'conc':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'req/s':>8} "
+          f"{'peak KB':>8} {'upstream':>9} {'dynamodb':>9} {'errors':>7}")
+    for level in levels:
+        print(f"  {level['concurrency']:>5} {level['p50_ms']:>9.2f} {level['p95_ms']:>9.2f} {level['p99_ms']:>9.2f} "
+              f"{level['max_ms']:>9.2f} {level['throughput_rps']:>8.1f} {level['peak_alloc_kb']:>8} "
+              f"{level['upstream_calls']:>9} {level['dynamodb_calls']:>9} {level['errors']:>7}")
+        before = next((old for old in previous or [] if old['concurrency'] == level['concurrency']), None)
+        if before:
+            changes = ', '.join(
+                f"{key[:-3]} {before[key]:.2f} -> {level[key]:.2f} ({(level[key] / before[key] - 1) * 100:+.0f}%)"
+                for key in ('p50_ms', 'p95_ms', 'p99_ms') if before[key]
+            )
+            print(f"        vs previous: {changes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated scenario names')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=200, help='requests per level')
+    parser.add_argument('--memory-requests', type=int, default=50, help='requests in the traced memory pass')
+    parser.add_argument('--latency', type=float, default=50, help='upstream latency in ms')
+    parser.add_argument('--jitter', type=float, default=10, help='extra random upstream latency, up to this many ms')
+    parser.add_argument('--items', type=int, default=30, help='items per GitHub/News listing')
+    parser.add_argument('--dynamodb-latency', type=float, default=5, help='latency of each DynamoDB call in ms')
+    parser.add_argument('--keys', type=int, default=20, help='distinct locations requested')
+    parser.add_argument('--seed-expenses', type=int, default=500, help='expenses in the table before the run')
+    parser.add_argument('--output', help='results file (default: results/handlers-<time>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare with')
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    args.concurrency = [int(level) for level in args.concurrency.split(',')]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    upstream = fakes.FakeUpstream(args.latency / 1000, args.jitter / 1000, args.items).start()
+    dynamodb = fakes.expense_tables(args.dynamodb_latency / 1000)
+    os.environ.update(upstream.env())
+    os.environ.update({
+        'WEATHER_API_KEY': 'benchmark', 'NEWS_API_KEY': 'benchmark',
+        'GITHUB_PAT': 'benchmark', 'GITHUB_USERNAME': 'benchmark',
+        'STORE_BACKEND': 'memory', 'NEWS_SNAPSHOT_BACKEND': 'memory',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+    })
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['scenarios']
+
+    results = {
+        'started': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'scenarios': {},
+    }
+
+    # The handlers log every request; keep that out of the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        apps = load_apps(dynamodb)
+        setup(apps, args)
+
+    for name in args.scenarios:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            levels = run_scenario(name, apps, upstream, dynamodb, args)
+        results['scenarios'][name] = levels
+        print_levels(name, levels, previous.get(name))
+
+    upstream.stop()
+    # ru_maxrss is in KB on Linux
+    results['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('handlers-%Y%m%d-%H%M%S.json'))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+    print(f"\nPeak RSS {results['max_rss_kb']} KB. Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Microbenchmark for response serialization.
+
+Compares the old ExpenseApp path (copy every item with convert_decimal_to_float,
+then json.dumps) and the old GitHubApp path (json.dumps with indent=2) against
+common/serializer.py, on a list of DynamoDB-style expense items.
+
+Usage:
+    python backend/benchmarks/bench_serializer.py [--items 10000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common import serializer
+
+
+def convert_decimal_to_float(items):
+    # The helper ExpenseApp used before common/serializer.py
+    if isinstance(items, list):
+        return [convert_decimal_to_float(item) for item in items]
+    elif isinstance(items, dict):
+        return {key: convert_decimal_to_float(value) for key, value in items.items()}
+    elif isinstance(items, Decimal):
+        return float(items)
+    else:
+        return items
+
+
+def make_expenses(count):
+    rng = random.Random(42)
+    categories = ['food', 'transport', 'entertainment', 'utilities', 'other']
+    return [
+        {
+            'expenseId': Decimal(361060260667456 + i * 4096),
+            'description': f"Expense number {i}",
+            'timestamp': Decimal(1710000000000 + i),
+            'amount': Decimal(str(round(rng.uniform(1, 500), 2))),
+            'category': rng.choice(categories),
+            'date': f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'recordType': 'expense'
+        }
+        for i in range(count)
+    ]
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), len(body.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    expenses = make_expenses(args.items)
+    cases = [
+        ('old: convert_decimal_to_float + json.dumps', lambda: json.dumps({'expenses': convert_decimal_to_float(expenses)})),
+        ('old: convert + json.dumps(indent=2)', lambda: json.dumps({'expenses': convert_decimal_to_float(expenses)}, indent=2)),
+    ]
+
+    serializer.JSON_BACKEND = 'json'
+    cases.append(('serializer.dumps (json)', lambda: serializer.dumps({'expenses': expenses})))
+    if serializer.orjson is not None:
+        cases.append(('serializer.dumps (orjson)', lambda: _with_backend('orjson', {'expenses': expenses})))
+    else:
+        print("orjson is not installed; skipping the orjson backend.")
+
+    print(f"{args.items} expenses, median of {args.repeat} runs")
+    baseline = None
+    for name, fn in cases:
+        seconds, size = measure(fn, args.repeat)
+        baseline = baseline or seconds
+        print(f"  {name:45s} {seconds * 1000:8.2f} ms  {size / 1024:8.1f} KB  {baseline / seconds:5.2f}x")
+
+
+def _with_backend(backend, obj):
+    previous = serializer.JSON_BACKEND
+    serializer.JSON_BACKEND = backend
+    try:
+        return serializer.dumps(obj)
+    finally:
+        serializer.JSON_BACKEND = previous
+
+
+if __name__ == '__main__':
+    main()
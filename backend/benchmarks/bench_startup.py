@@ -0,0 +1,158 @@
+"""
+Cold-start check for the Lambda handlers.
+
+Each handler is imported in a fresh Python interpreter, the way a new Lambda
+container loads it, and then given one request that needs no upstream call
+(a CORS preflight or a request that fails validation). For each handler the
+script reports the median, over several fresh interpreters, of:
+
+  import ms          time to import lambda_function.py, including common/
+  first request ms   time to answer that first request
+  modules            modules loaded by then, beyond those of a bare interpreter
+
+It exits with status 1 if a median goes over the handler's budget in
+startup_budget.json, or if a module from the budget's "lazy_modules" list
+(requests, boto3, ...) was imported. Those are only to be imported when a
+request actually needs them.
+
+Interpreter startup itself (site, .pth files) is not counted, since the
+Lambda runtime pays it whatever the handler does.
+
+Usage:
+    python backend/benchmarks/bench_startup.py [--runs 7] [--write-budget]
+
+--write-budget sets each budget to the measured medians times --headroom
+and saves the file, e.g. after an intended change in startup cost.
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_budget.json')
+# Smallest budget --write-budget sets, so sub-millisecond timings are not held to a 1 ms limit
+MIN_BUDGET_MS = 10
+
+# A request each handler answers without calling an upstream API or DynamoDB
+FIRST_REQUESTS = {
+    'DashboardApp': {'httpMethod': 'GET', 'path': '/dashboard', 'queryStringParameters': {'sections': 'none'}},
+    'ExpenseApp': {'httpMethod': 'POST', 'path': '/expenses', 'body': None},
+    'GitHubApp': {'httpMethod': 'OPTIONS', 'path': '/github'},
+    'NewsApp': {'httpMethod': 'GET', 'path': '/news', 'queryStringParameters': {'limit': '0'}},
+    'WeatherApp': {'httpMethod': 'POST', 'path': '/weather', 'body': None},
+}
+
+# Run in the fresh interpreter: imports one handler, answers the first request
+# and prints the timings and the modules it loaded as JSON
+CHILD = '''
+import importlib.util, json, sys, time
+backend, app, event = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+baseline = set(sys.modules)
+sys.path.insert(0, backend)
+
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location('lambda_function', f'{backend}/{app}/lambda_function.py')
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+response = module.handler(event, None)
+answered = time.perf_counter()
+
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': (answered - imported) * 1000,
+    'status': response['statusCode'],
+    'modules': sorted(set(sys.modules) - baseline),
+}))
+'''
+
+# Environment for the handlers: dummy credentials and keys, so configuration
+# checks pass, and the production store backend, so its import cost is counted
+CHILD_ENV = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'benchmark',
+    'AWS_SECRET_ACCESS_KEY': 'benchmark',
+    'WEATHER_API_KEY': 'benchmark',
+    'NEWS_API_KEY': 'benchmark',
+    'GITHUB_USERNAME': 'benchmark',
+    'GITHUB_PAT': 'benchmark',
+    'NEWS_SNAPSHOT_BACKEND': 'dynamodb',
+}
+
+
+def measure_once(app):
+    env = dict(os.environ, **CHILD_ENV)
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, BACKEND, app, json.dumps(FIRST_REQUESTS[app])],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    # The handlers print log lines; the result is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(app, runs):
+    results = [measure_once(app) for _ in range(runs)]
+    return {
+        'import_ms': statistics.median(result['import_ms'] for result in results),
+        'first_request_ms': statistics.median(result['first_request_ms'] for result in results),
+        'status': results[-1]['status'],
+        'modules': results[-1]['modules'],
+    }
+
+
+def top_level(modules):
+    return sorted({name.split('.')[0] for name in modules})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7, help='fresh interpreters per handler')
+    parser.add_argument('--write-budget', action='store_true', help='save the measured medians as the new budget')
+    parser.add_argument('--headroom', type=float, default=2.5, help='budget / median when writing the budget')
+    args = parser.parse_args()
+
+    with open(BUDGET_PATH) as f:
+        budget = json.load(f)
+    lazy_modules = set(budget['lazy_modules'])
+
+    failed = False
+    print(f"{'handler':<13} {'import ms':>10} {'budget':>7} {'1st req ms':>11} {'budget':>7} {'status':>7} {'modules':>8}")
+    for app in sorted(FIRST_REQUESTS):
+        result = measure(app, args.runs)
+        limits = budget['handlers'].get(app, {})
+        print(f"{app:<13} {result['import_ms']:>10.1f} {limits.get('import_ms', '-'):>7} "
+              f"{result['first_request_ms']:>11.1f} {limits.get('first_request_ms', '-'):>7} "
+              f"{result['status']:>7} {len(result['modules']):>8}")
+
+        eager = lazy_modules.intersection(top_level(result['modules']))
+        if eager:
+            print(f"  FAIL: imported {', '.join(sorted(eager))} before any request needed them")
+            failed = True
+
+        if args.write_budget:
+            budget['handlers'][app] = {
+                'import_ms': max(MIN_BUDGET_MS, math.ceil(result['import_ms'] * args.headroom)),
+                'first_request_ms': max(MIN_BUDGET_MS, math.ceil(result['first_request_ms'] * args.headroom)),
+            }
+            continue
+
+        for measurement in ('import_ms', 'first_request_ms'):
+            if measurement in limits and result[measurement] > limits[measurement]:
+                print(f"  FAIL: {measurement} {result[measurement]:.1f} is over the budget of {limits[measurement]}")
+                failed = True
+
+    if args.write_budget:
+        with open(BUDGET_PATH, 'w') as f:
+            json.dump(budget, f, indent=2)
+            f.write('\n')
+        print(f"\nBudget written to {BUDGET_PATH}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Concurrency check for WeatherApp batch requests ({"locations": [...]}).
+
+Starts a local fake weatherapi.com server that answers each request after a
+fixed delay and counts how many requests it is serving at once. The batch path
+is then run against it with several concurrency limits. For each limit the
+script reports the wall time and the peak number of concurrent upstream calls.
+It exits with status 1 if the peak goes over the limit or a location is missing
+from the results.
+
+A location named "slow" answers after --slow-delay seconds, to show the
+timeout for each location.
+
+Usage:
+    python backend/benchmarks/bench_weather_batch.py [--locations 20] [--delay 0.1]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+
+class FakeWeatherServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay, slow_delay):
+        super().__init__(('127.0.0.1', 0), FakeWeatherHandler)
+        self.delay = delay
+        self.slow_delay = slow_delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.requests = 0
+
+    def reset(self):
+        with self.lock:
+            self.peak = 0
+            self.requests = 0
+
+
+class FakeWeatherHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        location = parse_qs(urlsplit(self.path).query).get('q', [''])[0]
+        with server.lock:
+            server.active += 1
+            server.requests += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            time.sleep(server.slow_delay if location == 'slow' else server.delay)
+            body = json.dumps({
+                'location': {'name': location.title(), 'country': 'Testland'},
+                'current': {'temp_c': 20.5, 'condition': {'text': 'Sunny'}}
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def load_weather_app(base_url):
+    os.environ['WEATHER_API_URL'] = base_url
+    os.environ['WEATHER_API_KEY'] = 'fake-key'
+    spec = importlib.util.spec_from_file_location(
+        'weather_lambda', os.path.join(BACKEND, 'WeatherApp', 'lambda_function.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locations', type=int, default=20, help='locations per batch')
+    parser.add_argument('--delay', type=float, default=0.1, help='fake upstream latency in seconds')
+    parser.add_argument('--slow-delay', type=float, default=2.0, help='latency of the "slow" location')
+    parser.add_argument('--timeout', type=float, default=0.5, help='timeout per location in seconds')
+    args = parser.parse_args()
+
+    server = FakeWeatherServer(args.delay, args.slow_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app = load_weather_app(f"http://127.0.0.1:{server.server_address[1]}/v1")
+
+    locations = [f"city {i}" for i in range(args.locations)]
+    failed = False
+
+    print(f"{'concurrency':>11} {'wall ms':>8} {'peak':>5} {'upstream':>9} {'errors':>7}")
+    for concurrency in [1, 2, 5, 10, args.locations]:
+        app.weather_cache.clear()
+        server.reset()
+        started = time.perf_counter()
+        results, _ = app.fetch_weather_batch(locations, 'fake-key', max_concurrency=concurrency,
+                                             location_timeout=args.timeout)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        errors = sum(1 for result in results if 'error' in result)
+        print(f"{concurrency:>11} {elapsed_ms:>8.0f} {server.peak:>5} {server.requests:>9} {errors:>7}")
+
+        if server.peak > concurrency:
+            print(f"  FAIL: {server.peak} concurrent upstream calls with a limit of {concurrency}")
+            failed = True
+        if [result['query'] for result in results] != locations:
+            print("  FAIL: results do not match the requested locations")
+            failed = True
+
+    # Duplicates are fetched once, and a slow location times out without holding up the rest
+    app.weather_cache.clear()
+    server.reset()
+    batch = ['London', ' london ', 'slow', 'Paris']
+    started = time.perf_counter()
+    results, _ = app.fetch_weather_batch(batch, 'fake-key', max_concurrency=2, location_timeout=args.timeout)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"\nBatch {batch} with concurrency 2 took {elapsed_ms:.0f} ms, {server.requests} upstream calls:")
+    for result in results:
+        print(f"  {result['query']!r:>12} -> {result.get('weather') or result.get('error')}")
+    if server.requests != 3 or 'error' not in results[2] or any('error' in results[i] for i in (0, 1, 3)):
+        print("  FAIL: expected 3 upstream calls and only the slow location to fail")
+        failed = True
+
+    server.shutdown()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Payload size and serialization time of WeatherApp forecast/history responses.
+
+Builds a synthetic weatherapi.com forecast response (same shape and field
+count as the real one) and compares, for a 7-day view:
+
+  upstream nested    the upstream forecastday/hour objects passed through
+  list of dicts      one small dict per hour with the fields the dashboard uses
+  columnar <res>     the TimeSeries parallel arrays WeatherApp returns, hourly
+                     and downsampled to 3h, 6h and daily
+
+For each it reports the body size, its gzip size, the median time to build
+the body's data and the median time to serialize it. WeatherApp builds each
+columnar view once per cache entry, so a cached request only pays for dumps.
+
+Usage:
+    python backend/benchmarks/bench_weather_series.py [--days 7] [--repeat 50]
+"""
+import argparse
+import gzip
+import importlib.util
+import os
+import random
+import statistics
+import sys
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+from common import serializer
+
+CONDITIONS = [(1000, 'Sunny'), (1003, 'Partly cloudy'), (1006, 'Cloudy'), (1063, 'Patchy rain possible'),
+              (1183, 'Light rain'), (1195, 'Heavy rain')]
+
+
+def make_forecast(days, start_epoch=1717200000):
+    """
+    Returns a dict shaped like a weatherapi.com forecast.json response.
+    """
+    rng = random.Random(7)
+    forecastday = []
+    for day in range(days):
+        hours = []
+        for hour in range(24):
+            epoch = start_epoch + (day * 24 + hour) * 3600
+            code, text = rng.choice(CONDITIONS)
+            temp_c = round(12 + 8 * rng.random() + (hour > 10 and hour < 18) * 5, 1)
+            hours.append({
+                'time_epoch': epoch,
+                'time': time.strftime('%Y-%m-%d %H:%M', time.gmtime(epoch)),
+                'temp_c': temp_c, 'temp_f': round(temp_c * 9 / 5 + 32, 1), 'is_day': int(6 <= hour < 20),
+                'condition': {'text': text, 'icon': f'//cdn.weatherapi.com/weather/64x64/day/{code % 1000}.png',
+                              'code': code},
+                'wind_mph': round(rng.random() * 15, 1), 'wind_kph': round(rng.random() * 24, 1),
+                'wind_degree': rng.randrange(360), 'wind_dir': 'WSW',
+                'pressure_mb': 1012.0, 'pressure_in': 29.88, 'precip_mm': round(rng.random() * 2, 2),
+                'precip_in': 0.02, 'snow_cm': 0.0, 'humidity': rng.randrange(40, 95), 'cloud': rng.randrange(100),
+                'feelslike_c': temp_c - 1, 'feelslike_f': 55.2, 'windchill_c': temp_c - 1, 'windchill_f': 55.2,
+                'heatindex_c': temp_c, 'heatindex_f': 57.0, 'dewpoint_c': 9.1, 'dewpoint_f': 48.4,
+                'will_it_rain': 0, 'chance_of_rain': rng.randrange(100), 'will_it_snow': 0, 'chance_of_snow': 0,
+                'vis_km': 10.0, 'vis_miles': 6.0, 'gust_mph': 12.3, 'gust_kph': 19.8, 'uv': 4.0,
+            })
+        forecastday.append({
+            'date': hours[0]['time'][:10],
+            'date_epoch': start_epoch + day * 86400,
+            'day': {'maxtemp_c': max(h['temp_c'] for h in hours), 'mintemp_c': min(h['temp_c'] for h in hours)},
+            'astro': {'sunrise': '04:45 AM', 'sunset': '09:18 PM'},
+            'hour': hours,
+        })
+    return {
+        'location': {'name': 'London', 'country': 'United Kingdom', 'tz_id': 'Europe/London'},
+        'current': {},
+        'forecast': {'forecastday': forecastday},
+    }
+
+
+def load_weather_app():
+    spec = importlib.util.spec_from_file_location(
+        'weather_lambda', os.path.join(BACKEND, 'WeatherApp', 'lambda_function.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(build, repeat):
+    build_times = []
+    dumps_times = []
+    body = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        data = build()
+        built = time.perf_counter()
+        body = serializer.dumps(data)
+        build_times.append(built - started)
+        dumps_times.append(time.perf_counter() - built)
+    return body, statistics.median(build_times), statistics.median(dumps_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = load_weather_app()
+    upstream = make_forecast(args.days)
+
+    class FakeResponse:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return upstream
+
+    app.http_client.get = lambda url: FakeResponse()
+    data = app.get_weather_series('london', 'key', 'forecast', days=args.days)
+    series = data['series']
+
+    def list_of_dicts():
+        return [
+            {'time': hour['time_epoch'], 'temp_c': hour['temp_c'], 'precip_mm': hour['precip_mm'],
+             'wind_kph': hour['wind_kph'], 'humidity': hour['humidity'],
+             'chance_of_rain': hour['chance_of_rain'], 'condition': hour['condition']['text']}
+            for day in upstream['forecast']['forecastday'] for hour in day['hour']
+        ]
+
+    variants = [
+        ('upstream nested', lambda: upstream['forecast']['forecastday']),
+        ('list of dicts', list_of_dicts),
+    ]
+    for resolution, (bucket_seconds, aggregations) in app.RESOLUTIONS.items():
+        if aggregations is None:
+            variants.append((f'columnar {resolution}', lambda: series.to_dict()))
+        else:
+            variants.append((f'columnar {resolution}',
+                             lambda b=bucket_seconds, a=aggregations: series.resample(b, a).to_dict()))
+
+    print(f"{args.days}-day forecast, {len(series)} hourly samples\n")
+    print(f"{'variant':<18} {'bytes':>9} {'gzip':>8} {'build ms':>9} {'dumps ms':>9} {'size vs nested':>15}")
+    baseline = None
+    for name, build in variants:
+        body, build_seconds, dumps_seconds = measure(build, args.repeat)
+        size = len(body.encode('utf-8'))
+        baseline = baseline or size
+        gzip_size = len(gzip.compress(body.encode('utf-8')))
+        print(f"{name:<18} {size:>9} {gzip_size:>8} {build_seconds * 1000:>9.3f} {dumps_seconds * 1000:>9.3f}"
+              f" {baseline / size:>14.1f}x")
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        app.get_weather_series('london', 'key', 'forecast', days=args.days)
+    print(f"\nParsing the upstream response into a TimeSeries: "
+          f"{(time.perf_counter() - started) / args.repeat * 1000:.3f} ms (done once per cache fill)")
+
+
+if __name__ == '__main__':
+    main()
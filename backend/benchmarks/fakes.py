@@ -0,0 +1,527 @@
+"""
+Offline stand-ins for the services the handlers call, used by the benchmarks.
+
+FakeUpstream is a local HTTP server that answers the GitHub, weatherapi.com
+and News API calls the handlers make, after a configurable delay and with a
+configurable number of items per listing. FakeDynamoDB is an in-process
+replacement for the boto3 DynamoDB resource, covering the calls ExpenseApp
+makes.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from bench_weather_series import make_forecast
+
+EVENT_TYPES = ['PushEvent', 'PullRequestEvent', 'CreateEvent', 'ForkEvent', 'WatchEvent']
+
+
+def github_events(count):
+    # Newest first, like the real feed. Event n (counted from the oldest) is the
+    # same for any count, so raising the count adds new events on top.
+    events = []
+    for i in range(count):
+        n = count - i
+        rng = random.Random(n)
+        event_type = EVENT_TYPES[n % len(EVENT_TYPES)]
+        payload = {}
+        if event_type == 'PushEvent':
+            payload = {'ref': 'refs/heads/main', 'commits': [{'sha': f'{n:040x}', 'message': 'Update'}] * rng.randint(1, 5)}
+        elif event_type == 'PullRequestEvent':
+            payload = {'action': 'opened', 'pull_request': {'title': f'Change number {n}', 'body': 'x' * 200}}
+        elif event_type == 'CreateEvent':
+            payload = {'ref_type': 'branch'}
+        events.append({
+            'id': str(30000000000 + n),
+            'type': event_type,
+            'actor': {'id': 1, 'login': 'benchmark', 'avatar_url': 'https://avatars.githubusercontent.com/u/1'},
+            'repo': {'id': 1000 + n % 20, 'name': f'benchmark/repo-{n % 20}'},
+            'payload': payload,
+            'public': True,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1717200000 + n * 600)),
+        })
+    return events
+
+
+def github_repos(count):
+    return [{
+        'id': 1000 + i,
+        'name': f'repo-{i}',
+        'full_name': f'benchmark/repo-{i}',
+        'description': f'Repository number {i}',
+        'html_url': f'https://github.com/benchmark/repo-{i}',
+        'language': ['Python', 'TypeScript', 'Go'][i % 3],
+        'stargazers_count': i * 3,
+        'forks_count': i,
+        'pushed_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1717200000 - i * 3600)),
+        'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1717200000 - i * 3600)),
+        'owner': {'login': 'benchmark', 'id': 1},
+    } for i in range(count)]
+
+
+def github_repo_details(name, detail):
+    # Languages (bytes per language) or participation (52 weekly commit counts) of a repo
+    rng = random.Random(name)
+    if detail == 'languages':
+        return {'Python': rng.randint(1000, 90000), 'Shell': rng.randint(100, 2000), 'Dockerfile': 300}
+    weeks = [rng.randint(0, 12) for _ in range(52)]
+    return {'all': weeks, 'owner': [count // 2 for count in weeks]}
+
+
+def news_articles(count, feed):
+    return [{
+        'source': {'id': None, 'name': f'Source {i % 7}'},
+        'author': 'Benchmark',
+        'title': f'Headline {i} from {feed}',
+        'description': 'A short summary of the story. ' * 3,
+        # Every third article is in all feeds, so the merge has duplicates to drop
+        'url': f'https://news.example.com/{"shared" if i % 3 == 0 else feed}/{i}?utm_source=feed',
+        'urlToImage': None,
+        'publishedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1717200000 - i * 300)),
+        'content': 'Lorem ipsum ' * 20,
+    } for i in range(count)]
+
+
+class FakeUpstream(ThreadingHTTPServer):
+    """
+    Answers GitHub calls under /github, weatherapi.com calls under /weather/v1
+    and News API calls under /news/v2, each after `latency` seconds (plus up to
+    `jitter` more). Listings have `items` entries, paged by 100 like GitHub;
+    raising `items` adds newer events to the top of the events feed. Each repo
+    also has its languages and weekly commit counts (stats/participation).
+
+    GitHub pages carry an ETag and conditional requests get a 304, as they do
+    from the real API. With `github_rate_limit` set, GitHub responses carry
+    X-RateLimit-* headers and calls other than 304s use up the limit, after
+    which they get a 403. Setting `github_retry_after` makes every GitHub call
+    get a secondary rate limit 403 with that Retry-After.
+
+    Counts requests per service and the peak number served at once.
+    """
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, jitter=0.0, items=30, github_rate_limit=None):
+        super().__init__(('127.0.0.1', 0), FakeUpstreamHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.items = items
+        self.github_rate_limit = github_rate_limit
+        self.github_remaining = github_rate_limit
+        self.github_reset = int(time.time()) + 3600
+        self.github_retry_after = None
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.calls = {}
+        self._bodies = {}
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def env(self):
+        """
+        Environment variables that point the handlers at this server.
+        """
+        return {
+            'GITHUB_API_URL': f"{self.base_url}/github",
+            'WEATHER_API_URL': f"{self.base_url}/weather/v1",
+            'NEWS_API_URL': f"{self.base_url}/news/v2",
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def reset_counts(self):
+        with self.lock:
+            self.peak = 0
+            self.calls = {}
+
+    def body(self, key, build):
+        # Bodies are built once, so generating them is not part of what is measured
+        with self.lock:
+            if key not in self._bodies:
+                self._bodies[key] = json.dumps(build()).encode('utf-8')
+            return self._bodies[key]
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in one write. Sent separately, the client's
+    # delayed ACK adds about 40 ms to every response.
+    wbufsize = 1 << 16
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        service = url.path.split('/')[1]
+
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            server.calls[service] = server.calls.get(service, 0) + 1
+        try:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+            status, headers, body = self.route(service, url.path, query)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def route(self, service, path, query):
+        server = self.server
+        if service == 'github':
+            return self.github(path, query)
+        if service == 'weather' and path.endswith('/current.json'):
+            location = query.get('q', '')
+            body = json.dumps({
+                'location': {'name': location.title(), 'country': 'Testland', 'tz_id': 'UTC'},
+                'current': {'temp_c': 20.5, 'temp_f': 68.9, 'condition': {'text': 'Sunny', 'code': 1000}}
+            }).encode('utf-8')
+            return 200, {}, body
+        if service == 'weather':
+            days = int(query.get('days', '1'))
+            return 200, {}, server.body(('forecast', days), lambda: make_forecast(days))
+        if service == 'news':
+            feed = query.get('category') or query.get('q') or 'general'
+            articles = server.body(('news', feed), lambda: news_articles(server.items, feed))
+            return 200, {}, b'{"status":"ok","totalResults":%d,"articles":%s}' % (server.items, articles)
+        return 404, {}, b'{"message":"Not Found"}'
+
+    def github(self, path, query):
+        server = self.server
+        if server.github_retry_after is not None:
+            return 403, {'Retry-After': str(server.github_retry_after)}, \
+                b'{"message":"You have exceeded a secondary rate limit. Please wait a few minutes before you try again."}'
+
+        parts = path.split('/')[2:]  # users, <name>[, events, public | repos] or repos, <owner>, <name>, ...
+        if parts[0] == 'repos':
+            listing = 'languages' if parts[3] == 'languages' else 'participation'
+        else:
+            listing = 'profile' if len(parts) == 2 else 'events' if parts[2] == 'events' else 'repos'
+        page = int(query.get('page', '1'))
+        per_page = int(query.get('per_page', '30'))
+        etag = f'"{listing}-{page}-{server.items}"' if parts[0] != 'repos' else f'"{listing}-{parts[2]}"'
+        if self.headers.get('If-None-Match') == etag:
+            # Conditional requests that get a 304 do not count against the limit
+            return 304, dict(self.github_rate_headers(0), ETag=etag), b''
+
+        rate_headers = self.github_rate_headers(1)
+        if server.github_rate_limit is not None and rate_headers['X-RateLimit-Remaining'] == '0' \
+                and server.github_remaining < 0:
+            return 403, rate_headers, b'{"message":"API rate limit exceeded"}'
+
+        headers = dict(rate_headers, ETag=etag)
+        if parts[0] == 'repos':
+            return 200, headers, server.body((listing, parts[2]), lambda: github_repo_details(parts[2], listing))
+        if listing == 'profile':
+            return 200, headers, server.body(('profile',), lambda: {
+                'login': parts[1], 'name': 'Benchmark User', 'avatar_url': 'https://avatars.githubusercontent.com/u/1',
+                'followers': 42, 'public_repos': server.items
+            })
+
+        def build():
+            items = github_events(server.items) if listing == 'events' else github_repos(server.items)
+            return items[(page - 1) * per_page:page * per_page]
+
+        if page * per_page < server.items:
+            headers['Link'] = f'<{server.base_url}{path}?per_page={per_page}&page={page + 1}>; rel="next"'
+        return 200, headers, server.body((listing, page, per_page, server.items), build)
+
+    def github_rate_headers(self, cost):
+        server = self.server
+        if server.github_rate_limit is None:
+            return {}
+        with server.lock:
+            server.github_remaining -= cost
+            remaining = max(0, server.github_remaining)
+        return {
+            'X-RateLimit-Limit': str(server.github_rate_limit),
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Used': str(server.github_rate_limit - remaining),
+            'X-RateLimit-Reset': str(server.github_reset),
+            'X-RateLimit-Resource': 'core',
+        }
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TransactionCanceledException(Exception):
+    def __init__(self, reasons):
+        super().__init__('Transaction cancelled')
+        self.response = {'CancellationReasons': reasons}
+
+
+class _Exceptions:
+    TransactionCanceledException = TransactionCanceledException
+
+
+_UPDATE_CLAUSE = re.compile(r'\b(SET|ADD|REMOVE)\b', re.IGNORECASE)
+_CONDITION = re.compile(r'^\s*(attribute_exists|attribute_not_exists)\(\s*(\S+?)\s*\)\s*$')
+
+
+class FakeTable:
+    """
+    One table: items in a dict keyed by their primary key, and the global
+    secondary indexes as (partition key, sort key) pairs. Queries scan the
+    items, which is fine for benchmark-sized tables.
+    """
+
+    def __init__(self, resource, name, key, indexes=None):
+        self.resource = resource
+        self.name = name
+        self.key = key
+        self.indexes = indexes or {}
+        self.items = {}
+
+    def _key(self, key):
+        return tuple(key[name] for name in self.key)
+
+    def get_item(self, Key, **kwargs):
+        with self.resource.call():
+            item = self.items.get(self._key(Key))
+            return {'Item': dict(item)} if item else {}
+
+    def put_item(self, Item, **kwargs):
+        with self.resource.call():
+            self.items[self._key(Item)] = dict(Item)
+            return {}
+
+    def delete_item(self, Key, **kwargs):
+        with self.resource.call():
+            self.items.pop(self._key(Key), None)
+            return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues=None, **kwargs):
+        with self.resource.call():
+            item = self.items.setdefault(self._key(Key), dict(Key))
+            updated = self._apply_update(item, UpdateExpression, ExpressionAttributeNames or {},
+                                         ExpressionAttributeValues or {})
+            if ReturnValues == 'UPDATED_NEW':
+                return {'Attributes': {name: item[name] for name in updated}}
+            return {}
+
+    def _apply_update(self, item, expression, names, values):
+        updated = []
+        # Split "SET a = :a, b = :b ADD c :c" into its clauses
+        tokens = _UPDATE_CLAUSE.split(expression)
+        for action, clause in zip(tokens[1::2], tokens[2::2]):
+            for part in filter(None, (part.strip() for part in clause.split(','))):
+                if action.upper() == 'SET':
+                    name, value = (side.strip() for side in part.split('='))
+                    name = names.get(name, name)
+                    item[name] = values[value]
+                    updated.append(name)
+                elif action.upper() == 'ADD':
+                    name, value = part.split()
+                    name = names.get(name, name)
+                    item[name] = item.get(name, 0) + values[value]
+                    updated.append(name)
+                else:
+                    item.pop(names.get(part, part), None)
+        return updated
+
+    def check_condition(self, key, expression):
+        if not expression:
+            return True
+        function, _ = _CONDITION.match(expression).groups()
+        exists = self._key(key) in self.items
+        return exists if function == 'attribute_exists' else not exists
+
+    def query(self, KeyConditionExpression, IndexName=None, ScanIndexForward=True, Limit=None,
+              ExclusiveStartKey=None, **kwargs):
+        with self.resource.call():
+            partition_key, sort_key = self.indexes[IndexName] if IndexName else (self.key + [None])[:2]
+            conditions = _flatten(KeyConditionExpression)
+            matches = [item for item in self.items.values()
+                       if partition_key in item and (sort_key is None or sort_key in item)
+                       and all(_matches(item, condition) for condition in conditions)]
+            matches.sort(key=lambda item: (item.get(sort_key) if sort_key else 0, self._key(item)),
+                         reverse=not ScanIndexForward)
+
+            if ExclusiveStartKey:
+                start = self._key(ExclusiveStartKey)
+                position = next(i for i, item in enumerate(matches) if self._key(item) == start)
+                matches = matches[position + 1:]
+
+            response = {'Items': [dict(item) for item in matches[:Limit]], 'Count': len(matches[:Limit])}
+            if Limit and len(matches) > Limit:
+                last = matches[Limit - 1]
+                response['LastEvaluatedKey'] = {name: last[name] for name in
+                                                set(self.key) | {partition_key} | ({sort_key} - {None})}
+            return response
+
+
+def _flatten(condition):
+    """
+    Turns a boto3 key condition (Key('a').eq(1) & Key('b').between(2, 3)) into
+    a list of (operator, attribute, values).
+    """
+    expression = condition.get_expression()
+    if expression['operator'] == 'AND':
+        return _flatten(expression['values'][0]) + _flatten(expression['values'][1])
+    key, *values = expression['values']
+    return [(expression['operator'], key.name, values)]
+
+
+def _matches(item, condition):
+    operator, name, values = condition
+    value = item[name]
+    if operator == '=':
+        return value == values[0]
+    if operator == 'BETWEEN':
+        return values[0] <= value <= values[1]
+    if operator == '>=':
+        return value >= values[0]
+    if operator == '<=':
+        return value <= values[0]
+    if operator == '>':
+        return value > values[0]
+    if operator == '<':
+        return value < values[0]
+    if operator == 'begins_with':
+        return value.startswith(values[0])
+    raise ValueError(f"Unsupported key condition: {operator}")
+
+
+class FakeClient:
+    exceptions = _Exceptions
+
+    def __init__(self, resource):
+        self.resource = resource
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        with self.resource.call():
+            # Check every condition first, so a failed transaction changes nothing
+            reasons = []
+            for action in TransactItems:
+                (kind, request), = action.items()
+                table = self.resource.tables[request['TableName']]
+                key = request.get('Key') or request['Item']
+                ok = table.check_condition(key, request.get('ConditionExpression'))
+                reasons.append({'Code': 'None' if ok else 'ConditionalCheckFailed'})
+            if any(reason['Code'] != 'None' for reason in reasons):
+                raise TransactionCanceledException(reasons)
+
+            for action in TransactItems:
+                (kind, request), = action.items()
+                table = self.resource.tables[request['TableName']]
+                if kind == 'Put':
+                    table.items[table._key(request['Item'])] = dict(request['Item'])
+                elif kind == 'Delete':
+                    table.items.pop(table._key(request['Key']), None)
+                elif kind == 'Update':
+                    item = table.items.setdefault(table._key(request['Key']), dict(request['Key']))
+                    table._apply_update(item, request['UpdateExpression'],
+                                        request.get('ExpressionAttributeNames', {}),
+                                        request.get('ExpressionAttributeValues', {}))
+            return {}
+
+
+class _Meta:
+    def __init__(self, client):
+        self.client = client
+
+
+class FakeDynamoDB:
+    """
+    Stands in for boto3.resource('dynamodb'). Every call holds one lock and
+    sleeps `latency` seconds first, to stand for the network round trip.
+    Counts the calls made.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.tables = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.meta = _Meta(FakeClient(self))
+
+    def call(self):
+        """
+        Waits the simulated round trip, counts the call and returns the lock
+        that serializes access to the tables.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        return self._lock
+
+    def create_table(self, name, key, indexes=None):
+        self.tables[name] = FakeTable(self, name, key, indexes)
+        return self.tables[name]
+
+    def Table(self, name):
+        return self.tables[name]
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        with self.call():
+            for name, requests in RequestItems.items():
+                table = self.tables[name]
+                for request in requests:
+                    if 'PutRequest' in request:
+                        item = request['PutRequest']['Item']
+                        table.items[table._key(item)] = dict(item)
+                    else:
+                        table.items.pop(table._key(request['DeleteRequest']['Key']), None)
+            return {'UnprocessedItems': {}}
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        with self.call():
+            responses = {}
+            for name, request in RequestItems.items():
+                table = self.tables[name]
+                responses[name] = [dict(table.items[table._key(key)]) for key in request['Keys']
+                                   if table._key(key) in table.items]
+            return {'Responses': responses, 'UnprocessedKeys': {}}
+
+
+def expense_tables(latency=0.0):
+    """
+    Returns a FakeDynamoDB with the expense tables and indexes from deploy_infra.sh.
+    """
+    dynamodb = FakeDynamoDB(latency)
+    dynamodb.create_table('expenses-table', ['expenseId'], {
+        'category-date-index': ('category', 'date'),
+        'type-date-index': ('recordType', 'date'),
+        'type-id-index': ('recordType', 'expenseId'),
+    })
+    dynamodb.create_table('expense-summary-table', ['summaryType', 'bucket'])
+    dynamodb.create_table('expense-search-index', ['bucket', 'entry'])
+    return dynamodb
+
+
+def expense_body(i):
+    categories = ['food', 'transport', 'rent', 'fun', 'health']
+    items = ['Coffee', 'Lunch', 'Train ticket', 'Groceries', 'Cinema', 'Pharmacy', 'Taxi']
+    places = ['Corner Cafe', 'Central Station', 'Market Hall', 'Downtown']
+    return {
+        'description': f'{items[i % len(items)]} at {places[i % len(places)]} #{i}',
+        'amount': round(5 + (i * 37) % 200 / 4, 2),
+        'category': categories[i % len(categories)],
+        'date': f'2024-{1 + i % 12:02d}-{1 + i % 28:02d}',
+    }
@@ -0,0 +1,2 @@
+# Code shared by all of the dashboard Lambda functions.
+# It is copied next to lambda_function.py when each function is packaged.
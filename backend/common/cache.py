@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from common import metrics
+
+# Default number of entries each cache keeps before evicting the least recently used one
+CACHE_MAX_SIZE = int(os.environ.get('CACHE_MAX_SIZE', '128'))
+
+# Values returned as the second item of get_or_load(), also used for the X-Cache response header
+HIT = 'HIT'
+STALE = 'STALE'
+MISS = 'MISS'
+# A MISS that waited for another caller's in-flight load instead of starting its own
+COALESCED = 'COALESCED'
+
+
+class _Flight:
+    """
+    One in-flight loader() call that concurrent callers for the same key wait on.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    In-memory LRU cache with a TTL per entry and stale-while-revalidate.
+
+    Instances are meant to be created at module level so they survive across
+    invocations in a warm Lambda container.
+
+    An entry is fresh for `ttl` seconds. For `stale_ttl` seconds after that it
+    is still served, and a background thread reloads it. Lambda freezes the
+    container once the handler returns, so the refresh finishes either while
+    the response is being sent or at the start of the next invocation.
+
+    Concurrent misses for the same key share one loader() call. The time each
+    load took is kept with the entry, so stats() can report how much upstream
+    time the hits saved.
+    """
+
+    def __init__(self, max_size=CACHE_MAX_SIZE, ttl=60, stale_ttl=0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()  # key -> (value, fresh_until, stale_until, load_seconds)
+        self._refreshing = set()
+        self._in_flight = {}  # key -> _Flight
+        # Bumped by invalidate()/clear(), so a load that started before them is not cached
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def get(self, key):
+        """
+        Returns (value, status) where status is HIT, STALE or MISS.
+        The value is None on a MISS.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, MISS
+
+            value, fresh_until, stale_until, load_seconds = entry
+            if now < fresh_until:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += load_seconds
+                return value, HIT
+            if now < stale_until:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                self.saved_seconds += load_seconds
+                return value, STALE
+
+            del self._entries[key]
+            self.misses += 1
+            return None, MISS
+
+    def set(self, key, value, ttl=None, stale_ttl=None, load_seconds=0.0):
+        ttl = self.ttl if ttl is None else ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        now = time.monotonic()
+        with self._lock:
+            self._set_locked(key, value, now, ttl, stale_ttl, load_seconds)
+
+    def _set_locked(self, key, value, now, ttl, stale_ttl, load_seconds):
+        self._entries[key] = (value, now + ttl, now + ttl + stale_ttl, load_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_load(self, key, loader, ttl=None, stale_ttl=None, should_cache=None):
+        """
+        Returns (value, status) for the key, calling loader() on a MISS.
+
+        On a STALE hit the cached value is returned right away and loader() runs
+        in a background thread. should_cache(value) can reject results that must
+        not be kept, such as partial responses. Exceptions from loader() are
+        raised on a MISS and only logged during a background refresh.
+
+        If another thread is already loading the key, this call waits for that
+        load and returns its result (or raises its exception) with status
+        COALESCED, instead of calling loader() again.
+        """
+        value, status = self.get(key)
+
+        if status == MISS:
+            value, status = self._load(key, loader, ttl, stale_ttl, should_cache)
+        elif status == STALE:
+            self._refresh_in_background(key, loader, ttl, stale_ttl, should_cache)
+
+        # Reported per invocation as CacheHit, CacheStale, CacheMiss and CacheCoalesced
+        metrics.increment('Cache' + status.title())
+        return value, status
+
+    def _load(self, key, loader, ttl, stale_ttl, should_cache):
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                generation = self._generation
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, COALESCED
+
+        started = time.monotonic()
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            load_seconds = time.monotonic() - started
+            with self._lock:
+                self.load_seconds += load_seconds
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+                if (flight.error is None and generation == self._generation
+                        and (should_cache is None or should_cache(flight.value))):
+                    self._set_locked(
+                        key, flight.value, time.monotonic(),
+                        self.ttl if ttl is None else ttl,
+                        self.stale_ttl if stale_ttl is None else stale_ttl,
+                        load_seconds
+                    )
+            flight.done.set()
+
+        return flight.value, MISS
+
+    def _refresh_in_background(self, key, loader, ttl, stale_ttl, should_cache):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            generation = self._generation
+
+        def refresh():
+            started = time.monotonic()
+            try:
+                value = loader()
+                load_seconds = time.monotonic() - started
+                keep = should_cache is None or should_cache(value)
+                with self._lock:
+                    self.load_seconds += load_seconds
+                    # Like _load: a value loaded before invalidate()/clear() may be out of date
+                    if keep and generation == self._generation:
+                        self._set_locked(
+                            key, value, time.monotonic(),
+                            self.ttl if ttl is None else ttl,
+                            self.stale_ttl if stale_ttl is None else stale_ttl,
+                            load_seconds
+                        )
+            except Exception as e:
+                print(f"Background cache refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'hit_ratio': round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+                'load_ms': round(self.load_seconds * 1000),
+                'saved_ms': round(self.saved_seconds * 1000)
+            }
@@ -0,0 +1,139 @@
+import csv
+import gzip
+import io
+import os
+import queue
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from common import metrics, serializer
+
+# Pages each scanner may have waiting for the writer before it blocks.
+# Keeps memory bounded to roughly (segments * PAGES_PER_SEGMENT) 1 MB pages.
+PAGES_PER_SEGMENT = 2
+
+# Marks the end of one segment in the page queue
+_SEGMENT_DONE = object()
+
+
+def _scan_segment(table, segment, total_segments, pages, stop, scan_args):
+    """
+    Scans one segment and puts each page of items on the queue, ending with _SEGMENT_DONE.
+    An exception is put on the queue in place of the marker.
+    """
+    args = dict(scan_args, Segment=segment, TotalSegments=total_segments)
+    try:
+        while not stop.is_set():
+            response = table.scan(**args)
+            pages.put(response['Items'])
+            if 'LastEvaluatedKey' not in response:
+                break
+            args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        pages.put(_SEGMENT_DONE)
+    except Exception as e:
+        pages.put(e)
+
+
+def _format_page(items, fmt, fields):
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+        for item in items:
+            writer.writerow({key: serializer.decimal_default(value) if isinstance(value, Decimal) else value
+                             for key, value in item.items()})
+    else:
+        for item in items:
+            buffer.write(serializer.dumps(item))
+            buffer.write('\n')
+    return buffer.getvalue()
+
+
+def export_table(table, out, fmt='ndjson', total_segments=4, fields=None, scan_args=None):
+    """
+    Writes every item of a DynamoDB table to a text stream as NDJSON or CSV.
+
+    The table is read with a parallel Scan: one thread per segment. Pages are
+    handed to the calling thread through a bounded queue and written one page
+    at a time, so memory stays flat however large the table is.
+
+    Args:
+        table: boto3 Table resource.
+        out: Text stream to write to.
+        fmt: 'ndjson' or 'csv'.
+        total_segments: Number of Scan segments, and threads, to use.
+        fields: Column order for CSV. Required for CSV; other attributes are left out.
+        scan_args: Extra Scan arguments, such as a ProjectionExpression.
+
+    Returns:
+        The number of items written.
+    """
+    if fmt not in ('ndjson', 'csv'):
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == 'csv' and not fields:
+        raise ValueError("CSV export needs a list of fields.")
+
+    if fmt == 'csv':
+        csv.writer(out).writerow(fields)
+
+    pages = queue.Queue(maxsize=total_segments * PAGES_PER_SEGMENT)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=total_segments)
+    for segment in range(total_segments):
+        executor.submit(metrics.bind(_scan_segment), table, segment, total_segments, pages, stop, scan_args or {})
+
+    written = 0
+    running = total_segments
+    try:
+        while running:
+            page = pages.get()
+            if page is _SEGMENT_DONE:
+                running -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                out.write(_format_page(page, fmt, fields))
+                written += len(page)
+    finally:
+        stop.set()
+        # Unblock scanners waiting on a full queue so they can see the stop flag
+        while running:
+            try:
+                page = pages.get(timeout=1)
+            except queue.Empty:
+                break
+            if page is _SEGMENT_DONE or isinstance(page, Exception):
+                running -= 1
+        executor.shutdown(wait=False)
+
+    return written
+
+
+def export_to_destination(table, destination, fmt='ndjson', total_segments=4, fields=None,
+                          compress=False, scan_args=None):
+    """
+    Exports a table to a local path or to an s3://bucket/key URL, optionally gzip-compressed.
+
+    S3 exports are written to a temporary file first and then uploaded with a
+    multipart upload, so the data never has to fit in memory.
+    Returns the number of items written.
+    """
+    if destination.startswith('s3://'):
+        bucket, _, key = destination[len('s3://'):].partition('/')
+        fd, local_path = tempfile.mkstemp(suffix='.gz' if compress else '')
+        os.close(fd)
+        try:
+            written = export_to_destination(table, local_path, fmt, total_segments, fields, compress, scan_args)
+            import boto3
+            boto3.client('s3').upload_file(local_path, bucket, key)
+        finally:
+            os.remove(local_path)
+        return written
+
+    if compress:
+        out = gzip.open(destination, 'wt', encoding='utf-8', newline='')
+    else:
+        out = open(destination, 'w', encoding='utf-8', newline='')
+    with out:
+        return export_table(table, out, fmt, total_segments, fields, scan_args)
@@ -0,0 +1,231 @@
+import base64
+import bisect
+import hashlib
+import json
+import os
+import threading
+
+from common.store import STORE_BACKEND, STORE_DIR
+
+# Table used by the dynamodb backend. Its partition key is the string 'historyKey'
+# and its sort key the string 'sortKey'.
+HISTORY_TABLE = os.environ.get('HISTORY_TABLE', 'dashboard-history')
+
+# Sort keys greater than every key starting with a given prefix end with this
+# ('~' sorts after the digits, letters and punctuation used in keys)
+END_OF_PREFIX = '~'
+
+
+def encode_cursor(key):
+    """
+    Turns the key of the last entry read into an opaque, URL-safe 'next' token.
+    """
+    if not key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Turns a 'next' token back into a key. Raises ValueError if the token is invalid.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if not isinstance(key, dict) or not isinstance(key.get('sortKey'), str):
+            raise ValueError()
+        return key
+    except Exception:
+        raise ValueError('Invalid "next" token.')
+
+
+def _matches(item, filters):
+    return all(item.get(field) == value for field, value in (filters or {}).items())
+
+
+def _query_sorted(keys, items, start, end, filters, limit, cursor):
+    """
+    Reads one page, newest first, from a sorted list of sort keys and a dict
+    of items by sort key. Returns (items, next_cursor).
+    """
+    upper = len(keys) if end is None else bisect.bisect_right(keys, end)
+    if cursor:
+        upper = min(upper, bisect.bisect_left(keys, decode_cursor(cursor)['sortKey']))
+    lower = 0 if start is None else bisect.bisect_left(keys, start)
+
+    page = []
+    for index in range(upper - 1, lower - 1, -1):
+        item = items[keys[index]]
+        if not _matches(item, filters):
+            continue
+        page.append(item)
+        if len(page) == limit:
+            # Only a cursor if there is something left to read
+            return page, encode_cursor({'sortKey': keys[index]}) if index > lower else None
+    return page, None
+
+
+class MemoryHistory:
+    """
+    Keeps entries in sorted lists for the life of the container.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._partitions = {}  # partition -> (sorted keys, items by key)
+        self._lock = threading.Lock()
+
+    def append(self, partition, entries):
+        with self._lock:
+            keys, items = self._partitions.setdefault(partition, ([], {}))
+            for sort_key, item in entries:
+                if sort_key not in items:
+                    bisect.insort(keys, sort_key)
+                items[sort_key] = item
+
+    def query(self, partition, start=None, end=None, filters=None, limit=100, cursor=None):
+        with self._lock:
+            keys, items = self._partitions.get(partition, ([], {}))
+            return _query_sorted(keys, items, start, end, filters, limit, cursor)
+
+
+class FileHistory:
+    """
+    Keeps each partition as a JSON file of [sort key, item] pairs in a local directory.
+    """
+
+    def __init__(self, namespace, directory):
+        self.namespace = namespace
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, partition):
+        name = hashlib.sha256(f"{self.namespace}:{partition}".encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"history-{name}.json")
+
+    def _load(self, partition):
+        try:
+            with open(self._path(partition), 'r') as f:
+                entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            entries = []
+        return [sort_key for sort_key, _ in entries], {sort_key: item for sort_key, item in entries}
+
+    def append(self, partition, entries):
+        with self._lock:
+            keys, items = self._load(partition)
+            for sort_key, item in entries:
+                items[sort_key] = item
+            # Write to a temporary file first so a reader never sees a half-written history
+            path = self._path(partition)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump([[sort_key, items[sort_key]] for sort_key in sorted(items)], f)
+            os.replace(tmp_path, path)
+
+    def query(self, partition, start=None, end=None, filters=None, limit=100, cursor=None):
+        keys, items = self._load(partition)
+        return _query_sorted(keys, items, start, end, filters, limit, cursor)
+
+
+class DynamoDBHistory:
+    """
+    Keeps each entry as an item in a DynamoDB table, with the partition (prefixed
+    by the namespace) as partition key and the entry's sort key as sort key, so a
+    range of a partition is a single Query.
+
+    Filters are applied as a FilterExpression, so DynamoDB still reads (and
+    bills) the filtered-out items of the range.
+    """
+
+    def __init__(self, namespace, table_name):
+        self.namespace = namespace
+        self.table_name = table_name
+        self._table = None
+        self._lock = threading.Lock()
+
+    @property
+    def table(self):
+        # Created on first use, so importing a handler does not import boto3
+        if self._table is None:
+            with self._lock:
+                if self._table is None:
+                    import boto3
+                    from common import metrics
+                    resource = boto3.resource('dynamodb')
+                    metrics.instrument_dynamodb(resource.meta.client)
+                    self._table = resource.Table(self.table_name)
+        return self._table
+
+    def append(self, partition, entries):
+        history_key = f"{self.namespace}:{partition}"
+        # batch_writer sends 25 items per BatchWriteItem call and retries unprocessed ones
+        with self.table.batch_writer(overwrite_by_pkeys=['historyKey', 'sortKey']) as batch:
+            for sort_key, item in entries:
+                batch.put_item(Item={**item, 'historyKey': history_key, 'sortKey': sort_key})
+
+    def query(self, partition, start=None, end=None, filters=None, limit=100, cursor=None):
+        from boto3.dynamodb.conditions import Attr, Key
+
+        history_key = f"{self.namespace}:{partition}"
+        key_condition = Key('historyKey').eq(history_key)
+        if start is not None and end is not None:
+            key_condition = key_condition & Key('sortKey').between(start, end)
+        elif start is not None:
+            key_condition = key_condition & Key('sortKey').gte(start)
+        elif end is not None:
+            key_condition = key_condition & Key('sortKey').lte(end)
+
+        query_args = {
+            'KeyConditionExpression': key_condition,
+            'ScanIndexForward': False,
+            'Limit': limit
+        }
+        filter_expression = None
+        for field, value in (filters or {}).items():
+            condition = Attr(field).eq(value)
+            filter_expression = condition if filter_expression is None else filter_expression & condition
+        if filter_expression is not None:
+            query_args['FilterExpression'] = filter_expression
+        if cursor:
+            query_args['ExclusiveStartKey'] = {'historyKey': history_key, 'sortKey': decode_cursor(cursor)['sortKey']}
+
+        # Limit counts the items read before filtering, so keep reading until the page is full
+        page = []
+        while True:
+            response = self.table.query(**query_args)
+            for item in response['Items']:
+                sort_key = item.pop('sortKey')
+                item.pop('historyKey', None)
+                page.append(item)
+                if len(page) == limit:
+                    more = 'LastEvaluatedKey' in response or item is not response['Items'][-1]
+                    return page, encode_cursor({'sortKey': sort_key}) if more else None
+            if 'LastEvaluatedKey' not in response:
+                return page, None
+            query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def create_history(namespace, backend=None):
+    """
+    Creates a time-ordered history for the given namespace: entries appended
+    under a partition (e.g. a username) with a sort key, read back newest first
+    in pages, by sort key range and with equality filters on item fields.
+
+    Appending an entry with a sort key that is already stored replaces it, so
+    the same entries can be appended again safely.
+
+    Args:
+        namespace: Prefix that keeps this history apart from other users of the same backend.
+        backend: 'memory', 'file' or 'dynamodb'. Defaults to the STORE_BACKEND environment variable.
+    """
+    backend = backend or STORE_BACKEND
+
+    if backend == 'memory':
+        return MemoryHistory(namespace)
+    elif backend == 'file':
+        return FileHistory(namespace, STORE_DIR)
+    elif backend == 'dynamodb':
+        return DynamoDBHistory(namespace, HISTORY_TABLE)
+    else:
+        raise ValueError(f"Unknown history backend: {backend}")
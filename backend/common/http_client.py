@@ -0,0 +1,148 @@
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from common import metrics
+
+# requests is imported on first use rather than here: it adds tens of
+# milliseconds to every cold start, including for requests that never call
+# an upstream API (CORS preflights, validation errors, cache hits).
+
+# (connect, read) timeouts in seconds for each upstream host.
+# Without a timeout a hung upstream can use up the whole Lambda timeout.
+HOST_TIMEOUTS = {
+    'api.github.com': (3.05, 10),
+    'api.weatherapi.com': (3.05, 5),
+    'newsapi.org': (3.05, 8),
+}
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Retries after the first attempt, for connection errors, timeouts and the statuses below
+HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', '2'))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Backoff before retry n is a random delay between 0 and min(BACKOFF_MAX, BACKOFF_BASE * 2**n)
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 4.0
+
+# Process-wide session, so connections stay open across warm invocations
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the shared requests.Session, creating it on first use.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                # Handlers fetch several sections concurrently, so keep a few connections per host
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def __getattr__(name):
+    """
+    Makes http_client.RequestException available without importing requests
+    up front. Handlers use it in except clauses, which are only evaluated
+    when an exception is raised, by which time requests has been imported.
+    """
+    if name == 'RequestException':
+        import requests
+        return requests.exceptions.RequestException
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def timeout_for(url):
+    return HOST_TIMEOUTS.get(urlsplit(url).hostname, DEFAULT_TIMEOUT)
+
+
+def backoff_delay(attempt):
+    """
+    Exponential backoff with full jitter, so concurrent callers do not retry in lockstep.
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_after(response):
+    # Only the delay-seconds form is used by the APIs we call
+    value = response.headers.get('Retry-After')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def request(method, url, timeout=None, retries=HTTP_MAX_RETRIES, **kwargs):
+    """
+    Sends a request through the shared session.
+
+    Connection errors, timeouts and 429/5xx responses are retried with jittered
+    exponential backoff (or the Retry-After delay when the server sends one).
+    A response asking to wait longer than BACKOFF_MAX, such as a rate limit,
+    is not retried. The last response is returned as-is, so callers still
+    call raise_for_status().
+    """
+    import requests
+    session = get_session()
+    timeout = timeout or timeout_for(url)
+
+    # One span per call, retries and backoff included, so UpstreamTime is the time callers waited
+    with metrics.span('upstream', urlsplit(url).hostname):
+        return _send(requests, session, method, url, timeout, retries, **kwargs)
+
+
+def _send(requests, session, method, url, timeout, retries, **kwargs):
+    for attempt in range(retries + 1):
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt)
+            metrics.increment('UpstreamRetries')
+            print(f"{method} {urlsplit(url).hostname} failed ({e}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+            continue
+
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            delay = _retry_after(response)
+            if delay is not None and delay > BACKOFF_MAX:
+                return response
+            if delay is None:
+                delay = backoff_delay(attempt)
+            metrics.increment('UpstreamRetries')
+            print(f"{method} {urlsplit(url).hostname} returned {response.status_code}, retrying in {delay:.2f}s")
+            response.close()
+            time.sleep(delay)
+            continue
+
+        return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def aws_config():
+    """
+    Returns the botocore Config used for AWS clients, with the same kind of
+    timeouts, keep-alive and jittered retries as the HTTP session.
+    """
+    from botocore.config import Config
+    return Config(
+        connect_timeout=DEFAULT_TIMEOUT[0],
+        read_timeout=DEFAULT_TIMEOUT[1],
+        retries={'max_attempts': HTTP_MAX_RETRIES + 1, 'mode': 'standard'},
+        tcp_keepalive=True,
+        max_pool_connections=20
+    )
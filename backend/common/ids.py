@@ -0,0 +1,67 @@
+import threading
+import time
+
+# Snowflake-style IDs that fit in 53 bits, so they stay exact as JSON/JavaScript numbers:
+#
+#   | 41 bits: ms since EPOCH_MS | 8 bits: worker | 4 bits: sequence |
+#
+# IDs sort by creation time, and IDs made by different workers never collide.
+# 41 bits of milliseconds last until 2093. Worker and sequence bits can be
+# split differently without affecting IDs already made, as long as their sum
+# (the timestamp shift) stays the same.
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+WORKER_BITS = 8
+SEQUENCE_BITS = 4
+MAX_WORKERS = 1 << WORKER_BITS
+_SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+_TIMESTAMP_SHIFT = WORKER_BITS + SEQUENCE_BITS
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class SnowflakeGenerator:
+    """
+    Generates increasing IDs for one worker. Thread-safe.
+
+    Up to 16 IDs are handed out per millisecond; after that the generator waits
+    for the next millisecond. If the clock goes backwards it keeps counting from
+    the last millisecond it used, so IDs never repeat or go down.
+    """
+
+    def __init__(self, worker_id):
+        if not 0 <= worker_id < MAX_WORKERS:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKERS - 1}")
+        self.worker_id = worker_id
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            now = max(_now_ms() - EPOCH_MS, self._last_ms)
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & _SEQUENCE_MASK
+                if self._sequence == 0:
+                    while now <= self._last_ms:
+                        time.sleep(0.0001)
+                        now = _now_ms() - EPOCH_MS
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (now << _TIMESTAMP_SHIFT) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+
+def id_floor(timestamp_ms):
+    """
+    Returns the smallest ID that can be generated at or after the given Unix time in ms.
+    """
+    return max(timestamp_ms - EPOCH_MS, 0) << _TIMESTAMP_SHIFT
+
+
+def id_timestamp(snowflake_id):
+    """
+    Returns the Unix time in ms at which an ID was generated.
+    """
+    return (int(snowflake_id) >> _TIMESTAMP_SHIFT) + EPOCH_MS
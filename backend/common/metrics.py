@@ -0,0 +1,290 @@
+import collections
+import contextvars
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+# CloudWatch namespace of the metrics. METRICS_ENABLED=0 turns the records off.
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'PersonalDashboard')
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+
+# Sampling profiler: this fraction of invocations is profiled, and the profile
+# is added to the record when the invocation takes at least METRICS_SLOW_MS.
+# Off by default; sampling every few ms costs some CPU.
+PROFILE_RATE = float(os.environ.get('METRICS_PROFILE_RATE', '0'))
+PROFILE_INTERVAL = float(os.environ.get('METRICS_PROFILE_INTERVAL_MS', '5')) / 1000
+SLOW_MS = float(os.environ.get('METRICS_SLOW_MS', '1000'))
+# Most frequent stacks kept in a profile
+PROFILE_TOP_STACKS = 20
+
+# Span categories reported as metrics: total milliseconds and number of spans.
+# Times are summed over concurrent spans, so they can add up to more than Duration.
+SPAN_METRICS = {
+    'upstream': ('UpstreamTime', 'UpstreamCalls'),
+    'dynamodb': ('DynamoDBTime', 'DynamoDBCalls'),
+    'serialize': ('SerializeTime', None),
+    'compress': ('CompressTime', None),
+}
+
+# DynamoDB operations that accept ReturnConsumedCapacity
+CAPACITY_OPERATIONS = {'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan', 'BatchGetItem',
+                       'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems'}
+
+# True until the first invocation in this container has started
+_cold = True
+_current = contextvars.ContextVar('invocation', default=None)
+_dynamodb_calls = threading.local()
+
+
+class Invocation:
+    """
+    What one invocation spent its time on. Spans and counters from every
+    thread working on the invocation are added here (see bind()).
+    """
+
+    def __init__(self, function_name, cold, request_id=None):
+        self.function_name = function_name
+        self.cold = cold
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        # "<category>:<detail>" -> [count, total ms]
+        self.spans = collections.defaultdict(lambda: [0, 0.0])
+        self.counters = collections.Counter()
+        self.properties = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, category, detail, ms):
+        key = f"{category}:{detail}" if detail else category
+        with self._lock:
+            span = self.spans[key]
+            span[0] += 1
+            span[1] += ms
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def record(self, status_code, profile=None):
+        """
+        Returns the invocation as a CloudWatch embedded metric format (EMF) record.
+        """
+        duration = (time.perf_counter() - self.started) * 1000
+        values = {'Duration': duration, 'ColdStart': int(self.cold)}
+        for category, (time_metric, count_metric) in SPAN_METRICS.items():
+            spans = [span for key, span in self.spans.items() if key.split(':')[0] == category]
+            values[time_metric] = sum(ms for _, ms in spans)
+            if count_metric:
+                values[count_metric] = sum(count for count, _ in spans)
+        values.update(self.counters)
+        if status_code is not None:
+            values['Errors'] = int(status_code >= 500)
+
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['Function']],
+                    'Metrics': [{'Name': name, 'Unit': metric_unit(name)} for name in values],
+                }],
+            },
+            'Function': self.function_name,
+            **{name: round(value, 3) if isinstance(value, float) else value for name, value in values.items()},
+            # Properties: searchable in the log record, not turned into metrics
+            'statusCode': status_code,
+            'requestId': self.request_id,
+            'spans': {key: {'count': count, 'ms': round(ms, 3)} for key, (count, ms) in sorted(self.spans.items())},
+            **self.properties,
+        }
+        if profile:
+            record['profile'] = profile
+        return record
+
+
+def metric_unit(name):
+    if name.endswith('Time') or name == 'Duration':
+        return 'Milliseconds'
+    return 'Count'
+
+
+def current():
+    """
+    Returns the Invocation being recorded, or None outside an instrumented handler.
+    """
+    return _current.get()
+
+
+class span:
+    """
+    Times a block and adds it to the current invocation, if there is one:
+
+        with metrics.span('upstream', 'api.github.com'):
+            ...
+    """
+
+    def __init__(self, category, detail=None):
+        self.category = category
+        self.detail = detail
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        invocation = _current.get()
+        if invocation is not None:
+            invocation.add_span(self.category, self.detail, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+def increment(name, value=1):
+    """
+    Adds to a counter of the current invocation, reported as a metric of that name.
+    """
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.increment(name, value)
+
+
+def set_property(name, value):
+    """
+    Adds a field to the current invocation's record without making it a metric.
+    """
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.properties[name] = value
+
+
+def bind(fn):
+    """
+    Returns fn wrapped to run in a copy of the current context. Pass work to
+    executor threads through it, so their spans count towards this invocation:
+
+        executor.submit(metrics.bind(fetch), url)
+    """
+    context = contextvars.copy_context()
+    return functools.partial(context.run, fn)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every other thread every `interval` seconds and
+    counts them, as collapsed "outer;...;inner" stacks (the format flame
+    graph tools read).
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def top(self, count):
+        return [{'stack': stack, 'samples': samples} for stack, samples in self.samples.most_common(count)]
+
+
+def instrumented(function_name):
+    """
+    Decorator for a Lambda handler. Records each invocation and prints one EMF
+    record for it, which CloudWatch turns into metrics under METRICS_NAMESPACE:
+    Duration, ColdStart, Errors, the time and count of each span category and
+    the counters. The record also lists every span, the status code and the
+    request ID.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            global _cold
+            if not METRICS_ENABLED:
+                return handler(event, context)
+
+            invocation = Invocation(function_name, _cold, getattr(context, 'aws_request_id', None))
+            _cold = False
+            profiler = SamplingProfiler(PROFILE_INTERVAL).start() if random.random() < PROFILE_RATE else None
+            token = _current.set(invocation)
+            response = None
+            try:
+                response = handler(event, context)
+                return response
+            finally:
+                _current.reset(token)
+                profile = None
+                if profiler:
+                    profiler.stop()
+                    if (time.perf_counter() - invocation.started) * 1000 >= SLOW_MS:
+                        profile = profiler.top(PROFILE_TOP_STACKS)
+                status_code = response.get('statusCode') if isinstance(response, dict) else None
+                if response is None:
+                    status_code = 500
+                print(json.dumps(invocation.record(status_code, profile), default=str))
+        return wrapper
+    return decorator
+
+
+def _request_capacity(model, params, **kwargs):
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def _before_dynamodb_call(**kwargs):
+    _dynamodb_calls.started = time.perf_counter()
+
+
+def _after_dynamodb_call(model, parsed, **kwargs):
+    invocation = _current.get()
+    started = getattr(_dynamodb_calls, 'started', None)
+    if invocation is None or started is None:
+        return
+    invocation.add_span('dynamodb', model.name, (time.perf_counter() - started) * 1000)
+
+    consumed = parsed.get('ConsumedCapacity') or []
+    for capacity in consumed if isinstance(consumed, list) else [consumed]:
+        read = capacity.get('ReadCapacityUnits')
+        write = capacity.get('WriteCapacityUnits')
+        # Without a read/write split (e.g. a Query), the total is all reads or all writes
+        if read is None and write is None:
+            total = capacity.get('CapacityUnits', 0)
+            if model.name in ('PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem', 'TransactWriteItems'):
+                write = total
+            else:
+                read = total
+        invocation.increment('ConsumedReadCapacity', read or 0)
+        invocation.increment('ConsumedWriteCapacity', write or 0)
+
+
+def instrument_dynamodb(client):
+    """
+    Times every call made through a boto3 DynamoDB client (or a resource's
+    meta.client) and asks DynamoDB for the capacity each one consumed,
+    reported as ConsumedReadCapacity and ConsumedWriteCapacity.
+    """
+    events = client.meta.events
+    events.register('provide-client-params.dynamodb', _request_capacity, unique_id='metrics-capacity')
+    events.register('before-call.dynamodb', _before_dynamodb_call, unique_id='metrics-before-call')
+    events.register('after-call.dynamodb', _after_dynamodb_call, unique_id='metrics-after-call')
+    return client
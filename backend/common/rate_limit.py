@@ -0,0 +1,131 @@
+import threading
+import time
+
+# Call priorities. A call is only made while the remaining budget stays above
+# the reserve for its priority, so when calls run short the LOW ones stop
+# first and the HIGH ones last.
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+# How long to stop calling after a secondary rate limit without a Retry-After
+# (GitHub asks for at least a minute), doubled each time it happens again
+SECONDARY_LIMIT_WAIT = 60
+SECONDARY_LIMIT_MAX_WAIT = 15 * 60
+
+
+class RateLimitedError(Exception):
+    """
+    Raised instead of making a call the budget does not allow.
+    """
+
+
+class RateLimitBudget:
+    """
+    Tracks an API's rate limit from the X-RateLimit-* and Retry-After headers
+    of its responses, for all threads in the container.
+
+    Before a call, acquire(priority) checks that the call fits: the remaining
+    budget, less the calls already in flight, must stay above the reserve for
+    the priority (priority * reserve). After the call, update(response) records
+    the new state and releases the reservation.
+
+    A response with no calls left, or a secondary rate limit (a 403/429 with
+    Retry-After, or a "secondary rate limit" message), blocks every call until
+    the limit resets or the Retry-After has passed.
+    """
+
+    def __init__(self, reserve=50):
+        self.reserve = reserve
+        self.limit = None
+        self.remaining = None
+        self.used = None
+        # Unix time when the limit resets, and until when calls are blocked
+        self.reset_at = None
+        self.blocked_until = 0
+        self.secondary_limits = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, priority=NORMAL):
+        """
+        Reserves one call. Returns True if it may be made; the caller must then
+        call update() (or release() if no response came back).
+        """
+        now = time.time()
+        with self._lock:
+            if now < self.blocked_until:
+                return False
+            if self.remaining is not None and (self.reset_at is None or now < self.reset_at):
+                if self.remaining - self.in_flight <= priority * self.reserve:
+                    return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def update(self, response):
+        """
+        Records the rate limit state from a response and releases its reservation.
+        """
+        headers = response.headers
+        now = time.time()
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+            if headers.get('X-RateLimit-Remaining') is not None:
+                remaining = _int(headers.get('X-RateLimit-Remaining'), self.remaining)
+                reset_at = _int(headers.get('X-RateLimit-Reset'), self.reset_at)
+                # Concurrent responses can arrive out of order. Within one window
+                # the budget only goes down, so the lowest count is the latest.
+                if reset_at == self.reset_at and self.remaining is not None and remaining is not None:
+                    remaining = min(remaining, self.remaining)
+                self.limit = _int(headers.get('X-RateLimit-Limit'), self.limit)
+                self.remaining = remaining
+                self.used = _int(headers.get('X-RateLimit-Used'), self.used)
+                self.reset_at = reset_at
+
+            if response.status_code not in (403, 429):
+                if response.status_code < 400:
+                    self.secondary_limits = 0
+                return
+
+            retry_after = _int(headers.get('Retry-After'), None)
+            if retry_after is not None or _is_secondary_limit(response):
+                # Secondary limit: wait as asked, or back off exponentially
+                self.secondary_limits += 1
+                wait = retry_after if retry_after is not None else min(
+                    SECONDARY_LIMIT_MAX_WAIT, SECONDARY_LIMIT_WAIT * 2 ** (self.secondary_limits - 1))
+                self.blocked_until = max(self.blocked_until, now + wait)
+            elif self.remaining == 0 and self.reset_at:
+                # Primary limit used up: nothing more until it resets
+                self.blocked_until = max(self.blocked_until, self.reset_at)
+
+    def snapshot(self):
+        """
+        Returns the state for response metadata.
+        """
+        with self._lock:
+            now = time.time()
+            return {
+                'limit': self.limit,
+                'remaining': self.remaining,
+                'reset': self.reset_at,
+                'blocked_until': int(self.blocked_until) if self.blocked_until > now else None,
+            }
+
+
+def _int(value, default):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def _is_secondary_limit(response):
+    try:
+        return 'secondary rate limit' in response.text.lower()
+    except Exception:
+        return False
@@ -0,0 +1,157 @@
+import base64
+import gzip
+import hashlib
+import os
+
+from common import metrics
+
+# brotli is optional: install it next to the handlers to offer 'br' as well as gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as they are; compressing them saves less than it costs
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Cache-Control for successful GET responses that do not set their own: the
+# client must revalidate every time, which the ETag turns into a cheap 304
+NO_CACHE = 'private, no-cache'
+# Cache-Control for errors and for responses to other methods
+NO_STORE = 'no-store'
+
+
+def get_header(event, name):
+    """
+    Case-insensitive lookup of a request header in an API Gateway proxy event.
+    """
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def decode_request(event):
+    """
+    Returns the event with a plain-text body.
+
+    With binary media types enabled on the API (needed to return compressed
+    bodies), API Gateway may pass request bodies base64-encoded.
+    """
+    if event.get('isBase64Encoded') and event.get('body'):
+        event = dict(event, body=base64.b64decode(event['body']).decode('utf-8'), isBase64Encoded=False)
+    return event
+
+
+def cache_control(max_age, stale_while_revalidate=0, private=False):
+    """
+    Builds a Cache-Control value, e.g. cache_control(60, 300) gives
+    'public, max-age=60, stale-while-revalidate=300'.
+    """
+    directives = ['private' if private else 'public', f'max-age={max_age}']
+    if stale_while_revalidate:
+        directives.append(f'stale-while-revalidate={stale_while_revalidate}')
+    return ', '.join(directives)
+
+
+def make_etag(body):
+    """
+    Strong ETag for a response body: a hash of the serialized, uncompressed body.
+    """
+    return '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    True if an If-None-Match header lists the ETag (or is "*").
+    If-None-Match uses weak comparison, so a W/ prefix is ignored.
+    """
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Picks 'br' or 'gzip' from an Accept-Encoding header, or None.
+    Honors q-values, including q=0 to refuse an encoding.
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best = None
+    for coding in available:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > 0 and (best is None or weight > best[1]):
+            best = (coding, weight)
+    return best[0] if best else None
+
+
+def compress_body(body, encoding):
+    data = body.encode('utf-8')
+    with metrics.span('compress', encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=BROTLI_QUALITY)
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def finalize(event, response):
+    """
+    Applies the shared response processing to a handler's proxy response.
+
+    Successful GET/HEAD responses get an ETag computed from the body, before
+    compression, and a Cache-Control header (NO_CACHE unless the handler set
+    one). If the request's If-None-Match matches the ETag, a bodiless 304 is
+    returned instead. Other responses get Cache-Control: no-store unless the
+    handler set one.
+
+    Bodies of at least COMPRESSION_MIN_BYTES are compressed with the best
+    encoding the client accepts and returned base64-encoded, with
+    Content-Encoding set. Vary: Accept-Encoding is always set on bodies that
+    could be compressed, so caches keep the variants apart.
+    """
+    body = response.get('body')
+    headers = dict(response.get('headers') or {})
+    if not body or response.get('isBase64Encoded'):
+        headers.setdefault('Cache-Control', NO_STORE)
+        return dict(response, headers=headers)
+
+    headers['Vary'] = 'Accept-Encoding'
+
+    if response.get('statusCode') == 200 and event.get('httpMethod') in ('GET', 'HEAD'):
+        headers.setdefault('Cache-Control', NO_CACHE)
+        headers['ETag'] = make_etag(body)
+        if etag_matches(get_header(event, 'If-None-Match') or '', headers['ETag']):
+            return dict(response, statusCode=304, headers=headers, body='')
+    else:
+        headers.setdefault('Cache-Control', NO_STORE)
+
+    encoding = negotiate_encoding(get_header(event, 'Accept-Encoding'))
+    if encoding and len(body) >= COMPRESSION_MIN_BYTES:
+        compressed = compress_body(body, encoding)
+        if len(compressed) < len(body):
+            headers['Content-Encoding'] = encoding
+            return dict(
+                response,
+                headers=headers,
+                body=base64.b64encode(compressed).decode('ascii'),
+                isBase64Encoded=True
+            )
+
+    return dict(response, headers=headers)
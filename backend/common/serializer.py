@@ -0,0 +1,41 @@
+import json
+import os
+from decimal import Decimal
+
+from common import metrics
+
+# orjson is several times faster than the standard library, but it is optional:
+# install it next to the handlers to use it. JSON_BACKEND=json forces the standard library.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'orjson' if orjson else 'json')
+
+
+def decimal_default(value):
+    """
+    Converts the values json cannot handle on its own. DynamoDB returns every number
+    as a Decimal: whole numbers become ints, the rest floats.
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Compact output: no spaces after separators and no indentation
+_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=decimal_default)
+
+
+def dumps(obj):
+    """
+    Serializes a response body in one pass, converting Decimals as they are reached
+    instead of copying the whole structure first.
+    """
+    with metrics.span('serialize'):
+        if JSON_BACKEND == 'orjson' and orjson is not None:
+            return orjson.dumps(obj, default=decimal_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        return _encoder.encode(obj)
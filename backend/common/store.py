@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+
+# Which backend create_store() uses when none is given: memory, file or dynamodb
+STORE_BACKEND = os.environ.get('STORE_BACKEND', 'memory')
+# Directory used by the file backend. /tmp is the only writable path on Lambda.
+STORE_DIR = os.environ.get('STORE_DIR', '/tmp/dashboard-store')
+# Table used by the dynamodb backend. Its partition key is the string 'storeKey'.
+STORE_TABLE = os.environ.get('STORE_TABLE', 'dashboard-store')
+
+
+class MemoryStore:
+    """
+    Keeps values in a dict for the life of the container.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._items.get(key)
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+class FileStore:
+    """
+    Keeps each value as a JSON file in a local directory.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key, value):
+        # Write to a temporary file first so a reader never sees a half-written value
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class DynamoDBStore:
+    """
+    Keeps each value as an item in a DynamoDB table.
+    Values are stored as zlib-compressed JSON so large API pages stay under the 400 KB item limit.
+    """
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self._table = None
+        self._lock = threading.Lock()
+
+    @property
+    def table(self):
+        # Created on first use, so importing a handler that builds a store
+        # at module level does not import boto3
+        if self._table is None:
+            with self._lock:
+                if self._table is None:
+                    import boto3
+                    from common import metrics
+                    resource = boto3.resource('dynamodb')
+                    metrics.instrument_dynamodb(resource.meta.client)
+                    self._table = resource.Table(self.table_name)
+        return self._table
+
+    def get(self, key):
+        response = self.table.get_item(Key={'storeKey': key})
+        item = response.get('Item')
+        if not item:
+            return None
+        return json.loads(zlib.decompress(item['value'].value).decode('utf-8'))
+
+    def put(self, key, value):
+        data = zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+        self.table.put_item(Item={'storeKey': key, 'value': data})
+
+    def delete(self, key):
+        self.table.delete_item(Key={'storeKey': key})
+
+
+class NamespacedStore:
+    """
+    Prefixes every key so several features can share one table or directory.
+    """
+
+    def __init__(self, store, namespace):
+        self.store = store
+        self.namespace = namespace
+
+    def get(self, key):
+        return self.store.get(f"{self.namespace}:{key}")
+
+    def put(self, key, value):
+        self.store.put(f"{self.namespace}:{key}", value)
+
+    def delete(self, key):
+        self.store.delete(f"{self.namespace}:{key}")
+
+
+def create_store(namespace, backend=None):
+    """
+    Creates a key/value store for the given namespace.
+
+    Args:
+        namespace: Prefix that keeps this store's keys apart from other users of the same backend.
+        backend: 'memory', 'file' or 'dynamodb'. Defaults to the STORE_BACKEND environment variable.
+    """
+    backend = backend or STORE_BACKEND
+
+    if backend == 'memory':
+        store = MemoryStore()
+    elif backend == 'file':
+        store = FileStore(STORE_DIR)
+    elif backend == 'dynamodb':
+        store = DynamoDBStore(STORE_TABLE)
+    else:
+        raise ValueError(f"Unknown store backend: {backend}")
+
+    return NamespacedStore(store, namespace)
@@ -0,0 +1,96 @@
+import re
+import unicodedata
+
+# Shortest prefix a search term can match by, and the length of the index
+# buckets: a word is stored under its first MIN_PREFIX_LENGTH characters, so a
+# prefix search reads one bucket.
+MIN_PREFIX_LENGTH = 2
+# Longer words are indexed (and searched) by their first MAX_WORD_LENGTH characters
+MAX_WORD_LENGTH = 40
+# Distinct words indexed per text; the rest of a long text is not searchable
+MAX_WORDS = 20
+# Terms allowed in one search
+MAX_QUERY_TERMS = 5
+
+# Sorts after the characters used in dates and zero-padded IDs
+END_OF_PREFIX = '~'
+
+
+def tokenize(text):
+    """
+    Splits a text into its distinct words, in order: lowercased, with accents
+    removed and cut at anything that is not a letter or digit. "Café (2x)"
+    gives ['cafe', '2x'].
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    words = []
+    for word in re.findall(r'[^\W_]+', text):
+        word = word[:MAX_WORD_LENGTH]
+        if word not in words:
+            words.append(word)
+            if len(words) == MAX_WORDS:
+                break
+    return words
+
+
+def bucket(word):
+    return word[:MIN_PREFIX_LENGTH]
+
+
+def entry_key(word, date, item_id):
+    """
+    Sort key of a word's index entry: the word, then the date and ID of the item,
+    so a word's entries are in date order and a date range is one key range.
+    """
+    return f"{word}#{date}#{int(item_id):020d}"
+
+
+def index_keys(text, date, item_id):
+    """
+    Returns the (bucket, entry) keys under which an item with this text is indexed.
+    """
+    return [(bucket(word), entry_key(word, date, item_id)) for word in tokenize(text)]
+
+
+def parse_query(query):
+    """
+    Parses a search query into a list of (term, is_prefix). Terms are normalized
+    like indexed words. A term ending in '*' matches every word starting with it,
+    others match whole words. Raises ValueError if the query cannot be searched.
+    """
+    terms = []
+    for part in (query or '').split():
+        is_prefix = part.endswith('*')
+        words = tokenize(part)
+        for position, word in enumerate(words):
+            # Only the last word of "foo-ba*" is a prefix
+            terms.append((word, is_prefix and position == len(words) - 1))
+
+    if not terms:
+        raise ValueError('"q" must contain at least one word.')
+    if len(terms) > MAX_QUERY_TERMS:
+        raise ValueError(f'"q" can have at most {MAX_QUERY_TERMS} words.')
+    for term, is_prefix in terms:
+        if is_prefix and len(term) < MIN_PREFIX_LENGTH:
+            raise ValueError(f'A prefix must have at least {MIN_PREFIX_LENGTH} characters.')
+    return terms
+
+
+def entry_range(term, date_from=None, date_to=None):
+    """
+    Returns the (lowest, highest) entry keys of a whole-word term's entries
+    dated from date_from to date_to, both inclusive and optional.
+    """
+    return f"{term}#{date_from or ''}", f"{term}#{date_to or END_OF_PREFIX}#{END_OF_PREFIX}"
+
+
+def matches(text, terms):
+    """
+    Returns True if the text contains every term, i.e. if it would be found by them.
+    """
+    words = tokenize(text)
+    return all(
+        any(word.startswith(term) for word in words) if is_prefix else term in words
+        for term, is_prefix in terms
+    )
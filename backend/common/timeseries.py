@@ -0,0 +1,95 @@
+import math
+from array import array
+from collections import Counter
+
+# Ways a column can be reduced when several samples fall in one bucket
+AGGREGATIONS = {
+    'mean': lambda values: math.fsum(values) / len(values),
+    'min': min,
+    'max': max,
+    'sum': math.fsum,
+    'first': lambda values: values[0],
+    # Most frequent value; ties go to the earliest one. Used for codes, such as weather conditions.
+    'mode': lambda values: Counter(values).most_common(1)[0][0],
+}
+
+
+class TimeSeries:
+    """
+    A time series stored column by column.
+
+    Timestamps go in one array of 64-bit integers and each field in its own
+    array of doubles, instead of one dict per sample. That is about 8 bytes per
+    value instead of a few hundred bytes per sample, and it serializes to
+    parallel JSON arrays. Missing values are stored as NaN.
+
+    Each sample also has a bucket time, used by resample() to decide which
+    samples belong together. It defaults to the timestamp; pass the local
+    time (as seconds) to resample by local hours and days.
+    """
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self.times = array('q')
+        self.bucket_times = array('q')
+        self.columns = {field: array('d') for field in self.fields}
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, timestamp, values, bucket_time=None):
+        self.times.append(timestamp)
+        self.bucket_times.append(timestamp if bucket_time is None else bucket_time)
+        for field in self.fields:
+            value = values.get(field)
+            self.columns[field].append(math.nan if value is None else value)
+
+    def resample(self, bucket_seconds, aggregations):
+        """
+        Groups samples into buckets of bucket_seconds (by bucket time) and
+        reduces each bucket with the given aggregations.
+
+        aggregations maps a field to a list of aggregation names from
+        AGGREGATIONS. A field with one aggregation keeps its name; with several,
+        each output column is named "<field>_<aggregation>". Fields that are not
+        listed are dropped. The timestamp of a bucket is that of its first sample.
+        NaNs are ignored, and a bucket with only NaNs gives NaN.
+        """
+        output_fields = []
+        for field, names in aggregations.items():
+            for name in names:
+                output_fields.append((field, name, field if len(names) == 1 else f"{field}_{name}"))
+
+        # Start index of each bucket, plus the end of the series
+        buckets = [time // bucket_seconds for time in self.bucket_times]
+        starts = [i for i in range(len(buckets)) if i == 0 or buckets[i] != buckets[i - 1]]
+        bounds = list(zip(starts, starts[1:] + [len(buckets)]))
+
+        result = TimeSeries([output for _, _, output in output_fields])
+        for start, _ in bounds:
+            result.times.append(self.times[start])
+            result.bucket_times.append(buckets[start] * bucket_seconds)
+
+        # One pass per output column rather than per sample
+        for field, name, output in output_fields:
+            values = self.columns[field].tolist()
+            aggregate = AGGREGATIONS[name]
+            column = result.columns[output]
+            for start, end in bounds:
+                samples = [value for value in values[start:end] if value == value]  # drops NaN
+                column.append(aggregate(samples) if samples else math.nan)
+
+        return result
+
+    def to_dict(self, precision=1):
+        """
+        Returns the series as parallel lists: {"time": [...], "<field>": [...], ...}.
+        Values are rounded to the given number of decimals, whole numbers
+        become ints and NaN becomes None.
+        """
+        data = {'time': self.times.tolist()}
+        for field in self.fields:
+            # value != value is only true for NaN
+            rounded = [None if value != value else round(value, precision) for value in self.columns[field].tolist()]
+            data[field] = [int(value) if value is not None and value.is_integer() else value for value in rounded]
+        return data
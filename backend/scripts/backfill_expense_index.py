@@ -0,0 +1,44 @@
+"""
+One-off migration for the expense table indexes.
+
+get_expenses reads through 'type-date-index', whose partition key is the
+'recordType' attribute. Expenses written before that attribute existed are
+not in the index until this script sets it on them.
+
+Usage:
+    python backend/scripts/backfill_expense_index.py [table-name]
+"""
+import sys
+
+import boto3
+
+RECORD_TYPE = 'expense'
+
+
+def backfill(table_name):
+    table = boto3.resource('dynamodb').Table(table_name)
+    scan_args = {
+        'FilterExpression': 'attribute_not_exists(recordType)',
+        'ProjectionExpression': 'expenseId'
+    }
+    updated = 0
+
+    while True:
+        response = table.scan(**scan_args)
+        for item in response['Items']:
+            table.update_item(
+                Key={'expenseId': item['expenseId']},
+                UpdateExpression='SET recordType = :recordType',
+                ExpressionAttributeValues={':recordType': RECORD_TYPE}
+            )
+            updated += 1
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    print(f"Set recordType on {updated} expenses in {table_name}.")
+
+
+if __name__ == '__main__':
+    backfill(sys.argv[1] if len(sys.argv) > 1 else 'expenses-table')
@@ -0,0 +1,103 @@
+"""
+Fills the expense search index from the expenses table.
+
+add_expense, delete_expense and the batch endpoints keep the search index up
+to date, but expenses written before it existed cannot be found until this
+script has indexed them. It scans every expense once and writes its index
+entries (see common/text_index.py). Entries are keyed by word, date and
+expense, so the script can be run again safely.
+
+It then removes stale entries, e.g. those left under the old IDs of
+expenses moved by an earlier version of migrate_expense_ids.py. An entry is
+only deleted if, read again, its expense no longer has it, so expenses
+added while the script runs keep theirs.
+
+Usage:
+    python backend/scripts/backfill_expense_search_index.py [expenses-table] [search-table]
+"""
+import os
+import sys
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.text_index import index_keys
+
+
+def expected_keys(item):
+    if not item or not item.get('description') or not item.get('date'):
+        return set()
+    return set(index_keys(item['description'], item['date'], item['expenseId']))
+
+
+def remove_stale_entries(table, search_table, expected):
+    """
+    Deletes the index entries that do not belong to any expense. Returns how many.
+    """
+    scan_args = {
+        'ProjectionExpression': '#bucket, #entry, expenseId',
+        'ExpressionAttributeNames': {'#bucket': 'bucket', '#entry': 'entry'},
+        'ConsistentRead': True
+    }
+    removed = 0
+
+    with search_table.batch_writer() as batch:
+        while True:
+            response = search_table.scan(**scan_args)
+            for entry in response['Items']:
+                key = (entry['bucket'], entry['entry'])
+                if key in expected:
+                    continue
+                # Not seen in the scan: check the expense again in case it was written since
+                expense = table.get_item(Key={'expenseId': entry['expenseId']}, ConsistentRead=True).get('Item')
+                if key not in expected_keys(expense):
+                    batch.delete_item(Key={'bucket': entry['bucket'], 'entry': entry['entry']})
+                    removed += 1
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return removed
+
+
+def backfill(table_name, search_table_name):
+    dynamodb = boto3.resource('dynamodb')
+    table = dynamodb.Table(table_name)
+    search_table = dynamodb.Table(search_table_name)
+
+    scan_args = {
+        'ProjectionExpression': 'expenseId, description, #date',
+        'ExpressionAttributeNames': {'#date': 'date'}
+    }
+    expenses = 0
+    entries = 0
+    expected = set()
+
+    with search_table.batch_writer(overwrite_by_pkeys=['bucket', 'entry']) as batch:
+        while True:
+            response = table.scan(**scan_args)
+            for item in response['Items']:
+                keys = expected_keys(item)
+                if not keys:
+                    continue
+                for bucket, entry in keys:
+                    batch.put_item(Item={'bucket': bucket, 'entry': entry,
+                                         'expenseId': item['expenseId'], 'date': item['date']})
+                    entries += 1
+                expected.update(keys)
+                expenses += 1
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    removed = remove_stale_entries(table, search_table, expected)
+    print(f"Wrote {entries} search index entries for {expenses} expenses in {table_name}, "
+          f"removed {removed} stale ones.")
+
+
+if __name__ == '__main__':
+    backfill(sys.argv[1] if len(sys.argv) > 1 else 'expenses-table',
+             sys.argv[2] if len(sys.argv) > 2 else 'expense-search-index')
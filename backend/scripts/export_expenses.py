@@ -0,0 +1,56 @@
+"""
+Exports the expense table for offline analysis.
+
+Reads the table with a parallel scan (one thread per segment) and streams the
+rows to a file as NDJSON or CSV, optionally gzip-compressed. The destination
+can also be an s3://bucket/key URL.
+
+Usage:
+    python backend/scripts/export_expenses.py expenses.ndjson.gz --gzip --segments 8
+    python backend/scripts/export_expenses.py expenses.csv --format csv
+"""
+import argparse
+import os
+import sys
+import time
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.dynamodb_export import export_to_destination
+
+EXPORT_FIELDS = ['expenseId', 'date', 'category', 'description', 'amount', 'timestamp']
+
+
+def segment_count(value):
+    if not value.isdigit() or int(value) < 1:
+        raise argparse.ArgumentTypeError('must be a whole number of at least 1')
+    return int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the expense table.')
+    parser.add_argument('destination', help='Output path or s3://bucket/key URL')
+    parser.add_argument('--table', default='expenses-table')
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    parser.add_argument('--segments', type=segment_count, default=4, help='Parallel scan segments (threads)')
+    parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb').Table(args.table)
+    start = time.monotonic()
+    rows = export_to_destination(
+        table,
+        args.destination,
+        fmt=args.format,
+        total_segments=args.segments,
+        fields=EXPORT_FIELDS,
+        compress=args.gzip
+    )
+    seconds = time.monotonic() - start
+    print(f"Exported {rows} rows to {args.destination} in {seconds:.2f}s ({rows / seconds:.0f} rows/s).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+One-off migration from timestamp expense IDs to time-ordered IDs.
+
+Expenses used to be stored with their millisecond timestamp as expenseId.
+New expenses get IDs from common/ids.py, which sort by creation time and
+back the 'type-id-index' range reads. This script gives every old expense
+the ID it would have had if created at its original timestamp, so old and
+new expenses sort together. The old ID is kept in 'legacyId'.
+
+IDs cannot go back further than the ID epoch (2024-01-01), so expenses
+from before it are numbered 1, 2, 3... in timestamp order instead, which
+still sorts them before every later expense. Expenses with the same
+timestamp get consecutive IDs, so no two old expenses share one.
+
+Each expense is moved with a transaction (put new item, delete old item,
+and move its search index entries to the new ID), so it is never lost or
+duplicated, and the summary totals do not change. Afterwards the data
+version is bumped, so cached expense pages with the old IDs are dropped.
+An expense that cannot be moved is reported and left as it is; the script
+exits with an error if there were any. It can be run again safely:
+already-migrated items are skipped.
+
+Usage:
+    python backend/scripts/migrate_expense_ids.py [expenses-table] [summary-table] [search-table]
+"""
+import os
+import sys
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.ids import EPOCH_MS, id_floor
+from common.text_index import index_keys
+
+# New IDs tried per expense when the one it was given is already taken
+MAX_ATTEMPTS = 100
+
+# Same item as DATA_VERSION_KEY in ExpenseApp
+DATA_VERSION_KEY = {'summaryType': 'meta', 'bucket': 'data-version'}
+
+
+def find_legacy_expenses(table):
+    """
+    Returns the old expenses (whose expenseId is their own timestamp) sorted by
+    timestamp, and the highest ID already given to a pre-epoch expense by an
+    earlier run, so a new run numbers the remaining ones after it.
+    """
+    scan_args = {'ProjectionExpression': 'expenseId, #timestamp, legacyId',
+                 'ExpressionAttributeNames': {'#timestamp': 'timestamp'}}
+    legacy = []
+    last_pre_epoch_id = 0
+
+    while True:
+        response = table.scan(**scan_args)
+        for item in response['Items']:
+            timestamp = int(item.get('timestamp', -1))
+            if int(item['expenseId']) == timestamp:
+                legacy.append((timestamp, int(item['expenseId'])))
+            elif 'legacyId' in item and timestamp < EPOCH_MS:
+                last_pre_epoch_id = max(last_pre_epoch_id, int(item['expenseId']))
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return sorted(legacy), last_pre_epoch_id
+
+
+def search_entries(item, expense_id):
+    """
+    Returns the search index keys of an expense under the given ID.
+    """
+    if not item.get('description') or not item.get('date'):
+        return []
+    return [{'bucket': bucket, 'entry': entry}
+            for bucket, entry in index_keys(item['description'], item['date'], expense_id)]
+
+
+def move_expense(client, table_name, search_table_name, item, new_id):
+    # At most 2 + 2 * MAX_WORDS (40) actions, within the 100 a transaction allows
+    old_entries = search_entries(item, item['expenseId'])
+    new_entries = search_entries(item, new_id)
+    client.transact_write_items(TransactItems=[
+        {
+            'Put': {
+                'TableName': table_name,
+                'Item': dict(item, expenseId=new_id, legacyId=item['expenseId']),
+                'ConditionExpression': 'attribute_not_exists(expenseId)'
+            }
+        },
+        {
+            'Delete': {
+                'TableName': table_name,
+                'Key': {'expenseId': item['expenseId']},
+                'ConditionExpression': 'attribute_exists(expenseId)'
+            }
+        }
+    ] + [
+        {'Delete': {'TableName': search_table_name, 'Key': key}} for key in old_entries
+    ] + [
+        {'Put': {'TableName': search_table_name,
+                 'Item': dict(key, expenseId=new_id, date=item['date'])}} for key in new_entries
+    ])
+
+
+def migrate(table_name, summary_table_name, search_table_name):
+    dynamodb = boto3.resource('dynamodb')
+    table = dynamodb.Table(table_name)
+    client = dynamodb.meta.client
+
+    legacy, last_id = find_legacy_expenses(table)
+    migrated = 0
+    failed = []
+
+    for timestamp, old_id in legacy:
+        item = table.get_item(Key={'expenseId': old_id}, ConsistentRead=True).get('Item')
+        if item is None:
+            # Deleted since the scan
+            continue
+
+        new_id = max(id_floor(timestamp), last_id + 1)
+        error = None
+        for _ in range(MAX_ATTEMPTS):
+            try:
+                move_expense(client, table_name, search_table_name, item, new_id)
+                error = None
+                break
+            except client.exceptions.TransactionCanceledException as e:
+                codes = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+                error = f"transaction cancelled ({', '.join(code or 'None' for code in codes)})"
+                if codes and codes[0] == 'ConditionalCheckFailed':
+                    # The new ID is taken, e.g. by an earlier run: try the next one
+                    new_id += 1
+                    continue
+                break
+            except Exception as e:
+                error = str(e)
+                break
+        else:
+            error = f"no free ID after {MAX_ATTEMPTS} attempts"
+
+        if error:
+            print(f"Could not migrate expense {old_id}: {error}")
+            failed.append(old_id)
+            continue
+        last_id = new_id
+        migrated += 1
+
+    if migrated:
+        dynamodb.Table(summary_table_name).update_item(
+            Key=DATA_VERSION_KEY,
+            UpdateExpression='ADD #version :one',
+            ExpressionAttributeNames={'#version': 'version'},
+            ExpressionAttributeValues={':one': 1}
+        )
+
+    print(f"Migrated {migrated} expenses in {table_name} to time-ordered IDs, {len(failed)} failed.")
+    return not failed
+
+
+if __name__ == '__main__':
+    if not migrate(sys.argv[1] if len(sys.argv) > 1 else 'expenses-table',
+                   sys.argv[2] if len(sys.argv) > 2 else 'expense-summary-table',
+                   sys.argv[3] if len(sys.argv) > 3 else 'expense-search-index'):
+        sys.exit(1)
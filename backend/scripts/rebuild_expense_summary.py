@@ -0,0 +1,60 @@
+"""
+Rebuilds the expense summary table from the expenses table.
+
+add_expense and delete_expense keep the summary totals up to date, but
+expenses written before the summary table existed are not counted until
+this script has run. It scans every expense once and overwrites each
+month, category and month x category bucket.
+
+Usage:
+    python backend/scripts/rebuild_expense_summary.py [expenses-table] [summary-table]
+"""
+import sys
+from collections import defaultdict
+from decimal import Decimal
+
+import boto3
+
+
+def rebuild(table_name, summary_table_name):
+    dynamodb = boto3.resource('dynamodb')
+    table = dynamodb.Table(table_name)
+    summary_table = dynamodb.Table(summary_table_name)
+
+    totals = defaultdict(lambda: [Decimal(0), 0])
+    scan_args = {
+        'ProjectionExpression': 'amount, category, #date',
+        'ExpressionAttributeNames': {'#date': 'date'}
+    }
+
+    while True:
+        response = table.scan(**scan_args)
+        for item in response['Items']:
+            month = item['date'][:7]
+            for key in (('month', month),
+                        ('category', item['category']),
+                        ('month-category', f"{month}#{item['category']}")):
+                totals[key][0] += item['amount']
+                totals[key][1] += 1
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with summary_table.batch_writer() as batch:
+        for (summary_type, bucket), (total, count) in totals.items():
+            batch.put_item(Item={
+                'summaryType': summary_type,
+                'bucket': bucket,
+                'total': total,
+                'count': count
+            })
+
+    print(f"Wrote {len(totals)} summary buckets to {summary_table_name}.")
+
+
+if __name__ == '__main__':
+    rebuild(
+        sys.argv[1] if len(sys.argv) > 1 else 'expenses-table',
+        sys.argv[2] if len(sys.argv) > 2 else 'expense-summary-table'
+    )
@@ -88,6 +88,7 @@ enable_cors()
             --type MOCK \
             --passthrough-behavior WHEN_NO_MATCH \
             --request-templates '{"application/json": "{\"statusCode\": 200}"}' \
+            --content-handling CONVERT_TO_TEXT \
             --region $REGION_NAME
 
         aws apigateway put-method-response \
@@ -109,6 +110,15 @@ enable_cors()
             --region $REGION_NAME
     else
         echo "OPTIONS method already exists. Skipping creation."
+
+        # With */* as a binary media type, a MOCK integration only applies its
+        # request template (and so answers preflights) when it converts to text
+        aws --no-cli-pager apigateway update-integration \
+            --rest-api-id "$rest_api_id" \
+            --resource-id "$resource_id" \
+            --http-method OPTIONS \
+            --patch-operations op=replace,path=/contentHandling,value=CONVERT_TO_TEXT \
+            --region $REGION_NAME
     fi
 
     aws apigateway put-method-response \
@@ -156,18 +166,189 @@ create_method_and_integration()
         --region "$REGION_NAME"
 }
 
+EXPENSE_TABLE_NAME="expenses-table"
+
+create_expense_index()
+{
+    local index_name=$1
+    local partition_key=$2
+    local sort_key=${3:-date}
+    local sort_key_type=${4:-S}
+
+    # GSIs used by ExpenseApp GET, sorted by 'date' (YYYY-MM-DD) unless another sort key is given.
+    # Assumes the table uses on-demand (PAY_PER_REQUEST) billing.
+    echo "Checking for index $index_name on $EXPENSE_TABLE_NAME..."
+    if aws dynamodb describe-table --table-name "$EXPENSE_TABLE_NAME" --region $REGION_NAME \
+        --query "Table.GlobalSecondaryIndexes[?IndexName=='$index_name'].IndexName" --output text | grep -q "$index_name"; then
+        echo "Index $index_name already exists. Skipping creation."
+        return
+    fi
+
+    echo "Creating index $index_name..."
+    aws --no-cli-pager dynamodb update-table \
+        --table-name "$EXPENSE_TABLE_NAME" \
+        --attribute-definitions AttributeName="$partition_key",AttributeType=S AttributeName="$sort_key",AttributeType="$sort_key_type" \
+        --global-secondary-index-updates "[{\"Create\": {\"IndexName\": \"$index_name\", \"KeySchema\": [{\"AttributeName\": \"$partition_key\", \"KeyType\": \"HASH\"}, {\"AttributeName\": \"$sort_key\", \"KeyType\": \"RANGE\"}], \"Projection\": {\"ProjectionType\": \"ALL\"}}}]" \
+        --region $REGION_NAME
+
+    # DynamoDB only builds one index at a time, so wait for this one before going on
+    until [[ "$(aws dynamodb describe-table --table-name "$EXPENSE_TABLE_NAME" --region $REGION_NAME \
+        --query "Table.GlobalSecondaryIndexes[?IndexName=='$index_name'].IndexStatus" --output text)" == "ACTIVE" ]]; do
+        echo "Waiting for index $index_name to become active..."
+        sleep 10
+    done
+}
+
+EXPENSE_SUMMARY_TABLE_NAME="expense-summary-table"
+
+create_expense_summary_table()
+{
+    # Month, category and month x category totals maintained by ExpenseApp
+    echo "Checking for DynamoDB table: $EXPENSE_SUMMARY_TABLE_NAME..."
+    if aws dynamodb describe-table --table-name "$EXPENSE_SUMMARY_TABLE_NAME" --region $REGION_NAME &>/dev/null; then
+        echo "Table $EXPENSE_SUMMARY_TABLE_NAME already exists. Skipping creation."
+        return
+    fi
+
+    echo "Creating table $EXPENSE_SUMMARY_TABLE_NAME..."
+    aws --no-cli-pager dynamodb create-table \
+        --table-name "$EXPENSE_SUMMARY_TABLE_NAME" \
+        --attribute-definitions AttributeName=summaryType,AttributeType=S AttributeName=bucket,AttributeType=S \
+        --key-schema AttributeName=summaryType,KeyType=HASH AttributeName=bucket,KeyType=RANGE \
+        --billing-mode PAY_PER_REQUEST \
+        --region $REGION_NAME
+
+    aws dynamodb wait table-exists --table-name "$EXPENSE_SUMMARY_TABLE_NAME" --region $REGION_NAME
+    echo "Run backend/scripts/rebuild_expense_summary.py once to include existing expenses."
+}
+
+EXPENSE_SEARCH_TABLE_NAME="expense-search-index"
+
+create_expense_search_table()
+{
+    # Inverted index of expense descriptions maintained by ExpenseApp
+    echo "Checking for DynamoDB table: $EXPENSE_SEARCH_TABLE_NAME..."
+    if aws dynamodb describe-table --table-name "$EXPENSE_SEARCH_TABLE_NAME" --region $REGION_NAME &>/dev/null; then
+        echo "Table $EXPENSE_SEARCH_TABLE_NAME already exists. Skipping creation."
+        return
+    fi
+
+    echo "Creating table $EXPENSE_SEARCH_TABLE_NAME..."
+    aws --no-cli-pager dynamodb create-table \
+        --table-name "$EXPENSE_SEARCH_TABLE_NAME" \
+        --attribute-definitions AttributeName=bucket,AttributeType=S AttributeName=entry,AttributeType=S \
+        --key-schema AttributeName=bucket,KeyType=HASH AttributeName=entry,KeyType=RANGE \
+        --billing-mode PAY_PER_REQUEST \
+        --region $REGION_NAME
+
+    aws dynamodb wait table-exists --table-name "$EXPENSE_SEARCH_TABLE_NAME" --region $REGION_NAME
+    echo "Run backend/scripts/backfill_expense_search_index.py once (after migrate_expense_ids.py) to make existing expenses searchable."
+}
+
+STORE_TABLE_NAME="dashboard-store"
+
+create_store_table()
+{
+    # Key/value store used by common/store.py (NewsApp headline snapshots)
+    echo "Checking for DynamoDB table: $STORE_TABLE_NAME..."
+    if aws dynamodb describe-table --table-name "$STORE_TABLE_NAME" --region $REGION_NAME &>/dev/null; then
+        echo "Table $STORE_TABLE_NAME already exists. Skipping creation."
+        return
+    fi
+
+    echo "Creating table $STORE_TABLE_NAME..."
+    aws --no-cli-pager dynamodb create-table \
+        --table-name "$STORE_TABLE_NAME" \
+        --attribute-definitions AttributeName=storeKey,AttributeType=S \
+        --key-schema AttributeName=storeKey,KeyType=HASH \
+        --billing-mode PAY_PER_REQUEST \
+        --region $REGION_NAME
+
+    aws dynamodb wait table-exists --table-name "$STORE_TABLE_NAME" --region $REGION_NAME
+}
+
+HISTORY_TABLE_NAME="dashboard-history"
+
+create_history_table()
+{
+    # Time-ordered histories used by common/history.py (GitHubApp activity)
+    echo "Checking for DynamoDB table: $HISTORY_TABLE_NAME..."
+    if aws dynamodb describe-table --table-name "$HISTORY_TABLE_NAME" --region $REGION_NAME &>/dev/null; then
+        echo "Table $HISTORY_TABLE_NAME already exists. Skipping creation."
+        return
+    fi
+
+    echo "Creating table $HISTORY_TABLE_NAME..."
+    aws --no-cli-pager dynamodb create-table \
+        --table-name "$HISTORY_TABLE_NAME" \
+        --attribute-definitions AttributeName=historyKey,AttributeType=S AttributeName=sortKey,AttributeType=S \
+        --key-schema AttributeName=historyKey,KeyType=HASH AttributeName=sortKey,KeyType=RANGE \
+        --billing-mode PAY_PER_REQUEST \
+        --region $REGION_NAME
+
+    aws dynamodb wait table-exists --table-name "$HISTORY_TABLE_NAME" --region $REGION_NAME
+}
+
+NEWS_SNAPSHOT_RULE_NAME="news-snapshot-refresh"
+NEWS_SNAPSHOT_SCHEDULE="rate(15 minutes)"
+
+create_news_snapshot_schedule()
+{
+    # Invokes NewsApp on a schedule so page loads read a snapshot instead of calling News API
+    local account_id=$1
+
+    echo "Creating schedule $NEWS_SNAPSHOT_RULE_NAME ($NEWS_SNAPSHOT_SCHEDULE) for NewsApp..."
+    rule_arn=$(aws events put-rule \
+        --name "$NEWS_SNAPSHOT_RULE_NAME" \
+        --schedule-expression "$NEWS_SNAPSHOT_SCHEDULE" \
+        --query 'RuleArn' --output text --region $REGION_NAME)
+
+    aws lambda remove-permission \
+        --function-name "NewsApp" \
+        --statement-id "events-invoke-permission" \
+        --region "$REGION_NAME" 2>/dev/null || true
+
+    aws lambda add-permission \
+        --function-name "NewsApp" \
+        --statement-id "events-invoke-permission" \
+        --action "lambda:InvokeFunction" \
+        --principal "events.amazonaws.com" \
+        --source-arn "$rule_arn" \
+        --region "$REGION_NAME"
+
+    aws --no-cli-pager events put-targets \
+        --rule "$NEWS_SNAPSHOT_RULE_NAME" \
+        --targets "Id"="NewsApp","Arn"="arn:aws:lambda:$REGION_NAME:$account_id:function:NewsApp" \
+        --region $REGION_NAME
+}
+
 create_or_update_role "$BASIC_ROLE_NAME"
 create_or_update_role "$EXPENSE_APP_ROLE_NAME" "$DYNAMODB_FULL_ACCESS_POLICY"
 
+create_expense_index "category-date-index" "category"
+create_expense_index "type-date-index" "recordType"
+create_expense_index "type-id-index" "recordType" "expenseId" "N"
+create_expense_summary_table
+create_expense_search_table
+create_store_table
+create_history_table
+echo "Run backend/scripts/backfill_expense_index.py once so older expenses appear in type-date-index and type-id-index,"
+echo "then backend/scripts/migrate_expense_ids.py to move them to time-ordered IDs,"
+echo "then backend/scripts/backfill_expense_search_index.py to index them for search."
+
 echo "Waiting for IAM roles to become available..."
 sleep 5
 
-declare -a APPS=("ExpenseApp" "GitHubApp" "NewsApp" "WeatherApp")
+# DashboardApp runs the other four in-process, so it is packaged with their code
+declare -a APPS=("ExpenseApp" "GitHubApp" "NewsApp" "WeatherApp" "DashboardApp")
+declare -a DASHBOARD_SECTION_APPS=("ExpenseApp" "GitHubApp" "NewsApp" "WeatherApp")
 
 for APP_NAME in "${APPS[@]}"; do
     echo "Processing $APP_NAME..."
 
-    if [[ "$APP_NAME" == "ExpenseApp" ]]; then
+    # NewsApp keeps its headline snapshots and GitHubApp its activity history in DynamoDB too,
+    # and DashboardApp runs all of them
+    if [[ "$APP_NAME" != "WeatherApp" ]]; then
         role_arn=$(aws iam get-role --role-name "$EXPENSE_APP_ROLE_NAME" --query "Role.Arn" --output text)
     else
         role_arn=$(aws iam get-role --role-name "$BASIC_ROLE_NAME" --query "Role.Arn" --output text)
@@ -194,12 +375,41 @@ for APP_NAME in "${APPS[@]}"; do
         echo "Created new REST API with ID: $rest_api_id"
     fi
 
+    # Let Lambda return compressed (base64-encoded) bodies. With this set, request
+    # bodies may also arrive base64-encoded; common/responses.py decodes them.
+    if ! aws apigateway get-rest-api --rest-api-id "$rest_api_id" --query 'binaryMediaTypes' --output text --region $REGION_NAME | grep -qF '*/*'; then
+        echo "Enabling binary media types for $rest_api_name..."
+        aws --no-cli-pager apigateway update-rest-api \
+            --rest-api-id "$rest_api_id" \
+            --patch-operations 'op=add,path=/binaryMediaTypes/*~1*' \
+            --region $REGION_NAME
+    fi
+
     account_id=$(aws sts get-caller-identity --query 'Account' --output text)
 
+    ENV_VARS=""
+
+    if [[ "$APP_NAME" == "NewsApp" ]]; then
+      ENV_VARS="--environment Variables={NEWS_API_KEY=${NEWS_API_KEY},NEWS_SNAPSHOT_BACKEND=dynamodb,STORE_TABLE=${STORE_TABLE_NAME}}"
+    elif [[ "$APP_NAME" == "WeatherApp" ]]; then
+      ENV_VARS="--environment Variables={WEATHER_API_KEY=${WEATHER_API_KEY}}"
+    elif [[ "$APP_NAME" == "GitHubApp" ]]; then
+      ENV_VARS="--environment Variables={GITHUB_PAT=${GITHUB_PAT},GITHUB_USERNAME=${GITHUB_USERNAME},GITHUB_HISTORY_BACKEND=dynamodb,GITHUB_ENRICHMENT_BACKEND=dynamodb,STORE_TABLE=${STORE_TABLE_NAME},HISTORY_TABLE=${HISTORY_TABLE_NAME}}"
+    elif [[ "$APP_NAME" == "DashboardApp" ]]; then
+      ENV_VARS="--environment Variables={NEWS_API_KEY=${NEWS_API_KEY},NEWS_SNAPSHOT_BACKEND=dynamodb,STORE_TABLE=${STORE_TABLE_NAME},WEATHER_API_KEY=${WEATHER_API_KEY},GITHUB_PAT=${GITHUB_PAT},GITHUB_USERNAME=${GITHUB_USERNAME},GITHUB_HISTORY_BACKEND=dynamodb,GITHUB_ENRICHMENT_BACKEND=dynamodb,HISTORY_TABLE=${HISTORY_TABLE_NAME}}"
+    fi
+
     # Create lambda function
     echo "Checking for Lambda function: ${APP_NAME}..."
     if aws lambda get-function --function-name "${APP_NAME}" &>/dev/null; then
-        echo "Lambda function ${APP_NAME} already exists. Skipping creation."
+        # Functions created by an earlier run still need the current role and settings
+        echo "Lambda function ${APP_NAME} already exists. Updating its role and environment..."
+        aws --no-cli-pager lambda update-function-configuration \
+            --function-name "${APP_NAME}" \
+            --role "$role_arn" \
+            --region $REGION_NAME \
+            $ENV_VARS
+        aws lambda wait function-updated --function-name "${APP_NAME}" --region $REGION_NAME
     else
         LAMBDA_FILE="backend/${APP_NAME}/lambda_function.py"
         ZIP_FILE="${APP_NAME}.zip"
@@ -213,6 +423,14 @@ for APP_NAME in "${APPS[@]}"; do
         mkdir -p "$BUILD_DIR"
 
         cp "$LAMBDA_FILE" "$BUILD_DIR/lambda_function.py"
+        cp -r backend/common "$BUILD_DIR/common"
+
+        if [[ "$APP_NAME" == "DashboardApp" ]]; then
+            for SECTION_APP in "${DASHBOARD_SECTION_APPS[@]}"; do
+                mkdir -p "$BUILD_DIR/$SECTION_APP"
+                cp "backend/$SECTION_APP/lambda_function.py" "$BUILD_DIR/$SECTION_APP/lambda_function.py"
+            done
+        fi
 
         if [ -f "backend/requirements.txt" ]; then
             echo "Installing dependencies for $APP_NAME..."
@@ -225,16 +443,6 @@ for APP_NAME in "${APPS[@]}"; do
 
         rm -r "$BUILD_DIR"
 
-        ENV_VARS=""
-
-        if [[ "$APP_NAME" == "NewsApp" ]]; then
-          ENV_VARS="--environment Variables={NEWS_API_KEY=${NEWS_API_KEY}}"
-        elif [[ "$APP_NAME" == "WeatherApp" ]]; then
-          ENV_VARS="--environment Variables={WEATHER_API_KEY=${WEATHER_API_KEY}}"
-        elif [[ "$APP_NAME" == "GitHubApp" ]]; then
-          ENV_VARS="--environment Variables={GITHUB_PAT=${GITHUB_PAT},GITHUB_USERNAME=${GITHUB_USERNAME}}"
-        fi
-
         aws --no-cli-pager lambda create-function \
             --function-name "${APP_NAME}" \
             --runtime python3.11 \
@@ -270,6 +478,10 @@ for APP_NAME in "${APPS[@]}"; do
         --region "$REGION_NAME"
 
     echo "Successfully granted API Gateway permission to invoke Lambda."
+
+    if [[ "$APP_NAME" == "NewsApp" ]]; then
+        create_news_snapshot_schedule "$account_id"
+    fi
     sleep 5
 
     root_resource_id=$(aws apigateway get-resources \
@@ -305,7 +517,7 @@ for APP_NAME in "${APPS[@]}"; do
             --resource-id "$app_resource_id" \
             --http-method "GET" \
             --authorization-type NONE \
-            --request-parameters '{"method.request.querystring.category": false}' \
+            --request-parameters '{"method.request.querystring.category": false, "method.request.querystring.from": false, "method.request.querystring.to": false, "method.request.querystring.order": false, "method.request.querystring.since": false, "method.request.querystring.limit": false, "method.request.querystring.next": false}' \
             --region $REGION_NAME
 
         aws apigateway put-integration \
@@ -343,6 +555,70 @@ for APP_NAME in "${APPS[@]}"; do
 
         create_method_and_integration "$rest_api_id" "$expenseid_resource_id" "DELETE" "$lambda_uri"
         enable_cors "$rest_api_id" "$expenseid_resource_id" "DELETE"
+
+        # Method 3: GET for /summary resource under /ExpenseApp
+        summary_resource_id=$(aws apigateway create-resource \
+            --rest-api-id "$rest_api_id" \
+            --parent-id "$app_resource_id" \
+            --path-part "summary" \
+            --query 'id' --output text --region $REGION_NAME 2>/dev/null \
+            || aws apigateway get-resources \
+                --rest-api-id "$rest_api_id" \
+                --query "items[?pathPart=='summary' && parentId=='$app_resource_id'].id" --output text --region $REGION_NAME)
+
+        echo "Created /ExpenseApp/summary resource with ID: $summary_resource_id"
+
+        create_method_and_integration "$rest_api_id" "$summary_resource_id" "GET" "$lambda_uri"
+        enable_cors "$rest_api_id" "$summary_resource_id" "GET"
+
+        # Method 4: GET for /search resource under /ExpenseApp
+        search_resource_id=$(aws apigateway create-resource \
+            --rest-api-id "$rest_api_id" \
+            --parent-id "$app_resource_id" \
+            --path-part "search" \
+            --query 'id' --output text --region $REGION_NAME 2>/dev/null \
+            || aws apigateway get-resources \
+                --rest-api-id "$rest_api_id" \
+                --query "items[?pathPart=='search' && parentId=='$app_resource_id'].id" --output text --region $REGION_NAME)
+
+        echo "Created /ExpenseApp/search resource with ID: $search_resource_id"
+
+        create_method_and_integration "$rest_api_id" "$search_resource_id" "GET" "$lambda_uri"
+        enable_cors "$rest_api_id" "$search_resource_id" "GET"
+
+        # Method 5: POST and DELETE for /batch resource under /ExpenseApp
+        batch_resource_id=$(aws apigateway create-resource \
+            --rest-api-id "$rest_api_id" \
+            --parent-id "$app_resource_id" \
+            --path-part "batch" \
+            --query 'id' --output text --region $REGION_NAME 2>/dev/null \
+            || aws apigateway get-resources \
+                --rest-api-id "$rest_api_id" \
+                --query "items[?pathPart=='batch' && parentId=='$app_resource_id'].id" --output text --region $REGION_NAME)
+
+        echo "Created /ExpenseApp/batch resource with ID: $batch_resource_id"
+
+        create_method_and_integration "$rest_api_id" "$batch_resource_id" "POST" "$lambda_uri"
+        enable_cors "$rest_api_id" "$batch_resource_id" "POST"
+        create_method_and_integration "$rest_api_id" "$batch_resource_id" "DELETE" "$lambda_uri"
+        enable_cors "$rest_api_id" "$batch_resource_id" "DELETE"
+    fi
+
+    # GET for the /activity resource under /GitHubApp (the activity history)
+    if [[ "$APP_NAME" == "GitHubApp" ]]; then
+        activity_resource_id=$(aws apigateway create-resource \
+            --rest-api-id "$rest_api_id" \
+            --parent-id "$app_resource_id" \
+            --path-part "activity" \
+            --query 'id' --output text --region $REGION_NAME 2>/dev/null \
+            || aws apigateway get-resources \
+                --rest-api-id "$rest_api_id" \
+                --query "items[?pathPart=='activity' && parentId=='$app_resource_id'].id" --output text --region $REGION_NAME)
+
+        echo "Created /GitHubApp/activity resource with ID: $activity_resource_id"
+
+        create_method_and_integration "$rest_api_id" "$activity_resource_id" "GET" "$lambda_uri"
+        enable_cors "$rest_api_id" "$activity_resource_id" "GET"
     fi
 
     # Deploy the trigger
@@ -48,7 +48,7 @@ type Expense = {
 };
 
 type NewsArticle = {
-  id: number;
+  id: string;
   title: string;
   summary: string;
   source: string;
@@ -82,6 +82,8 @@ const App: React.FC = () => {
     github: process.env.REACT_APP_GITHUB_GATEWAY_URL || "http://localhost:3002/github",
     expenses: process.env.REACT_APP_EXPENSES_GATEWAY_URL || "http://localhost:3003/expenses",
     news: process.env.REACT_APP_NEWS_GATEWAY_URL || "http://localhost:3004/news",
+    // Optional: all four widgets in one request (backend/DashboardApp)
+    dashboard: process.env.REACT_APP_DASHBOARD_GATEWAY_URL || "",
   };
 
   // State management
@@ -132,10 +134,8 @@ const App: React.FC = () => {
 
     try {
       const location = "Kathmandu";
-      const data = await apiCall(API_CONFIG.weather, {
-        method: "POST",
-        body: JSON.stringify({ location: location }),
-      });
+      // GET, so the response can be revalidated with its ETag and cached per Cache-Control
+      const data = await apiCall(`${API_CONFIG.weather}?location=${encodeURIComponent(location)}`);
       setWeatherData(data as WeatherData);
     } catch (error) {
       setErrors((prev) => ({
@@ -171,13 +171,25 @@ const App: React.FC = () => {
   };
 
   // Expense Tracker Functions
+
+  // GET /expenses returns one page and a "next" token; follows the tokens
+  // until the last page, so the list and its total cover every expense.
+  const fetchAllExpenses = async (firstPage?: { expenses: Expense[]; next?: string | null }) => {
+    let page = firstPage || (await apiCall(`${API_CONFIG.expenses}?limit=500`));
+    const all: Expense[] = [...(page.expenses as Expense[])];
+    while (page.next) {
+      page = await apiCall(`${API_CONFIG.expenses}?limit=500&next=${encodeURIComponent(page.next)}`);
+      all.push(...(page.expenses as Expense[]));
+    }
+    return all;
+  };
+
   const fetchExpenses = async () => {
     setLoading((prev) => ({ ...prev, expenses: true }));
     setErrors((prev) => ({ ...prev, expenses: null }));
 
     try {
-      const responseData = await apiCall(API_CONFIG.expenses);
-      setExpenses(responseData.expenses as Expense[]);
+      setExpenses(await fetchAllExpenses());
     } catch (error) {
       console.error("Failed to fetch expenses:", error);
       setErrors((prev) => ({ ...prev, expenses: "Failed to fetch expenses" }));
@@ -299,12 +311,60 @@ const App: React.FC = () => {
     }
   };
 
+  // Loads every widget with one request to the aggregated endpoint. Widgets
+  // whose section failed there are fetched again from their own endpoints.
+  const fetchDashboard = async () => {
+    setLoading({ weather: true, github: true, expenses: true, news: true });
+
+    let data;
+    try {
+      data = await apiCall(`${API_CONFIG.dashboard}?location=Kathmandu`);
+    } catch (error) {
+      data = {};
+    }
+
+    if (data.weather) {
+      setWeatherData(data.weather as WeatherData);
+      setLoading((prev) => ({ ...prev, weather: false }));
+    } else {
+      fetchWeatherData();
+    }
+    if (data.github) {
+      setGithubActivity((data.github.recent_activity || []) as GithubActivity[]);
+      setLoading((prev) => ({ ...prev, github: false }));
+    } else {
+      fetchGithubActivity();
+    }
+    if (data.expenses && !data.expenses.next) {
+      setExpenses(data.expenses.expenses as Expense[]);
+      setLoading((prev) => ({ ...prev, expenses: false }));
+    } else if (data.expenses) {
+      // More than one page: load the rest from the expenses endpoint
+      fetchAllExpenses(data.expenses)
+        .then((all) => setExpenses(all))
+        .catch(() => fetchExpenses())
+        .finally(() => setLoading((prev) => ({ ...prev, expenses: false })));
+    } else {
+      fetchExpenses();
+    }
+    if (data.news) {
+      setNewsData((data.news.articles || []) as NewsArticle[]);
+      setLoading((prev) => ({ ...prev, news: false }));
+    } else {
+      fetchNews();
+    }
+  };
+
   // Initialize dashboard
   useEffect(() => {
-    fetchWeatherData();
-    fetchGithubActivity();
-    fetchExpenses();
-    fetchNews();
+    if (API_CONFIG.dashboard) {
+      fetchDashboard();
+    } else {
+      fetchWeatherData();
+      fetchGithubActivity();
+      fetchExpenses();
+      fetchNews();
+    }
     // eslint-disable-next-line
   }, []);
 